@@ -0,0 +1,165 @@
+"""Admission control for the HTTP API.
+
+Two independent checks run before a request reaches a route:
+
+- A per-principal budget: each user (JWT), API key or, for anonymous
+  requests, client IP gets its own read and write request allowance,
+  enforced with the shared GCRA limiter from rate_limit.py. Over budget
+  means 429 with Retry-After.
+- A global in-flight cap, again separate for reads and writes. When every
+  slot is taken the request is shed straight away with 503 and Retry-After
+  instead of queueing for the threadpool or the SQLite writer lock.
+
+A request holds its in-flight slot until its response starts, so long-lived
+streams (Server-Sent Events) don't pin a slot for their whole lifetime.
+
+With RATE_LIMIT_BACKEND=sqlite every budget check is a write transaction
+that can wait on the file lock, so it runs in a worker thread rather than
+on the event loop. The memory store is checked inline.
+"""
+
+import asyncio
+import json
+
+import jwt
+from jwt.exceptions import PyJWTError
+
+from auth import hash_api_key
+from config import settings
+from rate_limit import MemoryRateLimitStore, RateLimiter, rate_limit_store
+
+READ_METHODS = frozenset({"GET", "HEAD", "OPTIONS"})
+
+
+def _principal(scope) -> str:
+    """Who a request counts against: its user, its API key, or its client IP."""
+    for name, value in scope["headers"]:
+        if name != b"authorization":
+            continue
+        scheme, _, token = value.decode("latin-1").partition(" ")
+        if scheme.lower() != "bearer" or not token:
+            break
+        if token.startswith("kc_"):
+            return "key:" + hash_api_key(token)[:32]
+        try:
+            # Verified, so a forged token can't spend someone else's budget
+            payload = jwt.decode(token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM])
+        except PyJWTError:
+            break
+        if payload.get("sub"):
+            return "user:" + payload["sub"]
+        break
+    client = scope.get("client")
+    return "ip:" + (client[0] if client else "unknown")
+
+
+async def _reject(send, status: int, detail: str, retry_after: int):
+    await send({
+        "type": "http.response.start",
+        "status": status,
+        "headers": [
+            (b"content-type", b"application/json"),
+            (b"retry-after", str(retry_after).encode()),
+        ],
+    })
+    await send({"type": "http.response.body", "body": json.dumps({"detail": detail}).encode()})
+
+
+class AdmissionController:
+    """Per-principal request budgets and global in-flight caps, split by reads and writes."""
+
+    def __init__(
+        self,
+        window: int = 60,
+        read_limit: int = 0,
+        write_limit: int = 0,
+        max_reads_in_flight: int = 0,
+        max_writes_in_flight: int = 0,
+        store=None,
+    ):
+        store = store if store is not None else rate_limit_store
+        # A limit of 0 switches that check off
+        self._limiters = {
+            "read": RateLimiter(window, read_limit, store, scope="api.read") if read_limit else None,
+            "write": RateLimiter(window, write_limit, store, scope="api.write") if write_limit else None,
+        }
+        self._blocking_store = not isinstance(store, MemoryRateLimitStore)
+        self._caps = {"read": max_reads_in_flight, "write": max_writes_in_flight}
+        self.in_flight = {"read": 0, "write": 0}
+        self.counters = {"admitted": 0, "throttled": 0, "shed": 0}
+
+    async def __call__(self, app, scope, receive, send):
+        kind = "read" if scope["method"] in READ_METHODS else "write"
+        cap = self._caps[kind]
+        if cap and self.in_flight[kind] >= cap:
+            self.counters["shed"] += 1
+            await _reject(send, 503, "Server is busy. Please retry shortly.", 1)
+            return
+
+        # Take the slot before any await, so concurrent requests can't all pass the cap check
+        self.in_flight[kind] += 1
+        released = False
+
+        def release():
+            nonlocal released
+            if not released:
+                released = True
+                self.in_flight[kind] -= 1
+
+        limiter = self._limiters[kind]
+        if limiter is not None:
+            principal = _principal(scope)
+            try:
+                if self._blocking_store:
+                    wait = await asyncio.to_thread(limiter.acquire, principal)
+                else:
+                    wait = limiter.acquire(principal)
+            except BaseException:
+                release()
+                raise
+            if wait:
+                release()
+                self.counters["throttled"] += 1
+                await _reject(send, 429, f"Too many requests. Try again in {wait} seconds.", wait)
+                return
+
+        self.counters["admitted"] += 1
+
+        async def send_and_release(message):
+            if message["type"] == "http.response.start":
+                release()
+            await send(message)
+
+        try:
+            await app(scope, receive, send_and_release)
+        finally:
+            release()
+
+    def limiters(self) -> list[RateLimiter]:
+        return [limiter for limiter in self._limiters.values() if limiter is not None]
+
+    def stats(self) -> dict:
+        return {"in_flight": dict(self.in_flight), "caps": dict(self._caps), **self.counters}
+
+
+class AdmissionControlMiddleware:
+    """Runs every /api request through an AdmissionController."""
+
+    def __init__(self, app, controller: AdmissionController):
+        self.app = app
+        self.controller = controller
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not scope["path"].startswith("/api/"):
+            await self.app(scope, receive, send)
+            return
+        await self.controller(self.app, scope, receive, send)
+
+
+admission = AdmissionController(
+    window=settings.API_RATE_LIMIT_WINDOW,
+    read_limit=settings.API_READ_RATE_LIMIT,
+    write_limit=settings.API_WRITE_RATE_LIMIT,
+    max_reads_in_flight=settings.API_MAX_READS_IN_FLIGHT,
+    max_writes_in_flight=settings.API_MAX_WRITES_IN_FLIGHT,
+)
@@ -0,0 +1,265 @@
+"""Batched, asynchronous audit logging.
+
+Request handlers call ``audit_writer.record(...)``, which only puts the
+entry on a bounded in-memory queue; the timestamp is taken at that moment.
+A background thread drains the queue and bulk-inserts whatever has
+accumulated in a single transaction, so a burst of failed logins becomes a
+handful of inserts instead of one extra commit per request.
+
+When the queue is full the AUDIT_OVERFLOW_POLICY decides: ``block`` waits
+up to AUDIT_BLOCK_TIMEOUT seconds for space (counted as delayed) before
+giving up, ``drop`` gives up at once. Either way a lost entry is counted.
+Pending entries are flushed when the app shuts down.
+
+The same thread enforces AUDIT_RETENTION_DAYS: every AUDIT_PRUNE_INTERVAL
+seconds it deletes expired entries in small chunks, folding each chunk into
+per-day, per-action counts (audit_rollups) first so totals outlive the rows.
+"""
+
+import queue
+import threading
+import time
+from collections import Counter
+from datetime import datetime, timedelta
+from typing import Optional
+
+from sqlalchemy import insert
+from sqlalchemy.orm import Session
+
+from config import settings
+from database import SessionLocal
+from models import AuditLog, AuditRollup, generate_uuid, utcnow
+
+_STOP = object()
+
+
+def prune_audit_log(db: Session, cutoff: datetime, chunk_size: int = 1000) -> int:
+    """Delete entries created before cutoff, oldest first, one chunk per transaction.
+
+    Each chunk is added to audit_rollups in the same transaction that
+    deletes it, so counts are never lost or double-counted.
+    """
+    deleted = 0
+    while True:
+        rows = (
+            db.query(AuditLog.id, AuditLog.action, AuditLog.created_at)
+            .filter(AuditLog.created_at < cutoff)
+            .order_by(AuditLog.created_at)
+            .limit(chunk_size)
+            .all()
+        )
+        if not rows:
+            return deleted
+
+        counts = Counter((r.created_at.strftime("%Y-%m-%d"), r.action) for r in rows)
+        existing = {
+            (r.day, r.action): r
+            for r in db.query(AuditRollup).filter(AuditRollup.day.in_({day for day, _ in counts}))
+        }
+        for (day, action), n in counts.items():
+            rollup = existing.get((day, action))
+            if rollup is None:
+                db.add(AuditRollup(day=day, action=action, count=n))
+            else:
+                rollup.count += n
+        db.query(AuditLog).filter(AuditLog.id.in_([r.id for r in rows])).delete(
+            synchronize_session=False
+        )
+        db.commit()
+        deleted += len(rows)
+        if len(rows) < chunk_size:
+            return deleted
+
+
+class AuditWriter:
+    """Queues audit entries and writes them in batches from a background thread."""
+
+    def __init__(
+        self,
+        queue_size: int = 10_000,
+        batch_size: int = 500,
+        flush_interval: float = 0.5,
+        overflow_policy: str = "block",
+        block_timeout: float = 1.0,
+        retention_days: int = 0,
+        prune_interval: float = 3600.0,
+        prune_chunk: int = 1000,
+    ):
+        self._queue: queue.Queue = queue.Queue(maxsize=queue_size)
+        self._batch_size = batch_size
+        self._flush_interval = flush_interval
+        self._overflow_policy = overflow_policy
+        self._block_timeout = block_timeout
+        self._retention_days = retention_days
+        self._prune_interval = prune_interval
+        self._prune_chunk = prune_chunk
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+        self.counters = {
+            "queued": 0,
+            "written": 0,
+            "batches": 0,
+            "delayed": 0,
+            "dropped": 0,
+            "failed": 0,
+            "pruned": 0,
+        }
+        # Longest an entry has waited between record() and its insert, in ms
+        self.max_lag_ms = 0.0
+
+    def _count(self, name: str, n: int = 1):
+        with self._lock:
+            self.counters[name] += n
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self):
+        if self.running:
+            return
+        self._thread = threading.Thread(target=self._run, name="audit-writer", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: float = 10.0):
+        """Write everything still queued, then stop the writer thread."""
+        if not self.running:
+            return
+        self._queue.put(_STOP)
+        self._thread.join(timeout)
+        self._thread = None
+
+    def record(self, action: str, user_id: str = None, detail: str = "", ip: str = None):
+        entry = {
+            "id": generate_uuid(),
+            "user_id": user_id,
+            "action": action,
+            "detail": detail,
+            "ip_address": ip,
+            "created_at": utcnow(),
+        }
+        if not self.running:
+            # No writer (scripts, tests without app startup): write it now
+            self._write([(entry, time.monotonic())])
+            return
+
+        item = (entry, time.monotonic())
+        try:
+            self._queue.put_nowait(item)
+        except queue.Full:
+            if self._overflow_policy != "block":
+                self._count("dropped")
+                return
+            self._count("delayed")
+            try:
+                self._queue.put(item, timeout=self._block_timeout)
+            except queue.Full:
+                self._count("dropped")
+                return
+        self._count("queued")
+
+    def _run(self):
+        # First prune soon after startup, so frequent restarts still prune
+        next_prune = time.monotonic() + min(self._prune_interval, 60)
+        while True:
+            if self._retention_days and time.monotonic() >= next_prune:
+                self._prune()
+                next_prune = time.monotonic() + self._prune_interval
+            timeout = max(next_prune - time.monotonic(), 0) if self._retention_days else None
+            try:
+                item = self._queue.get(timeout=timeout)
+            except queue.Empty:
+                continue
+            if item is _STOP:
+                return
+            batch = [item]
+            # Let a burst accumulate, but never hold entries past the interval
+            deadline = time.monotonic() + self._flush_interval
+            stopping = False
+            while len(batch) < self._batch_size:
+                try:
+                    item = self._queue.get(timeout=max(deadline - time.monotonic(), 0))
+                except queue.Empty:
+                    break
+                if item is _STOP:
+                    stopping = True
+                    break
+                batch.append(item)
+            self._write(batch)
+            if stopping:
+                self._drain()
+                return
+
+    def _drain(self):
+        batch = []
+        while True:
+            try:
+                item = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if item is not _STOP:
+                batch.append(item)
+        for start in range(0, len(batch), self._batch_size):
+            self._write(batch[start:start + self._batch_size])
+
+    def _write(self, batch: list[tuple[dict, float]]):
+        rows = [entry for entry, _ in batch]
+        written = 0
+        db = SessionLocal()
+        try:
+            try:
+                db.execute(insert(AuditLog), rows)
+                db.commit()
+                written = len(rows)
+            except Exception:
+                db.rollback()
+                # Don't lose the whole batch to one bad row
+                for row in rows:
+                    try:
+                        db.execute(insert(AuditLog), [row])
+                        db.commit()
+                        written += 1
+                    except Exception:
+                        db.rollback()
+                        self._count("failed")
+        finally:
+            db.close()
+
+        lag = (time.monotonic() - min(queued_at for _, queued_at in batch)) * 1000
+        with self._lock:
+            self.counters["written"] += written
+            self.counters["batches"] += 1
+            self.max_lag_ms = max(self.max_lag_ms, lag)
+
+    def _prune(self):
+        cutoff = utcnow() - timedelta(days=self._retention_days)
+        db = SessionLocal()
+        try:
+            self._count("pruned", prune_audit_log(db, cutoff, self._prune_chunk))
+        except Exception:
+            db.rollback()
+        finally:
+            db.close()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "running": self.running,
+                "pending": self._queue.qsize(),
+                "overflow_policy": self._overflow_policy,
+                "retention_days": self._retention_days,
+                "max_lag_ms": round(self.max_lag_ms, 1),
+                **self.counters,
+            }
+
+
+audit_writer = AuditWriter(
+    queue_size=settings.AUDIT_QUEUE_SIZE,
+    batch_size=settings.AUDIT_BATCH_SIZE,
+    flush_interval=settings.AUDIT_FLUSH_INTERVAL,
+    overflow_policy=settings.AUDIT_OVERFLOW_POLICY,
+    block_timeout=settings.AUDIT_BLOCK_TIMEOUT,
+    retention_days=settings.AUDIT_RETENTION_DAYS,
+    prune_interval=settings.AUDIT_PRUNE_INTERVAL,
+    prune_chunk=settings.AUDIT_PRUNE_CHUNK,
+)
@@ -7,23 +7,44 @@ from fastapi import Depends, HTTPException, status
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 import jwt
 from jwt.exceptions import PyJWTError
-from passlib.context import CryptContext
 from sqlalchemy.orm import Session
 
 from config import settings
 from database import get_db
+from hashing import HasherBusy, password_hasher, pwd_context  # noqa: F401
 from models import User, ApiKey, utcnow
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 security = HTTPBearer(auto_error=False)
 
 
+def _hasher_busy() -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        detail="Too many sign-in attempts in progress. Please retry shortly.",
+        headers={"Retry-After": "1"},
+    )
+
+
 def hash_password(password: str) -> str:
-    return pwd_context.hash(password)
+    try:
+        return password_hasher.hash(password)
+    except HasherBusy:
+        raise _hasher_busy()
 
 
 def verify_password(plain: str, hashed: str) -> bool:
-    return pwd_context.verify(plain, hashed)
+    try:
+        return password_hasher.verify(plain, hashed)
+    except HasherBusy:
+        raise _hasher_busy()
+
+
+def verify_and_update_password(plain: str, hashed: str) -> tuple[bool, Optional[str]]:
+    """Like verify_password, plus a replacement hash if the stored cost is out of date."""
+    try:
+        return password_hasher.verify_and_update(plain, hashed)
+    except HasherBusy:
+        raise _hasher_busy()
 
 
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -> str:
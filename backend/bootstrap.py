@@ -0,0 +1,77 @@
+"""Database schema and seed data, prepared once at startup.
+
+create_all inspects every table and seeding queries the categories on each
+boot, even though the answer almost never changes. Instead a fingerprint of
+the declared schema (every CREATE TABLE / CREATE INDEX statement) and of the
+seed data is kept in the schema_meta table; when the stored fingerprint
+matches, startup skips both. Changing a model, the defaults or adding a
+migration changes the fingerprint, so the next start does the full check
+again, including any pending migrations (see migrations.py).
+"""
+
+import hashlib
+from typing import Optional
+
+from sqlalchemy import delete, insert, inspect, select
+from sqlalchemy.exc import OperationalError, ProgrammingError
+from sqlalchemy.schema import CreateIndex, CreateTable
+
+import migrations
+import models  # noqa: F401  (registers every table on Base.metadata)
+from database import Base, SessionLocal, engine
+from migrations import schema_meta
+from seed import DEFAULT_CATEGORIES, DEFAULT_ITEM_MAPPINGS, seed_categories
+
+FINGERPRINT_KEY = "fingerprint"
+
+
+def schema_fingerprint(bind=engine) -> str:
+    """SHA-256 over the DDL for every model table and index, the seed data and migrations."""
+    digest = hashlib.sha256()
+    for table in Base.metadata.sorted_tables:
+        digest.update(str(CreateTable(table).compile(bind)).encode())
+        for index in sorted(table.indexes, key=lambda i: i.name):
+            digest.update(str(CreateIndex(index).compile(bind)).encode())
+    digest.update(repr(DEFAULT_CATEGORIES).encode())
+    digest.update(repr(DEFAULT_ITEM_MAPPINGS).encode())
+    digest.update(str(migrations.LATEST_VERSION).encode())
+    return digest.hexdigest()
+
+
+def _stored_fingerprint(bind) -> Optional[str]:
+    try:
+        with bind.connect() as conn:
+            return conn.execute(
+                select(schema_meta.c.value).where(schema_meta.c.key == FINGERPRINT_KEY)
+            ).scalar()
+    except (OperationalError, ProgrammingError):
+        # No schema_meta table yet: a new database, or one from before fingerprints
+        return None
+
+
+def prepare_database(bind=engine) -> bool:
+    """Create missing tables, migrate and seed defaults unless already done for this schema.
+
+    Returns True when the full check ran, False when it was skipped.
+    """
+    fingerprint = schema_fingerprint(bind)
+    if _stored_fingerprint(bind) == fingerprint:
+        return False
+
+    is_new = not inspect(bind).has_table(models.User.__tablename__)
+    Base.metadata.create_all(bind=bind)
+    if is_new:
+        # Built from the current models, which already include every migration
+        migrations.stamp(bind)
+    else:
+        migrations.migrate(bind)
+    db = SessionLocal(bind=bind)
+    try:
+        seed_categories(db)
+    finally:
+        db.close()
+
+    with bind.begin() as conn:
+        conn.execute(delete(schema_meta).where(schema_meta.c.key == FINGERPRINT_KEY))
+        conn.execute(insert(schema_meta).values(key=FINGERPRINT_KEY, value=fingerprint))
+    return True
@@ -0,0 +1,137 @@
+"""Cross-worker broadcast backends for the WebSocket ConnectionManager.
+
+The manager always delivers a broadcast to its own sockets directly; a
+backend's only job is to carry the already-encoded payload to the *other*
+worker processes and hand events published elsewhere back to the manager.
+
+- ``memory``: single process (the default). Nothing to forward.
+- ``sqlite``: every worker appends events to a small, shared SQLite file
+  and polls it for rows written by other workers. It needs no extra
+  service and works for any number of uvicorn ``--workers`` on one host.
+"""
+
+import asyncio
+import os
+import secrets
+import sqlite3
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Optional
+
+# Called with (list_id, payload) for events published by another worker
+DeliverCallback = Callable[[str, str], None]
+
+
+class MemoryBroadcast:
+    """Process-local backend: local delivery is all there is."""
+
+    async def start(self, deliver: DeliverCallback):
+        pass
+
+    async def stop(self):
+        pass
+
+    async def publish(self, list_id: str, payload: str):
+        pass
+
+
+class SQLiteBroadcast:
+    """Shares events between worker processes through a SQLite notification table."""
+
+    def __init__(self, path: str, poll_interval: float = 0.05, retention: float = 60.0):
+        self._path = path
+        self._poll_interval = poll_interval
+        self._retention = retention
+        self._origin = f"{os.getpid()}-{secrets.token_hex(4)}"
+        # One thread owns the connection; it also keeps publishes in order
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="broadcast")
+        self._conn: Optional[sqlite3.Connection] = None
+        self._last_id = 0
+        self._poller: Optional[asyncio.Task] = None
+
+    def _open(self) -> int:
+        directory = os.path.dirname(self._path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        conn = sqlite3.connect(self._path, check_same_thread=False, isolation_level=None)
+        conn.execute("PRAGMA journal_mode=WAL")
+        # Events are ephemeral; losing the last few on power loss is fine
+        conn.execute("PRAGMA synchronous=OFF")
+        conn.execute("PRAGMA busy_timeout=5000")
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS broadcast_events ("
+            " id INTEGER PRIMARY KEY AUTOINCREMENT,"
+            " list_id TEXT NOT NULL,"
+            " payload TEXT NOT NULL,"
+            " origin TEXT NOT NULL,"
+            " created_at REAL NOT NULL)"
+        )
+        self._conn = conn
+        row = conn.execute("SELECT MAX(id) FROM broadcast_events").fetchone()
+        return row[0] or 0
+
+    def _insert(self, list_id: str, payload: str):
+        self._conn.execute(
+            "INSERT INTO broadcast_events (list_id, payload, origin, created_at) VALUES (?, ?, ?, ?)",
+            (list_id, payload, self._origin, time.time()),
+        )
+
+    def _fetch(self, after_id: int) -> list[tuple[int, str, str, str]]:
+        return self._conn.execute(
+            "SELECT id, list_id, payload, origin FROM broadcast_events"
+            " WHERE id > ? ORDER BY id LIMIT 1000",
+            (after_id,),
+        ).fetchall()
+
+    def _prune(self):
+        self._conn.execute(
+            "DELETE FROM broadcast_events WHERE created_at < ?",
+            (time.time() - self._retention,),
+        )
+
+    async def _run(self, fn, *args):
+        return await asyncio.get_running_loop().run_in_executor(self._executor, fn, *args)
+
+    async def start(self, deliver: DeliverCallback):
+        self._last_id = await self._run(self._open)
+        self._poller = asyncio.create_task(self._poll(deliver))
+
+    async def stop(self):
+        if self._poller:
+            self._poller.cancel()
+            self._poller = None
+        if self._conn:
+            await self._run(self._conn.close)
+            self._conn = None
+
+    async def publish(self, list_id: str, payload: str):
+        if self._conn is None:
+            return
+        try:
+            await self._run(self._insert, list_id, payload)
+        except sqlite3.Error:
+            # Other workers miss this event; local subscribers already have it
+            pass
+
+    async def _poll(self, deliver: DeliverCallback):
+        next_prune = time.monotonic() + self._retention
+        while True:
+            await asyncio.sleep(self._poll_interval)
+            try:
+                rows = await self._run(self._fetch, self._last_id)
+                for row_id, list_id, payload, origin in rows:
+                    self._last_id = row_id
+                    if origin != self._origin:
+                        deliver(list_id, payload)
+                if time.monotonic() >= next_prune:
+                    next_prune = time.monotonic() + self._retention
+                    await self._run(self._prune)
+            except sqlite3.Error:
+                # Locked or briefly unavailable — try again on the next tick
+                continue
+
+
+def create_backend(name: str, sqlite_path: str, poll_interval: float):
+    if name == "sqlite":
+        return SQLiteBroadcast(sqlite_path, poll_interval=poll_interval)
+    return MemoryBroadcast()
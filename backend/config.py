@@ -1,4 +1,5 @@
 import sys
+from typing import Literal, Optional
 
 from pydantic_settings import BaseSettings
 
@@ -23,6 +24,68 @@ class Settings(BaseSettings):
     LOGIN_RATE_LIMIT_MAX: int = 10
     REGISTER_RATE_LIMIT_WINDOW: int = 3600
     REGISTER_RATE_LIMIT_MAX: int = 5
+    # bcrypt runs in its own worker processes; None = min(4, CPU count), 0 = in the request thread
+    PASSWORD_HASH_WORKERS: Optional[int] = None
+    # Hashes queued or running before further logins are rejected with 503
+    PASSWORD_HASH_MAX_PENDING: int = 16
+    PASSWORD_HASH_TIMEOUT: float = 10.0
+    # bcrypt cost; unset means calibrate at startup to take about PASSWORD_HASH_TARGET_MS
+    PASSWORD_HASH_ROUNDS: Optional[int] = None
+    PASSWORD_HASH_TARGET_MS: int = 250
+    # "sqlite" shares rate-limit state between uvicorn --workers processes
+    RATE_LIMIT_BACKEND: Literal["memory", "sqlite"] = "memory"
+    RATE_LIMIT_SQLITE_PATH: str = "./data/ratelimit.db"
+    # Keys tracked by the memory backend before the least recently used are dropped
+    RATE_LIMIT_MAX_KEYS: int = 100_000
+    # Requests per window allowed to each user, API key or anonymous IP; 0 disables
+    API_RATE_LIMIT_WINDOW: int = 60
+    API_READ_RATE_LIMIT: int = 600
+    API_WRITE_RATE_LIMIT: int = 240
+    # Requests processed at once before new ones are shed with 503; 0 disables
+    API_MAX_READS_IN_FLIGHT: int = 64
+    API_MAX_WRITES_IN_FLIGHT: int = 16
+    # Audit entries are queued and bulk-inserted by a background writer
+    AUDIT_QUEUE_SIZE: int = 10_000
+    AUDIT_BATCH_SIZE: int = 500
+    AUDIT_FLUSH_INTERVAL: float = 0.5
+    # When the queue is full: "block" waits up to AUDIT_BLOCK_TIMEOUT seconds, "drop" gives up at once
+    AUDIT_OVERFLOW_POLICY: Literal["block", "drop"] = "block"
+    AUDIT_BLOCK_TIMEOUT: float = 1.0
+    # Audit entries older than this are deleted (their counts kept as daily rollups); 0 keeps everything
+    AUDIT_RETENTION_DAYS: int = 90
+    AUDIT_PRUNE_INTERVAL: float = 3600.0
+    AUDIT_PRUNE_CHUNK: int = 1000
+    RECIPE_IMPORT_CONCURRENCY: int = 4
+    RECIPE_IMPORT_MAX_URLS: int = 10
+    RECIPE_IMPORT_MAX_JOBS: int = 200
+    # Import jobs queued or running at once, in total and per user; more are refused
+    RECIPE_IMPORT_MAX_ACTIVE_JOBS: int = 50
+    RECIPE_IMPORT_MAX_USER_JOBS: int = 3
+    WS_SEND_QUEUE_SIZE: int = 100
+    WS_SLOW_CLIENT_POLICY: Literal["resync", "disconnect"] = "resync"
+    WS_SEND_TIMEOUT: float = 10.0
+    # Clients ping every 30s; allow for two missed pings before reaping
+    WS_IDLE_TIMEOUT: float = 75.0
+    # Merge bursts of list events into one frame; 0 sends every event at once
+    WS_COALESCE_WINDOW_MS: int = 0
+    # Recent events kept per list so reconnecting clients can catch up
+    WS_REPLAY_BUFFER_SIZE: int = 100
+    WS_REPLAY_MAX_LISTS: int = 500
+    # Comment lines sent on idle Server-Sent Event streams to keep proxies from closing them
+    SSE_KEEPALIVE_INTERVAL: float = 15.0
+    # "sqlite" shares WebSocket events between uvicorn --workers processes
+    BROADCAST_BACKEND: Literal["memory", "sqlite"] = "memory"
+    BROADCAST_SQLITE_PATH: str = "./data/broadcast.db"
+    BROADCAST_POLL_INTERVAL: float = 0.05
+    # Per-request query count and DB time in a Server-Timing header
+    SQL_INSTRUMENTATION: bool = True
+    # Log each request's queries, naming statements repeated SQL_REPEAT_THRESHOLD+ times
+    SQL_DEBUG_LOG: bool = False
+    SQL_REPEAT_THRESHOLD: int = 5
+    # Raise on lazy loads and repeated statements instead of logging them (for tests)
+    SQL_STRICT: bool = False
+    # Comma-separated networks (e.g. "10.0.0.0/8,127.0.0.1") that may read /api/metrics without logging in
+    METRICS_ALLOW_FROM: str = ""
     APP_NAME: str = "Kitchen Cupboard"
     APP_VERSION: str = "1.0.0"
 
@@ -1,14 +1,39 @@
+import time
+
 from sqlalchemy import create_engine
+from sqlalchemy.engine import make_url
 from sqlalchemy.orm import sessionmaker, declarative_base
+from sqlalchemy.pool import QueuePool
 
 from config import settings
+from metrics import FINE_BUCKETS, Histogram
+
+# Time each request waited for a pooled database connection
+pool_checkout_wait = Histogram(FINE_BUCKETS)
+
+
+class TimedQueuePool(QueuePool):
+    """The default pool, recording how long each checkout waited for a connection."""
+
+    def _do_get(self):
+        started = time.perf_counter()
+        try:
+            return super()._do_get()
+        finally:
+            pool_checkout_wait.observe(time.perf_counter() - started)
+
 
 # check_same_thread is SQLite-specific; only pass it for SQLite URLs.
 connect_args = {}
 if settings.DATABASE_URL.startswith("sqlite"):
     connect_args["check_same_thread"] = False
 
-engine = create_engine(settings.DATABASE_URL, connect_args=connect_args)
+engine_args = {"connect_args": connect_args}
+# In-memory SQLite keeps its special single-connection pool
+if make_url(settings.DATABASE_URL).database not in (None, "", ":memory:"):
+    engine_args["poolclass"] = TimedQueuePool
+
+engine = create_engine(settings.DATABASE_URL, **engine_args)
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 Base = declarative_base()
 
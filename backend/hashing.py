@@ -0,0 +1,254 @@
+"""Password hashing on a dedicated process pool.
+
+bcrypt is deliberately slow. Run in FastAPI's shared threadpool, a burst of
+logins ties up threads every other sync endpoint needs. Here hashes and
+verifications go to a separately sized pool of worker processes instead,
+so they also spread across cores. At most PASSWORD_HASH_MAX_PENDING
+operations may be queued or running; beyond that callers get HasherBusy
+straight away rather than waiting in line.
+
+Queue wait (submitted → picked up by a worker) and hash time are recorded
+per operation as histograms.
+
+The bcrypt cost is calibrated at startup: unless PASSWORD_HASH_ROUNDS fixes
+it, a worker times a hash on this machine and the highest cost that stays
+within PASSWORD_HASH_TARGET_MS is used. Hashes made at a lower cost are
+upgraded the next time their owner logs in.
+"""
+
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeout
+from concurrent.futures.process import BrokenProcessPool
+from functools import lru_cache
+from typing import Optional
+
+from passlib.context import CryptContext
+
+from config import settings
+from metrics import Histogram
+
+pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+
+# Calibration never goes below OWASP's minimum cost, nor so high a login takes seconds
+MIN_ROUNDS = 10
+MAX_ROUNDS = 16
+
+
+class HasherBusy(Exception):
+    """Too many password hashes are already queued."""
+
+
+# ─── Worker-side functions (run in the pool processes) ─────────────
+
+def _timed(fn, *args):
+    started = time.time()
+    result = fn(*args)
+    return result, started, time.time() - started
+
+
+@lru_cache(maxsize=4)
+def _context(rounds: int) -> CryptContext:
+    # min_rounds makes verify_and_update() upgrade cheaper hashes; costlier ones are kept
+    return CryptContext(
+        schemes=["bcrypt"],
+        deprecated="auto",
+        bcrypt__default_rounds=rounds,
+        bcrypt__min_rounds=rounds,
+    )
+
+
+def _hash_in_worker(password: str, rounds: int):
+    return _timed(_context(rounds).hash, password)
+
+
+def _verify_in_worker(password: str, hashed: str, rounds: int):
+    """(ok, new hash or None): a new hash only when the stored cost is below rounds."""
+    return _timed(_context(rounds).verify_and_update, password, hashed)
+
+
+def _calibrate_in_worker(target: float) -> int:
+    """The highest cost whose hash takes at most target seconds on this machine."""
+    handler = _context(MIN_ROUNDS).handler("bcrypt")
+    took = min(_timed(handler.hash, "calibration")[2] for _ in range(3))
+    # Each extra round doubles the work
+    rounds = MIN_ROUNDS
+    while rounds < MAX_ROUNDS and took * 2 <= target:
+        rounds += 1
+        took *= 2
+    return rounds
+
+
+def _warm_up():
+    return None
+
+
+# ─── Pool ───────────────────────────────────────────────────────────
+
+class PasswordHasher:
+    """Bounded front end to a process pool that runs bcrypt."""
+
+    def __init__(
+        self,
+        workers: int,
+        max_pending: int,
+        timeout: float,
+        rounds: Optional[int] = None,
+        target_ms: int = 250,
+    ):
+        # 0 workers hashes inline in the calling thread
+        self._workers = workers
+        # No fixed cost means calibrate in start(); passlib's default until then
+        self._calibrate = rounds is None
+        self.rounds = rounds or pwd_context.handler("bcrypt").default_rounds
+        self._target = target_ms / 1000
+        self._max_pending = max_pending
+        self._timeout = timeout
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._lock = threading.Lock()
+        self._pending = 0
+        self.queue_wait = {"hash": Histogram(), "verify": Histogram()}
+        self.hash_time = {"hash": Histogram(), "verify": Histogram()}
+        self.counters = {"rejected": 0, "timeouts": 0, "pool_restarts": 0, "rehashed": 0}
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        with self._lock:
+            if self._executor is None:
+                # spawn: forking a process that already runs threads isn't safe
+                self._executor = ProcessPoolExecutor(
+                    self._workers, mp_context=multiprocessing.get_context("spawn")
+                )
+            return self._executor
+
+    def _restart(self, broken: ProcessPoolExecutor):
+        with self._lock:
+            if self._executor is broken:
+                self._executor = None
+                self.counters["pool_restarts"] += 1
+        broken.shutdown(wait=False, cancel_futures=True)
+
+    def start(self):
+        """Spawn the workers now so the first login doesn't pay for it, and calibrate."""
+        if not self._workers:
+            if self._calibrate:
+                self.calibrate()
+            return
+        executor = self._get_executor()
+        for _ in range(self._workers):
+            executor.submit(_warm_up)
+        if self._calibrate:
+            # In the background, so startup doesn't wait on a few bcrypt runs;
+            # hashes made meanwhile use the default cost
+            executor.submit(_calibrate_in_worker, self._target).add_done_callback(self._calibrated)
+
+    def _calibrated(self, future):
+        if not future.cancelled() and future.exception() is None:
+            self.rounds = future.result()
+
+    def calibrate(self) -> int:
+        """Pick the bcrypt cost for the target latency, timed where hashes actually run."""
+        if self._workers:
+            self.rounds = self._get_executor().submit(_calibrate_in_worker, self._target).result()
+        else:
+            self.rounds = _calibrate_in_worker(self._target)
+        return self.rounds
+
+    def shutdown(self):
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+    def hash(self, password: str) -> str:
+        return self._run("hash", _hash_in_worker, password, self.rounds)
+
+    def verify(self, password: str, hashed: str) -> bool:
+        return self.verify_and_update(password, hashed)[0]
+
+    def verify_and_update(self, password: str, hashed: str) -> tuple[bool, Optional[str]]:
+        """Check a password, also returning a stronger hash if the stored one is too cheap."""
+        ok, new_hash = self._run("verify", _verify_in_worker, password, hashed, self.rounds)
+        if new_hash:
+            with self._lock:
+                self.counters["rehashed"] += 1
+        return ok, new_hash
+
+    def _run(self, op: str, fn, *args):
+        if not self._workers:
+            result, _, took = fn(*args)
+            self.hash_time[op].observe(took)
+            return result
+
+        with self._lock:
+            if self._pending >= self._max_pending:
+                self.counters["rejected"] += 1
+                raise HasherBusy()
+            self._pending += 1
+        submitted = time.time()
+        executor = self._get_executor()
+        try:
+            try:
+                future = executor.submit(fn, *args)
+            except BrokenProcessPool:
+                # A worker died (e.g. OOM-killed); start a fresh pool and retry once
+                self._restart(executor)
+                executor = self._get_executor()
+                future = executor.submit(fn, *args)
+        except BaseException:
+            self._release()
+            raise
+        # The slot is freed when the job leaves the pool, not when the caller
+        # stops waiting, so max_pending bounds the pool's real backlog
+        future.add_done_callback(self._release)
+        try:
+            result, started, took = future.result(timeout=self._timeout)
+        except FutureTimeout:
+            # Drop it from the queue if no worker has picked it up yet
+            future.cancel()
+            with self._lock:
+                self.counters["timeouts"] += 1
+            raise HasherBusy()
+        except BrokenProcessPool:
+            self._restart(executor)
+            raise
+
+        self.queue_wait[op].observe(max(0.0, started - submitted))
+        self.hash_time[op].observe(took)
+        return result
+
+    def _release(self, future=None):
+        with self._lock:
+            self._pending -= 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            pending = self._pending
+            counters = dict(self.counters)
+        return {
+            "workers": self._workers,
+            "rounds": self.rounds,
+            "target_ms": round(self._target * 1000),
+            "pending": pending,
+            "max_pending": self._max_pending,
+            **counters,
+            "queue_wait": {op: h.summary() for op, h in self.queue_wait.items()},
+            "hash_time": {op: h.summary() for op, h in self.hash_time.items()},
+        }
+
+
+def _default_workers() -> int:
+    if settings.PASSWORD_HASH_WORKERS is not None:
+        return settings.PASSWORD_HASH_WORKERS
+    return min(4, os.cpu_count() or 1)
+
+
+password_hasher = PasswordHasher(
+    workers=_default_workers(),
+    max_pending=settings.PASSWORD_HASH_MAX_PENDING,
+    timeout=settings.PASSWORD_HASH_TIMEOUT,
+    rounds=settings.PASSWORD_HASH_ROUNDS,
+    target_ms=settings.PASSWORD_HASH_TARGET_MS,
+)
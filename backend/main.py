@@ -1,18 +1,32 @@
+import asyncio
 import json
 import os
+from contextlib import asynccontextmanager
+from datetime import datetime, timezone
+from typing import Literal, Optional
 
-from fastapi import FastAPI, WebSocket, WebSocketDisconnect, Depends, Query
+from fastapi import FastAPI, HTTPException, Request, WebSocket, WebSocketDisconnect, Depends, Query
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.staticfiles import StaticFiles
-from fastapi.responses import FileResponse
+from fastapi.responses import PlainTextResponse
+from fastapi.security import HTTPAuthorizationCredentials
 import jwt
 from jwt.exceptions import PyJWTError
 from sqlalchemy.orm import Session
 
+from admission import AdmissionControlMiddleware, admission
+from audit import audit_writer
+from auth import get_current_admin, get_current_user, security
+from bootstrap import prepare_database
+from hashing import password_hasher
 from config import settings
-from database import engine, get_db, Base
+from database import engine, get_db
+from metrics import PrometheusText, RequestMetricsMiddleware
 from models import User, ListMember, ShoppingList
-from seed import seed_categories
+import profiler
+import sql_stats
+import telemetry
+from static_assets import StaticAssets
+import ws_codec
 from websocket_manager import manager
 from routers import (
     auth_router,
@@ -26,13 +40,22 @@ from routers import (
 # Ensure data directory exists
 os.makedirs("data", exist_ok=True)
 
-# Create tables
-Base.metadata.create_all(bind=engine)
 
-# Seed default categories
-db = next(get_db())
-seed_categories(db)
-db.close()
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Tables and default categories; skipped when the schema hasn't changed
+    prepare_database()
+    audit_writer.start()
+    password_hasher.start()
+    await manager.start()
+    if frontend is not None:
+        await asyncio.to_thread(frontend.load)
+    yield
+    await manager.stop()
+    password_hasher.shutdown()
+    # Flush queued audit entries before the process exits
+    await asyncio.to_thread(audit_writer.stop)
+
 
 app = FastAPI(
     title=settings.APP_NAME,
@@ -42,6 +65,7 @@ app = FastAPI(
     docs_url="/api/docs",
     redoc_url="/api/redoc",
     openapi_url="/api/openapi.json",
+    lifespan=lifespan,
 )
 
 # ─── CORS ───────────────────────────────────────────────────────────
@@ -56,6 +80,11 @@ app.add_middleware(
     allow_headers=["Authorization", "Content-Type"],
 )
 
+# ─── Admission control ─────────────────────────────────────────────
+# Per-principal request budgets and a global in-flight cap (see admission.py).
+# Added before the security headers so 429/503 responses get them too.
+app.add_middleware(AdmissionControlMiddleware, controller=admission)
+
 # ─── Security headers ──────────────────────────────────────────────
 
 @app.middleware("http")
@@ -69,6 +98,18 @@ async def add_security_headers(request, call_next):
     response.headers["Content-Security-Policy"] = "default-src 'self'; script-src 'self'; style-src 'self' 'unsafe-inline'; img-src 'self' data:; connect-src 'self' wss: ws:; font-src 'self'"
     return response
 
+# ─── SQL instrumentation ───────────────────────────────────────────
+# Query count and DB time per request (see sql_stats.py). Added after the
+# middleware above so it covers everything the request does.
+if settings.SQL_INSTRUMENTATION:
+    sql_stats.install(engine)
+    app.add_middleware(sql_stats.QueryStatsMiddleware)
+
+# ─── Request metrics ───────────────────────────────────────────────
+# Latency per route for /api/metrics. Outermost, so throttled and shed
+# requests are timed too.
+app.add_middleware(RequestMetricsMiddleware, metrics=telemetry.request_metrics)
+
 # ─── Routers ────────────────────────────────────────────────────────
 
 app.include_router(auth_router)
@@ -134,9 +175,12 @@ def ai_context(db: Session = Depends(get_db)):
             "items": {
                 "GET /api/lists/{id}/items": "Get all items in a list",
                 "POST /api/lists/{id}/items": "Add item to list",
+                "GET /api/lists/{id}/items/{item_id}": "Get a single item",
                 "PUT /api/lists/{id}/items/{item_id}": "Update an item",
                 "DELETE /api/lists/{id}/items/{item_id}": "Remove an item",
                 "POST /api/lists/{id}/items/clear-checked": "Clear checked items",
+                "POST /api/lists/{id}/items/import-recipe/jobs": "Import recipe URLs in the background",
+                "GET /api/lists/{id}/items/import-recipe/jobs/{job_id}": "Get recipe import job status",
             },
             "categories": {
                 "GET /api/categories": "List all categories",
@@ -148,7 +192,9 @@ def ai_context(db: Session = Depends(get_db)):
                 "GET /api/suggestions?q=": "Get item suggestions by name prefix",
             },
             "websocket": {
+                "WS /ws": "Real-time updates for several lists (auth, then {type:'subscribe', list_id:'...'})",
                 "WS /ws/{list_id}": "Real-time updates (send {type:'auth', token:'...'} as first message)",
+                "GET /api/lists/{id}/events": "Real-time updates as Server-Sent Events; works with API keys (resume with Last-Event-ID)",
             },
         },
     }
@@ -156,24 +202,73 @@ def ai_context(db: Session = Depends(get_db)):
 
 # ─── WebSocket ──────────────────────────────────────────────────────
 
-@app.websocket("/ws/{list_id}")
-async def websocket_endpoint(
-    websocket: WebSocket,
-    list_id: str,
-    token: str = Query(None),
+@app.get("/api/ws/stats", tags=["Health"])
+def websocket_stats(admin: User = Depends(get_current_admin)):
+    """Live WebSocket connection counts and outbound queue lengths (admin only)."""
+    return manager.stats()
+
+
+@app.get("/api/admission/stats", tags=["Health"])
+def admission_stats(admin: User = Depends(get_current_admin)):
+    """Requests in flight and counts of throttled (429) and shed (503) requests (admin only)."""
+    return admission.stats()
+
+
+@app.get("/api/sql/stats", tags=["Health"])
+def sql_statistics(admin: User = Depends(get_current_admin)):
+    """Queries and DB time per request, and requests with repeated statements (admin only)."""
+    return sql_stats.stats()
+
+
+@app.get("/api/metrics", tags=["Health"], response_class=PlainTextResponse)
+def prometheus_metrics(
+    request: Request,
+    credentials: Optional[HTTPAuthorizationCredentials] = Depends(security),
+    db: Session = Depends(get_db),
 ):
-    # Accept the connection first so the client can send auth as a message
-    # instead of leaking the JWT in query-string logs.
-    # Backwards-compatible: token-in-query-string still works.
-    await websocket.accept()
+    """Metrics in the Prometheus text format (admin, or a client in METRICS_ALLOW_FROM)."""
+    if not telemetry.scrape_allowed(request.client.host if request.client else None):
+        get_current_admin(get_current_user(credentials, db))
+    return PlainTextResponse(telemetry.render(), media_type=PrometheusText.CONTENT_TYPE)
+
+
+@app.get("/api/profile", tags=["Health"], response_class=PlainTextResponse)
+async def profile_process(
+    mode: Literal["cpu", "memory"] = "cpu",
+    seconds: float = Query(10, gt=0, le=profiler.MAX_SECONDS),
+    interval_ms: int = Query(10, ge=1, le=1000),
+    idle: bool = False,
+    admin: User = Depends(get_current_admin),
+):
+    """Profile the live process for a few seconds; returns collapsed stacks for a flame graph (admin only)."""
+    try:
+        stacks = await profiler.profile(mode, seconds, interval_ms / 1000, idle=idle)
+    except profiler.ProfilerBusy:
+        raise HTTPException(status_code=409, detail="A profile is already running")
+    stamp = datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%SZ")
+    return PlainTextResponse(
+        stacks,
+        headers={"Content-Disposition": f'attachment; filename="profile-{mode}-{stamp}.folded"'},
+    )
+
+
+# Lists a single multiplexed socket may follow at once
+_WS_MAX_SUBSCRIPTIONS = 50
 
+
+async def _authenticate_websocket(websocket: WebSocket, token: str | None) -> str | None:
+    """Resolve the user id for an accepted socket, closing it with 4001 on failure.
+
+    The token comes from the query string (legacy) or the first message,
+    which may be {"type": "auth", "token": "..."} or a bare token string.
+    """
     auth_token = token
     if not auth_token:
         try:
             first_msg = await websocket.receive_text()
         except Exception:
             await websocket.close(code=4001)
-            return
+            return None
         # Accept {"type": "auth", "token": "..."} or a bare token string
         try:
             parsed = json.loads(first_msg)
@@ -183,67 +278,160 @@ async def websocket_endpoint(
 
     if not auth_token:
         await websocket.close(code=4001)
-        return
+        return None
 
     # Validate JWT
     try:
         payload = jwt.decode(auth_token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM])
         user_id = payload.get("sub")
-        if not user_id:
-            await websocket.close(code=4001)
-            return
     except PyJWTError:
+        user_id = None
+    if not user_id:
         await websocket.close(code=4001)
-        return
+        return None
 
-    # Verify list access
+    if not await asyncio.to_thread(_active_user_exists, user_id):
+        await websocket.close(code=4001)
+        return None
+    return user_id
+
+
+# The socket handlers run on the event loop; their queries go to a thread so
+# waiting for a pooled connection can't stall every other request.
+
+def _active_user_exists(user_id: str) -> bool:
     db = next(get_db())
     try:
-        user = db.query(User).filter(User.id == user_id, User.is_active == True).first()
-        if not user:
-            await websocket.close(code=4001)
-            return
+        return db.query(User.id).filter(User.id == user_id, User.is_active == True).first() is not None
+    finally:
+        db.close()
+
 
+def _websocket_list_access(user_id: str, list_id: str) -> int | None:
+    """Return None if the user may follow the list, otherwise a close/error code."""
+    db = next(get_db())
+    try:
         lst = db.query(ShoppingList).filter(ShoppingList.id == list_id).first()
         if not lst:
-            await websocket.close(code=4004)
-            return
+            return 4004
 
         has_access = lst.owner_id == user_id or db.query(ListMember).filter(
             ListMember.list_id == list_id,
             ListMember.user_id == user_id,
         ).first() is not None
-
-        if not has_access:
-            await websocket.close(code=4003)
-            return
+        return None if has_access else 4003
     finally:
         db.close()
 
-    await websocket.send_text(json.dumps({"type": "auth_ok"}))
-    manager.active_connections[list_id].add(websocket)
+
+async def _websocket_receive_loop(websocket: WebSocket, user_id: str | None = None):
+    """Answer pings and, when user_id is given, subscribe/unsubscribe requests."""
     try:
         while True:
             data = await websocket.receive_text()
+            manager.touch(websocket)
             if data == "ping":
-                await websocket.send_text("pong")
+                manager.send_control(websocket, "pong")
+                continue
+            if user_id is None:
+                continue
+            try:
+                msg = json.loads(data)
+            except json.JSONDecodeError:
+                continue
+            if not isinstance(msg, dict) or not isinstance(msg.get("list_id"), str):
+                continue
+
+            list_id = msg["list_id"]
+            if msg.get("type") == "subscribe":
+                error = await asyncio.to_thread(_websocket_list_access, user_id, list_id)
+                if error is None and manager.subscription_count(websocket) >= _WS_MAX_SUBSCRIPTIONS:
+                    error = 4029
+                if error is None:
+                    # Subscribe, acknowledge and replay without yielding so no
+                    # event slips in between; replayed frames follow "subscribed".
+                    # Its seq is where the client resumes from, even for a list
+                    # that never gets an event before the next reconnect.
+                    manager.subscribe(websocket, list_id)
+                    manager.send_control(
+                        websocket, json.dumps({"type": "subscribed", "list_id": list_id, "seq": manager.seq})
+                    )
+                    last_seq = msg.get("last_seq")
+                    caught_up = not isinstance(last_seq, int) or manager.replay(
+                        websocket, list_id, last_seq, str(msg.get("epoch"))
+                    )
+                    if not caught_up:
+                        manager.send_control(websocket, json.dumps({"type": "resync", "list_id": list_id}))
+                else:
+                    manager.send_control(websocket, json.dumps({"type": "error", "list_id": list_id, "code": error}))
+            elif msg.get("type") == "unsubscribe":
+                manager.unsubscribe(websocket, list_id)
+                manager.send_control(websocket, json.dumps({"type": "unsubscribed", "list_id": list_id}))
     except WebSocketDisconnect:
-        manager.disconnect(websocket, list_id)
+        manager.disconnect(websocket)
     except Exception:
-        manager.disconnect(websocket, list_id)
+        manager.disconnect(websocket)
+
+
+def _websocket_auth_ok(encoding: str) -> str:
+    return json.dumps({"type": "auth_ok", "epoch": manager.epoch, "encoding": encoding})
+
+
+@app.websocket("/ws")
+async def multiplexed_websocket_endpoint(
+    websocket: WebSocket,
+    encoding: str = Query(None),
+):
+    """One socket per client: authenticate once, then subscribe to any number of lists.
+
+    Pass ?encoding=msgpack to receive events as binary MessagePack frames.
+    """
+    await websocket.accept()
+    user_id = await _authenticate_websocket(websocket, None)
+    if not user_id:
+        return
+
+    encoding = ws_codec.negotiate(encoding)
+    await websocket.send_text(_websocket_auth_ok(encoding))
+    manager.register(websocket, encoding=encoding)
+    await _websocket_receive_loop(websocket, user_id)
+
+
+@app.websocket("/ws/{list_id}")
+async def websocket_endpoint(
+    websocket: WebSocket,
+    list_id: str,
+    token: str = Query(None),
+    encoding: str = Query(None),
+):
+    # Accept the connection first so the client can send auth as a message
+    # instead of leaking the JWT in query-string logs.
+    # Backwards-compatible: token-in-query-string still works.
+    await websocket.accept()
+    user_id = await _authenticate_websocket(websocket, token)
+    if not user_id:
+        return
+
+    # Verify list access
+    error = await asyncio.to_thread(_websocket_list_access, user_id, list_id)
+    if error is not None:
+        await websocket.close(code=error)
+        return
+
+    encoding = ws_codec.negotiate(encoding)
+    await websocket.send_text(_websocket_auth_ok(encoding))
+    manager.register(websocket, list_id, encoding=encoding)
+    await _websocket_receive_loop(websocket)
 
 
 # ─── Serve Frontend (must be last) ─────────────────────────────────
 
+# Files are looked up in an index built at startup (see static_assets.py),
+# so only files that exist under static/ can be served.
 static_dir = os.path.join(os.path.dirname(__file__), "static")
-if os.path.exists(static_dir):
-    app.mount("/assets", StaticFiles(directory=os.path.join(static_dir, "assets")), name="assets")
-
-    @app.get("/{full_path:path}")
-    async def serve_frontend(full_path: str):
-        # Resolve the path and ensure it stays within static_dir (prevent traversal)
-        resolved = os.path.realpath(os.path.join(static_dir, full_path))
-        static_real = os.path.realpath(static_dir)
-        if resolved.startswith(static_real + os.sep) and os.path.isfile(resolved):
-            return FileResponse(resolved)
-        return FileResponse(os.path.join(static_dir, "index.html"))
+frontend = StaticAssets(static_dir) if os.path.exists(static_dir) else None
+if frontend is not None:
+
+    @app.api_route("/{full_path:path}", methods=["GET", "HEAD"])
+    def serve_frontend(full_path: str, request: Request):
+        return frontend.response(full_path, request.headers)
@@ -0,0 +1,167 @@
+"""Small in-process metric primitives and Prometheus text rendering."""
+
+import bisect
+import math
+import time
+from threading import Lock
+
+# Seconds; suits anything from a cache hit to a slow bcrypt hash
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+# Seconds; for work that is usually microseconds but can stall (fan-out, pool checkout)
+FINE_BUCKETS = (0.00001, 0.00005, 0.0001, 0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0)
+
+
+class Histogram:
+    """Cumulative-bucket histogram of observed durations, Prometheus style."""
+
+    def __init__(self, buckets: tuple[float, ...] = DEFAULT_BUCKETS):
+        self.buckets = tuple(sorted(buckets))
+        self._counts = [0] * (len(self.buckets) + 1)  # last slot is +Inf
+        self._sum = 0.0
+        self._count = 0
+        self._max = 0.0
+        self._lock = Lock()
+
+    def observe(self, value: float):
+        with self._lock:
+            self._counts[bisect.bisect_left(self.buckets, value)] += 1
+            self._sum += value
+            self._count += 1
+            if value > self._max:
+                self._max = value
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            cumulative, running = [], 0
+            for count in self._counts:
+                running += count
+                cumulative.append(running)
+            return {
+                "count": self._count,
+                "sum": self._sum,
+                "max": self._max,
+                "buckets": dict(zip([*self.buckets, float("inf")], cumulative)),
+            }
+
+    def summary(self) -> dict:
+        """Count, mean and max in milliseconds, for JSON stats endpoints."""
+        with self._lock:
+            mean = self._sum / self._count if self._count else 0.0
+            return {
+                "count": self._count,
+                "mean_ms": round(mean * 1000, 2),
+                "max_ms": round(self._max * 1000, 2),
+            }
+
+
+# ─── Request metrics ────────────────────────────────────────────────
+
+class RequestMetrics:
+    """Latency per route, method and status, and HTTP requests in flight."""
+
+    def __init__(self):
+        self.latency: dict[tuple[str, str, str], Histogram] = {}
+        self.in_flight = 0
+
+    def observe(self, method: str, route: str, status: int, seconds: float):
+        key = (method, route, str(status))
+        histogram = self.latency.get(key)
+        if histogram is None:
+            histogram = self.latency.setdefault(key, Histogram())
+        histogram.observe(seconds)
+
+
+class RequestMetricsMiddleware:
+    """Times every HTTP request, labelled by route template rather than raw path."""
+
+    def __init__(self, app, metrics: RequestMetrics):
+        self.app = app
+        self.metrics = metrics
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status = 500
+
+        async def send_and_record(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        self.metrics.in_flight += 1
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_and_record)
+        finally:
+            self.metrics.in_flight -= 1
+            # The router records the matched route in the scope; unmatched paths
+            # share one label so scanners can't blow up the series count
+            route = getattr(scope.get("route"), "path", None) or "unmatched"
+            self.metrics.observe(scope["method"], route, status, time.perf_counter() - started)
+
+
+# ─── Prometheus text format ─────────────────────────────────────────
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(labels: dict) -> str:
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in labels.items()) + "}"
+
+
+def _format_value(value) -> str:
+    if isinstance(value, float) and math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    return repr(float(value)) if isinstance(value, float) else str(int(value))
+
+
+class PrometheusText:
+    """Builds a scrape response in Prometheus' text exposition format (0.0.4)."""
+
+    CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+    def __init__(self, prefix: str = ""):
+        self._prefix = prefix
+        self._lines: list[str] = []
+
+    def _family(self, name: str, kind: str, help: str) -> str:
+        name = self._prefix + name
+        self._lines.append(f"# HELP {name} {help}")
+        self._lines.append(f"# TYPE {name} {kind}")
+        return name
+
+    def _samples(self, name: str, kind: str, help: str, samples):
+        name = self._family(name, kind, help)
+        if isinstance(samples, (int, float)):
+            samples = [({}, samples)]
+        for labels, value in samples:
+            self._lines.append(f"{name}{_format_labels(labels)} {_format_value(value)}")
+
+    def counter(self, name: str, help: str, samples):
+        """samples: a number, or (labels, value) pairs."""
+        self._samples(name, "counter", help, samples)
+
+    def gauge(self, name: str, help: str, samples):
+        self._samples(name, "gauge", help, samples)
+
+    def histogram(self, name: str, help: str, series):
+        """series: a Histogram, or (labels, Histogram) pairs."""
+        name = self._family(name, "histogram", help)
+        if isinstance(series, Histogram):
+            series = [({}, series)]
+        for labels, histogram in series:
+            snapshot = histogram.snapshot()
+            for bound, count in snapshot["buckets"].items():
+                le = _format_labels({**labels, "le": _format_value(float(bound))})
+                self._lines.append(f"{name}_bucket{le} {count}")
+            self._lines.append(f"{name}_sum{_format_labels(labels)} {_format_value(float(snapshot['sum']))}")
+            self._lines.append(f"{name}_count{_format_labels(labels)} {snapshot['count']}")
+
+    def render(self) -> str:
+        return "\n".join(self._lines) + "\n"
@@ -0,0 +1,89 @@
+"""Versioned, forward-only schema migrations.
+
+create_all only creates missing tables; it never touches a table that
+already exists, so an index or column added to a model would silently never
+reach a live database. Changes like that go here as numbered migrations.
+
+The applied version is kept in schema_meta. A brand-new database gets every
+table from the models, which already include every migration, so it is just
+stamped with the latest version. An existing one has each pending migration
+applied in order, each in its own transaction together with the version
+bump, so a failure leaves it at the last good version. Steps should still be
+safe to repeat (``IF NOT EXISTS``). Migrations are never edited or removed
+once released; fix mistakes with a new one.
+
+When adding a migration, make the same change to models.py so new and
+migrated databases end up identical (bench/explain_index_pack.py checks).
+"""
+
+from sqlalchemy import Column, MetaData, String, Table, delete, insert, select, text
+from sqlalchemy.engine import Connection
+
+# Small key/value table for schema bookkeeping. Kept off Base.metadata so
+# it isn't part of the model fingerprint.
+meta = MetaData()
+schema_meta = Table(
+    "schema_meta",
+    meta,
+    Column("key", String(50), primary_key=True),
+    Column("value", String(200), nullable=False),
+)
+
+VERSION_KEY = "schema_version"
+
+# (version, description, SQL statements)
+MIGRATIONS: list[tuple[int, str, list[str]]] = [
+    (1, "performance index pack", [
+        # _get_user_lists, access checks and delete_user look up memberships by
+        # user; uq_list_member leads with list_id so it can't serve those.
+        # list_id is included so the membership subquery is index-only.
+        "CREATE INDEX IF NOT EXISTS ix_list_members_user ON list_members (user_id, list_id)",
+        # Lists owned by a user (_get_user_lists, delete_user); id makes the
+        # owned-ids half of the union index-only
+        "CREATE INDEX IF NOT EXISTS ix_shopping_lists_owner ON shopping_lists (owner_id, id)",
+        # delete_user reassigns/clears a user's items across every list
+        "CREATE INDEX IF NOT EXISTS ix_list_items_added_by ON list_items (added_by)",
+        "CREATE INDEX IF NOT EXISTS ix_list_items_checked_by ON list_items (checked_by)",
+        # Every API-key request looks its key up by hash
+        "CREATE INDEX IF NOT EXISTS ix_api_keys_key_hash ON api_keys (key_hash)",
+    ]),
+]
+
+LATEST_VERSION = MIGRATIONS[-1][0] if MIGRATIONS else 0
+
+
+def current_version(conn: Connection) -> int:
+    value = conn.execute(
+        select(schema_meta.c.value).where(schema_meta.c.key == VERSION_KEY)
+    ).scalar()
+    return int(value) if value is not None else 0
+
+
+def _set_version(conn: Connection, version: int):
+    conn.execute(delete(schema_meta).where(schema_meta.c.key == VERSION_KEY))
+    conn.execute(insert(schema_meta).values(key=VERSION_KEY, value=str(version)))
+
+
+def stamp(bind, version: int = LATEST_VERSION):
+    """Record version as applied without running anything (for new databases)."""
+    meta.create_all(bind=bind)
+    with bind.begin() as conn:
+        _set_version(conn, version)
+
+
+def migrate(bind, target: int = LATEST_VERSION) -> list[int]:
+    """Apply every migration above the current version up to target; returns those applied."""
+    meta.create_all(bind=bind)
+    with bind.connect() as conn:
+        version = current_version(conn)
+
+    applied = []
+    for number, _description, statements in MIGRATIONS:
+        if number <= version or number > target:
+            continue
+        with bind.begin() as conn:
+            for statement in statements:
+                conn.execute(text(statement))
+            _set_version(conn, number)
+        applied.append(number)
+    return applied
@@ -60,6 +60,10 @@ class ShoppingList(Base):
     members = relationship("ListMember", back_populates="shopping_list", cascade="all, delete-orphan")
     items = relationship("ListItem", back_populates="shopping_list", cascade="all, delete-orphan")
 
+    __table_args__ = (
+        Index("ix_shopping_lists_owner", "owner_id", "id"),
+    )
+
 
 class ListMember(Base):
     __tablename__ = "list_members"
@@ -75,6 +79,7 @@ class ListMember(Base):
 
     __table_args__ = (
         UniqueConstraint("list_id", "user_id", name="uq_list_member"),
+        Index("ix_list_members_user", "user_id", "list_id"),
     )
 
 
@@ -103,9 +108,9 @@ class ListItem(Base):
     unit = Column(String(30), default="")
     category_id = Column(String, ForeignKey("categories.id"), nullable=True)
     checked = Column(Boolean, default=False)
-    checked_by = Column(String, ForeignKey("users.id"), nullable=True)
+    checked_by = Column(String, ForeignKey("users.id"), nullable=True, index=True)
     checked_at = Column(DateTime, nullable=True)
-    added_by = Column(String, ForeignKey("users.id"), nullable=False)
+    added_by = Column(String, ForeignKey("users.id"), nullable=False, index=True)
     notes = Column(Text, default="")
     sort_order = Column(Integer, default=0)
     created_at = Column(DateTime, default=utcnow)
@@ -144,7 +149,7 @@ class ApiKey(Base):
 
     id = Column(String, primary_key=True, default=generate_uuid)
     user_id = Column(String, ForeignKey("users.id"), nullable=False)
-    key_hash = Column(String(255), nullable=False)
+    key_hash = Column(String(255), nullable=False, index=True)
     key_prefix = Column(String(11), nullable=False)  # "kc_" + first 8 chars
     name = Column(String(100), nullable=False)
     scopes = Column(Text, default="read,write")  # comma-separated
@@ -167,6 +172,15 @@ class AuditLog(Base):
     created_at = Column(DateTime, default=utcnow, index=True)
 
 
+class AuditRollup(Base):
+    """Per-day, per-action counts of audit entries that have been pruned."""
+    __tablename__ = "audit_rollups"
+
+    day = Column(String(10), primary_key=True)  # YYYY-MM-DD (UTC)
+    action = Column(String(100), primary_key=True)
+    count = Column(Integer, nullable=False, default=0)
+
+
 class InviteCode(Base):
     __tablename__ = "invite_codes"
 
@@ -177,3 +191,14 @@ class InviteCode(Base):
     is_used = Column(Boolean, default=False)
     created_at = Column(DateTime, default=utcnow)
     expires_at = Column(DateTime, nullable=True)
+
+
+class RecipeImportJobState(Base):
+    """Latest state of a background recipe import, so any worker can answer a poll."""
+    __tablename__ = "recipe_import_jobs"
+
+    id = Column(String, primary_key=True)
+    list_id = Column(String, nullable=False)
+    # RecipeImportJobOut as JSON
+    snapshot = Column(Text, nullable=False)
+    created_at = Column(DateTime, default=utcnow, index=True)
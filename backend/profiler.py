@@ -0,0 +1,139 @@
+"""On-demand profiling of the running process, for GET /api/profile.
+
+Two modes, both producing collapsed stacks ("frame;frame;frame weight" per
+line), the input format of flamegraph.pl, speedscope and inferno:
+
+- cpu: a background thread snapshots every thread's stack with
+  sys._current_frames() each interval. The weight is the sample count.
+  Threads parked in a wait (idle pool workers, the event loop's select)
+  are left out unless idle is asked for. Nothing is installed in the
+  code being profiled, so the cost is the sampler's own CPU time.
+- memory: tracemalloc traces allocations for the duration. The weight is
+  the bytes allocated in the window and still alive at the end, per
+  allocation traceback. tracemalloc slows every allocation down while it
+  runs, so use it for memory questions only.
+
+bcrypt runs in worker processes (see hashing.py), so its CPU time doesn't
+show up here; /api/metrics has the password hashing histograms.
+
+One profile runs at a time.
+"""
+
+import asyncio
+import os
+import sys
+import threading
+import tracemalloc
+from collections import Counter
+
+MAX_SECONDS = 60
+# Frames kept per tracemalloc traceback
+MEMORY_FRAMES = 30
+
+# Leaf frames in these modules mean the thread is waiting, not working
+_IDLE_MODULES = {"threading", "selectors", "queue"}
+_IDLE_LEAVES = {"concurrent.futures.thread:_worker"}
+
+_running = threading.Lock()
+
+
+class ProfilerBusy(Exception):
+    """Another profile is already running."""
+
+
+def _label(frame) -> str:
+    return f"{frame.f_globals.get('__name__', '?')}:{frame.f_code.co_qualname}"
+
+
+def _short_path(filename: str) -> str:
+    for path in sorted(filter(None, sys.path), key=len, reverse=True):
+        if filename.startswith(path + os.sep):
+            return filename[len(path) + 1:]
+    return filename
+
+
+def _collapse(stacks: Counter) -> str:
+    return "".join(f"{stack} {weight}\n" for stack, weight in stacks.most_common())
+
+
+class StackSampler:
+    """Counts the stacks of every thread at a fixed interval."""
+
+    def __init__(self, interval: float, idle: bool = False):
+        self.interval = interval
+        self.idle = idle
+        self.samples = 0
+        self.stacks: Counter[str] = Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="profiler", daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self._sample()
+
+    def _sample(self):
+        names = {thread.ident: thread.name for thread in threading.enumerate()}
+        me = threading.get_ident()
+        self.samples += 1
+        for ident, frame in sys._current_frames().items():
+            if ident == me:
+                continue
+            stack = []
+            while frame is not None:
+                stack.append(_label(frame))
+                frame = frame.f_back
+            leaf = stack[0]
+            if not self.idle and (leaf.split(":", 1)[0] in _IDLE_MODULES or leaf in _IDLE_LEAVES):
+                continue
+            stack.append(names.get(ident, f"thread-{ident}"))
+            self.stacks[";".join(reversed(stack))] += 1
+
+    def collapsed(self) -> str:
+        return _collapse(self.stacks)
+
+
+def _allocations(snapshot: tracemalloc.Snapshot) -> str:
+    snapshot = snapshot.filter_traces([
+        tracemalloc.Filter(False, tracemalloc.__file__),
+        tracemalloc.Filter(False, __file__),
+    ])
+    stacks: Counter[str] = Counter()
+    for stat in snapshot.statistics("traceback"):
+        # Traceback frames run from the oldest call to the allocation
+        stack = ";".join(f"{_short_path(f.filename)}:{f.lineno}" for f in stat.traceback)
+        stacks[stack] += stat.size
+    return _collapse(stacks)
+
+
+async def profile(mode: str, seconds: float, interval: float = 0.01, idle: bool = False) -> str:
+    """Profile the whole process for seconds; returns collapsed stacks."""
+    if not _running.acquire(blocking=False):
+        raise ProfilerBusy()
+    try:
+        if mode == "memory":
+            started = not tracemalloc.is_tracing()
+            if started:
+                tracemalloc.start(MEMORY_FRAMES)
+            try:
+                await asyncio.sleep(seconds)
+                return _allocations(tracemalloc.take_snapshot())
+            finally:
+                if started:
+                    tracemalloc.stop()
+
+        sampler = StackSampler(interval, idle=idle)
+        sampler.start()
+        try:
+            await asyncio.sleep(seconds)
+        finally:
+            await asyncio.to_thread(sampler.stop)
+        return sampler.collapsed()
+    finally:
+        _running.release()
@@ -1,52 +1,226 @@
-"""In-memory sliding-window rate limiter."""
+"""GCRA rate limiter with constant state per key.
 
+Each key stores a single number, its theoretical arrival time (TAT): the
+moment its budget will be completely refilled. Allowing ``max_attempts`` per
+``window`` means every attempt pushes the TAT forward by
+``window / max_attempts``, and an attempt is refused when that would put the
+TAT more than ``window`` into the future. A key whose TAT has passed has its
+full budget again, which is exactly the state of a key we've never seen, so
+idle keys can be forgotten at any time.
+
+State lives in a store:
+
+- ``MemoryRateLimitStore``: per process, LRU-ordered, bounded to
+  ``max_keys``, with idle keys swept as they expire.
+- ``SQLiteRateLimitStore``: one small table shared by every worker process,
+  so ``uvicorn --workers N`` doesn't multiply the allowed attempts.
+"""
+
+import math
+import os
+import sqlite3
 import time
-from collections import defaultdict
+from collections import OrderedDict
 from threading import Lock
+from typing import Callable, Optional
 
 from config import settings
 
+# Given a key's current TAT (None if unknown), return its new TAT (None to
+# forget it) and a result to hand back to the caller.
+Update = Callable[[Optional[float]], tuple[Optional[float], object]]
 
-class RateLimiter:
-    """Tracks timestamped attempts per key and rejects when a threshold is exceeded."""
 
-    def __init__(self, window: int, max_attempts: int):
-        self._window = window
-        self._max_attempts = max_attempts
-        self._attempts: dict[str, list[float]] = defaultdict(list)
+class MemoryRateLimitStore:
+    """In-process TATs, evicting idle keys first and least-recently-used ones past max_keys."""
+
+    def __init__(self, max_keys: int = 100_000):
+        self._max_keys = max_keys
+        # "scope\0key" -> TAT, least recently updated first. One order across
+        # every scope, so max_keys evicts whichever keys have been idle longest
+        # rather than emptying the scope that happened to cross the limit. A
+        # joined string costs a few bytes per key; a tuple would cost ~65.
+        self._tats: OrderedDict[str, float] = OrderedDict()
         self._lock = Lock()
+        self.counters = {"evicted_idle": 0, "evicted_lru": 0}
 
-    def _prune(self, key: str, now: float) -> list[float]:
-        """Remove attempts outside the current window and return what remains."""
-        self._attempts[key] = [
-            t for t in self._attempts[key] if now - t < self._window
-        ]
-        return self._attempts[key]
+    def __len__(self) -> int:
+        return len(self._tats)
 
-    def is_rate_limited(self, key: str) -> bool:
+    def get(self, scope: str, key: str) -> Optional[float]:
+        return self._tats.get(f"{scope}\0{key}")
+
+    def update(self, scope: str, key: str, now: float, fn: Update):
         with self._lock:
-            return len(self._prune(key, time.time())) >= self._max_attempts
+            tats = self._tats
+            entry = f"{scope}\0{key}"
+            tat, result = fn(tats.get(entry))
+            if tat is None or tat <= now:
+                tats.pop(entry, None)
+            else:
+                tats[entry] = tat
+                tats.move_to_end(entry)
+            self._evict(now)
+            return result
 
-    def record_attempt(self, key: str):
+    def _evict(self, now: float):
+        # The front holds the least recently updated keys; most have expired
+        tats = self._tats
+        while tats:
+            entry, tat = next(iter(tats.items()))
+            if tat <= now:
+                self.counters["evicted_idle"] += 1
+            elif len(tats) > self._max_keys:
+                self.counters["evicted_lru"] += 1
+            else:
+                return
+            del tats[entry]
+
+
+class SQLiteRateLimitStore:
+    """TATs in a SQLite table shared by every worker process on the host."""
+
+    # Expired rows are deleted after this many updates
+    _PRUNE_EVERY = 1000
+
+    def __init__(self, path: str):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute("PRAGMA busy_timeout=5000")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS rate_limits ("
+            " scope TEXT NOT NULL,"
+            " key TEXT NOT NULL,"
+            " tat REAL NOT NULL,"
+            " PRIMARY KEY (scope, key)) WITHOUT ROWID"
+        )
+        self._lock = Lock()
+        self._updates = 0
+        self.counters = {"evicted_idle": 0, "evicted_lru": 0}
+
+    def __len__(self) -> int:
         with self._lock:
-            self._attempts[key].append(time.time())
+            return self._conn.execute("SELECT COUNT(*) FROM rate_limits").fetchone()[0]
+
+    def get(self, scope: str, key: str) -> Optional[float]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT tat FROM rate_limits WHERE scope = ? AND key = ?", (scope, key)
+            ).fetchone()
+        return row[0] if row else None
+
+    def update(self, scope: str, key: str, now: float, fn: Update):
+        with self._lock:
+            conn = self._conn
+            # IMMEDIATE takes the write lock up front, so the read-modify-write
+            # is atomic across processes too
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                row = conn.execute(
+                    "SELECT tat FROM rate_limits WHERE scope = ? AND key = ?", (scope, key)
+                ).fetchone()
+                tat, result = fn(row[0] if row else None)
+                if tat is None or tat <= now:
+                    if row:
+                        conn.execute(
+                            "DELETE FROM rate_limits WHERE scope = ? AND key = ?", (scope, key)
+                        )
+                else:
+                    conn.execute(
+                        "INSERT INTO rate_limits (scope, key, tat) VALUES (?, ?, ?)"
+                        " ON CONFLICT (scope, key) DO UPDATE SET tat = excluded.tat",
+                        (scope, key, tat),
+                    )
+                self._updates += 1
+                if self._updates % self._PRUNE_EVERY == 0:
+                    pruned = conn.execute("DELETE FROM rate_limits WHERE tat <= ?", (now,))
+                    self.counters["evicted_idle"] += pruned.rowcount
+                conn.execute("COMMIT")
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+            return result
+
+
+class RateLimiter:
+    """Allows max_attempts per window for each key, refilling steadily (GCRA)."""
+
+    def __init__(self, window: int, max_attempts: int, store=None, scope: str = "default"):
+        self._window = float(window)
+        self._interval = self._window / max_attempts
+        self._store = store if store is not None else MemoryRateLimitStore()
+        self.scope = scope
+        # Unsynchronised: an occasional lost increment is fine for telemetry
+        self.counters = {"attempts": 0, "limited": 0}
+
+    def _wait(self, tat: Optional[float], now: float) -> float:
+        """Seconds until one more attempt would be allowed."""
+        if tat is None:
+            return 0.0
+        return max(0.0, tat + self._interval - self._window - now)
+
+    def is_rate_limited(self, key: str) -> bool:
+        limited = self._wait(self._store.get(self.scope, key), time.time()) > 0
+        if limited:
+            self.counters["limited"] += 1
+        return limited
+
+    def record_attempt(self, key: str):
+        self.counters["attempts"] += 1
+        now = time.time()
+        self._store.update(
+            self.scope, key, now, lambda tat: (max(tat or now, now) + self._interval, None)
+        )
 
     def remaining_seconds(self, key: str) -> int:
-        """Seconds until the oldest attempt in the window expires."""
+        """Seconds until the key may make another attempt."""
+        return math.ceil(self._wait(self._store.get(self.scope, key), time.time()))
+
+    def acquire(self, key: str) -> int:
+        """Record an attempt if the key is within its budget.
+
+        Returns 0 when the attempt was allowed, otherwise the whole seconds
+        to wait; a refused attempt doesn't use up any budget.
+        """
         now = time.time()
-        with self._lock:
-            attempts = self._prune(key, now)
-            if not attempts:
-                return 0
-            return int(self._window - (now - attempts[0])) + 1
 
+        def take(tat):
+            wait = self._wait(tat, now)
+            if wait > 0:
+                return tat, math.ceil(wait)
+            return max(tat or now, now) + self._interval, 0
+
+        wait = self._store.update(self.scope, key, now, take)
+        self.counters["limited" if wait else "attempts"] += 1
+        return wait
+
+
+def create_store(name: str, sqlite_path: str, max_keys: int):
+    if name == "sqlite":
+        return SQLiteRateLimitStore(sqlite_path)
+    return MemoryRateLimitStore(max_keys=max_keys)
+
+
+rate_limit_store = create_store(
+    settings.RATE_LIMIT_BACKEND,
+    settings.RATE_LIMIT_SQLITE_PATH,
+    settings.RATE_LIMIT_MAX_KEYS,
+)
 
 login_limiter = RateLimiter(
     window=settings.LOGIN_RATE_LIMIT_WINDOW,
     max_attempts=settings.LOGIN_RATE_LIMIT_MAX,
+    store=rate_limit_store,
+    scope="login",
 )
 
 register_limiter = RateLimiter(
     window=settings.REGISTER_RATE_LIMIT_WINDOW,
     max_attempts=settings.REGISTER_RATE_LIMIT_MAX,
+    store=rate_limit_store,
+    scope="register",
 )
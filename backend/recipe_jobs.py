@@ -0,0 +1,252 @@
+"""Background recipe import jobs.
+
+A job takes a batch of recipe URLs and fetches them concurrently under one
+process-wide concurrency limit, broadcasting per-URL progress to the list's
+WebSocket subscribers. Once every URL has settled, the successful recipes are
+handed to a callback that writes all their ingredients in a single
+transaction. Job state is kept in memory; finished jobs are evicted
+oldest-first.
+
+Under uvicorn --workers a poll can reach a worker that never saw the job,
+so every state change is also written to the recipe_import_jobs table,
+where any worker can read it. Those rows are deleted after a day.
+
+Jobs that haven't finished are capped, overall and per user, so a client
+can't pile up work behind the fetch semaphore: submit() raises
+RecipeImportBusy instead.
+"""
+
+import asyncio
+import secrets
+from collections import Counter, OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta
+from typing import Callable, Optional
+
+from sqlalchemy.exc import SQLAlchemyError
+
+from config import settings
+from database import SessionLocal
+from models import RecipeImportJobState, utcnow
+from recipe_parser import fetch_recipe
+from schemas import RecipeImportJobOut
+from websocket_manager import manager
+
+# Shared job rows older than this are deleted as new jobs are recorded
+SHARED_RETENTION = timedelta(days=1)
+
+
+@dataclass
+class RecipeUrlResult:
+    url: str
+    status: str = "pending"  # pending, ok, error
+    title: Optional[str] = None
+    ingredient_count: int = 0
+    error: Optional[str] = None
+    recipe: Optional[dict] = field(default=None, repr=False)
+
+
+@dataclass
+class RecipeImportJob:
+    id: str
+    list_id: str
+    user_id: str
+    username: str
+    results: list[RecipeUrlResult]
+    status: str = "pending"  # pending, running, completed, failed
+    added_count: int = 0
+    error: Optional[str] = None
+    created_at: datetime = field(default_factory=utcnow)
+    finished_at: Optional[datetime] = None
+
+    @property
+    def completed(self) -> int:
+        return sum(1 for r in self.results if r.status != "pending")
+
+    @property
+    def done(self) -> bool:
+        return self.status in ("completed", "failed")
+
+
+class RecipeImportBusy(Exception):
+    """Too many import jobs are already queued or running."""
+
+    def __init__(self, per_user: bool):
+        super().__init__()
+        # True when the caller's own limit was hit, False for the global one
+        self.per_user = per_user
+
+
+def _write_state(job_id: str, list_id: str, snapshot: str, created_at: datetime, new: bool):
+    db = SessionLocal()
+    try:
+        if new:
+            db.query(RecipeImportJobState).filter(
+                RecipeImportJobState.created_at < utcnow() - SHARED_RETENTION
+            ).delete(synchronize_session=False)
+        db.merge(RecipeImportJobState(id=job_id, list_id=list_id, snapshot=snapshot, created_at=created_at))
+        db.commit()
+    except SQLAlchemyError:
+        # Polls on other workers see an older state; this worker still has the job
+        db.rollback()
+    finally:
+        db.close()
+
+
+def shared_state(db, job_id: str) -> Optional[RecipeImportJobOut]:
+    """A job's last recorded state, whichever worker ran it."""
+    row = db.get(RecipeImportJobState, job_id)
+    if row is None:
+        return None
+    return RecipeImportJobOut.model_validate_json(row.snapshot)
+
+
+# Called in a worker thread with the successful recipes; must write every
+# ingredient to the list in one transaction and return the added items as
+# JSON-ready dicts.
+AddItemsCallback = Callable[[RecipeImportJob, list[dict]], list[dict]]
+
+
+class RecipeImportJobs:
+    """Runs recipe import jobs in the background with bounded fetch concurrency."""
+
+    def __init__(self, max_concurrency: int, max_jobs: int, max_active: int = 50, max_active_per_user: int = 3):
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        self._max_jobs = max_jobs
+        self._max_active = max_active
+        self._max_active_per_user = max_active_per_user
+        self._jobs: OrderedDict[str, RecipeImportJob] = OrderedDict()
+        # user_id -> jobs submitted but not yet finished
+        self._active: Counter[str] = Counter()
+        # One thread writes shared state, so a job's snapshots land in order
+        self._state_writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix="recipe-jobs")
+        # Keep strong references so running tasks aren't garbage-collected
+        self._tasks: set[asyncio.Task] = set()
+
+    def get(self, job_id: str) -> Optional[RecipeImportJob]:
+        return self._jobs.get(job_id)
+
+    async def _save(self, job: RecipeImportJob, new: bool = False):
+        """Record the job's current state for polls served by other workers."""
+        snapshot = RecipeImportJobOut.model_validate(job).model_dump_json()
+        await asyncio.get_running_loop().run_in_executor(
+            self._state_writer, _write_state, job.id, job.list_id, snapshot, job.created_at, new
+        )
+
+    async def submit(
+        self,
+        list_id: str,
+        user_id: str,
+        username: str,
+        urls: list[str],
+        add_items: AddItemsCallback,
+    ) -> RecipeImportJob:
+        """Register a job and start it in the background. Returns once it is recorded.
+
+        Raises RecipeImportBusy when too many jobs are unfinished.
+        """
+        if self._active[user_id] >= self._max_active_per_user:
+            raise RecipeImportBusy(per_user=True)
+        if self._active.total() >= self._max_active:
+            raise RecipeImportBusy(per_user=False)
+        job = RecipeImportJob(
+            id=secrets.token_urlsafe(12),
+            list_id=list_id,
+            user_id=user_id,
+            username=username,
+            # Duplicate URLs would only import the same recipe twice
+            results=[RecipeUrlResult(url=url) for url in dict.fromkeys(urls)],
+        )
+        self._jobs[job.id] = job
+        self._active[user_id] += 1
+        self._evict()
+        await self._save(job, new=True)
+
+        task = asyncio.create_task(self._run(job, add_items))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        return job
+
+    def _evict(self):
+        """Drop the oldest finished jobs once we hold more than max_jobs."""
+        excess = len(self._jobs) - self._max_jobs
+        if excess <= 0:
+            return
+        for job_id in [j.id for j in self._jobs.values() if j.done][:excess]:
+            del self._jobs[job_id]
+
+    async def _broadcast(self, job: RecipeImportJob, msg_type: str, data: dict):
+        await manager.broadcast_to_list(job.list_id, {
+            "type": msg_type,
+            "list_id": job.list_id,
+            "data": data,
+            "user_id": job.user_id,
+            "username": job.username,
+        })
+
+    async def _fetch_one(self, job: RecipeImportJob, result: RecipeUrlResult):
+        async with self._semaphore:
+            try:
+                recipe = await fetch_recipe(result.url)
+            except ValueError as e:
+                result.status, result.error = "error", str(e)
+            except Exception:
+                result.status, result.error = "error", "Failed to fetch or parse the recipe URL."
+            else:
+                result.status = "ok"
+                result.recipe = recipe
+                result.title = recipe["title"]
+                result.ingredient_count = len(recipe["ingredients"])
+
+        await self._broadcast(job, "recipe_import_progress", {
+            "job_id": job.id,
+            "url": result.url,
+            "status": result.status,
+            "title": result.title,
+            "error": result.error,
+            "completed": job.completed,
+            "total": len(job.results),
+        })
+        await self._save(job)
+
+    async def _run(self, job: RecipeImportJob, add_items: AddItemsCallback):
+        job.status = "running"
+        await asyncio.gather(*(self._fetch_one(job, r) for r in job.results))
+
+        recipes = [r.recipe for r in job.results if r.status == "ok"]
+        items: list[dict] = []
+        try:
+            if not recipes:
+                raise ValueError("None of the recipe URLs could be imported.")
+            items = await asyncio.to_thread(add_items, job, recipes)
+            job.added_count = len(items)
+            job.status = "completed"
+        except Exception as e:
+            job.status = "failed"
+            job.error = str(e) or "Failed to add imported ingredients to the list."
+        finally:
+            # Parsed recipes are no longer needed once they're in the list
+            for r in job.results:
+                r.recipe = None
+            job.finished_at = utcnow()
+            self._active[job.user_id] -= 1
+            if not self._active[job.user_id]:
+                del self._active[job.user_id]
+        await self._save(job)
+
+        await self._broadcast(job, "recipe_import_finished", {
+            "job_id": job.id,
+            "status": job.status,
+            "error": job.error,
+            "added_count": job.added_count,
+            "items": items,
+        })
+
+
+recipe_jobs = RecipeImportJobs(
+    max_concurrency=settings.RECIPE_IMPORT_CONCURRENCY,
+    max_jobs=settings.RECIPE_IMPORT_MAX_JOBS,
+    max_active=settings.RECIPE_IMPORT_MAX_ACTIVE_JOBS,
+    max_active_per_user=settings.RECIPE_IMPORT_MAX_USER_JOBS,
+)
@@ -9,12 +9,13 @@ import ipaddress
 import json
 import re
 import socket
+import time
 from dataclasses import dataclass
+from functools import lru_cache
 from typing import Optional
 from urllib.parse import urlparse
 
-import httpx
-from bs4 import BeautifulSoup
+from metrics import Histogram
 
 
 @dataclass
@@ -64,17 +65,49 @@ _SKIP_PREFIXES = re.compile(
     re.IGNORECASE,
 )
 
+# ─── Compiled grammar ──────────────────────────────────────────────
+# Everything below is compiled once at import so parse_ingredient() never
+# goes through the re module cache or loops over patterns in Python.
+
+_FRACTION_CHARS = "".join(_FRACTIONS)
+_FRACTION_RE = re.compile(f"[{_FRACTION_CHARS}]")
+_HTML_TAG_RE = re.compile(r"<[^>]+>")
+_PARENS_RE = re.compile(r"\([^)]*\)")
+_PREP_SUFFIX_RE = re.compile(
+    r",\s+(?:finely|roughly|freshly|thinly|coarsely|lightly).*$", re.IGNORECASE
+)
+# Leading quantity — handles "2", "1.5", "½", "1 1/2", "1½"
+_QTY_RE = re.compile(
+    rf"^(\d+\s*[{_FRACTION_CHARS}]|\d+\s*/\s*\d+|\d+\s+\d+\s*/\s*\d+|\d+\.?\d*|[{_FRACTION_CHARS}])\s*"
+)
+_SPACE_FRACTION_RE = re.compile(r"^(\d+)\s+(\d+/\d+)$")
+_WHITESPACE_RE = re.compile(r"\s+")
+_OF_PREFIX_RE = re.compile(r"^of\s+", re.IGNORECASE)
+
+# All unit aliases fused into one alternation, one capture group per unit.
+# Alternation is tried left to right, so precedence matches _UNIT_PATTERNS.
+_UNIT_NAMES = tuple(normalized for _pattern, normalized in _UNIT_PATTERNS)
+_UNIT_ALTERNATION = "|".join(f"({pattern})" for pattern, _normalized in _UNIT_PATTERNS)
+# "200 g flour" — unit followed by whitespace/punctuation
+_UNIT_SPACED_RE = re.compile(rf"^(?:{_UNIT_ALTERNATION})[\s.,]+(.*)$", re.IGNORECASE)
+# "200g" — unit glued to the number, possibly at the end of the line
+_UNIT_GLUED_RE = re.compile(rf"^(?:{_UNIT_ALTERNATION})\b\s*(.*)", re.IGNORECASE)
+
+# Size of the memo for repeated ingredient lines (recipes reuse a lot of them)
+_PARSE_CACHE_SIZE = 4096
+
 
 def _parse_fraction(s: str) -> Optional[float]:
     """Parse a fraction string like '1/2' or '¾' or '1 1/2'."""
     s = s.strip()
     # Unicode fractions
-    for char, val in _FRACTIONS.items():
-        if char in s:
-            # e.g., "1½" → 1 + 0.5
-            rest = s.replace(char, "").strip()
-            base = float(rest) if rest else 0
-            return base + val
+    frac = _FRACTION_RE.search(s)
+    if frac:
+        # e.g., "1½" → 1 + 0.5
+        char = frac.group()
+        rest = s.replace(char, "").strip()
+        base = float(rest) if rest else 0
+        return base + _FRACTIONS[char]
     # Slash fractions: "1/2", "3/4"
     if "/" in s:
         parts = s.split("/")
@@ -90,18 +123,30 @@ def _parse_fraction(s: str) -> Optional[float]:
         return None
 
 
-def parse_ingredient(text: str) -> ParsedIngredient:
-    """Parse an ingredient string like '200g plain flour' into structured data."""
+def _match_unit(pattern: re.Pattern, s: str) -> Optional[tuple[str, str]]:
+    """Match a fused unit regex and return (normalized_unit, rest_of_text)."""
+    m = pattern.match(s)
+    if not m:
+        return None
+    groups = m.groups()
+    for index, normalized in enumerate(_UNIT_NAMES):
+        if groups[index] is not None:
+            return normalized, groups[-1]
+    return None
+
+
+@lru_cache(maxsize=_PARSE_CACHE_SIZE)
+def _parse_ingredient_cached(text: str) -> tuple[str, float, str]:
     original = text.strip()
 
     # Remove HTML tags if any
-    text = re.sub(r"<[^>]+>", "", text).strip()
+    text = _HTML_TAG_RE.sub("", text).strip()
 
     # Remove parenthetical notes: "2 eggs (beaten)", "100ml milk (semi-skimmed)"
-    text = re.sub(r"\([^)]*\)", "", text).strip()
+    text = _PARENS_RE.sub("", text).strip()
 
     # Remove trailing prep instructions after comma: "1 onion, finely diced"
-    text = re.sub(r",\s+(?:finely|roughly|freshly|thinly|coarsely|lightly).*$", "", text, flags=re.IGNORECASE).strip()
+    text = _PREP_SUFFIX_RE.sub("", text).strip()
 
     # Strip size/descriptor prefixes
     text = _SKIP_PREFIXES.sub("", text).strip()
@@ -110,17 +155,12 @@ def parse_ingredient(text: str) -> ParsedIngredient:
     unit = ""
     name = text
 
-    # Try to extract leading quantity — handles "2", "1.5", "½", "1 1/2", "1½"
-    # Pattern: optional whole number, optional space, optional fraction
-    qty_match = re.match(
-        r"^(\d+\s*[½⅓⅔¼¾⅕⅖⅗⅘⅙⅚⅛⅜⅝⅞]|\d+\s*/\s*\d+|\d+\s+\d+\s*/\s*\d+|\d+\.?\d*|[½⅓⅔¼¾⅕⅖⅗⅘⅙⅚⅛⅜⅝⅞])\s*",
-        text,
-    )
+    qty_match = _QTY_RE.match(text)
 
     if qty_match:
         qty_str = qty_match.group(1).strip()
         # Handle "1 1/2" style (whole + fraction with space)
-        space_frac = re.match(r"^(\d+)\s+(\d+/\d+)$", qty_str)
+        space_frac = _SPACE_FRACTION_RE.match(qty_str)
         if space_frac:
             whole = float(space_frac.group(1))
             frac = _parse_fraction(space_frac.group(2))
@@ -132,29 +172,22 @@ def parse_ingredient(text: str) -> ParsedIngredient:
 
         name = text[qty_match.end():].strip()
 
-    # Try to extract unit — check for "200g" style (number glued to unit)
-    # or "200 g flour" style (unit after space)
-    for pattern, normalized in _UNIT_PATTERNS:
-        unit_match = re.match(rf"^({pattern})[\s.,]+(.*)$", name, re.IGNORECASE)
+    # Try to extract unit — "200 g flour" style (unit after space) first,
+    # then "200g" style (number glued to unit)
+    unit_match = _match_unit(_UNIT_SPACED_RE, name)
+    if unit_match:
+        unit, name = unit_match
+        name = name.strip()
+    elif qty_match:
+        unit_match = _match_unit(_UNIT_GLUED_RE, text[qty_match.end():])
         if unit_match:
-            unit = normalized
-            name = unit_match.group(2).strip()
-            break
-
-    # Also handle case where quantity was like "200g" (no space between number and unit)
-    if not unit and qty_match:
-        remaining = text[qty_match.end():]
-        for pattern, normalized in _UNIT_PATTERNS:
-            unit_glued = re.match(rf"^({pattern})\b\s*(.*)", remaining, re.IGNORECASE)
-            if unit_glued:
-                unit = normalized
-                name = unit_glued.group(2).strip()
-                break
+            unit, name = unit_match
+            name = name.strip()
 
     # Clean up name
-    name = re.sub(r"\s+", " ", name).strip()
+    name = _WHITESPACE_RE.sub(" ", name).strip()
     # Remove leading "of " — "200ml of milk" → "milk"
-    name = re.sub(r"^of\s+", "", name, flags=re.IGNORECASE).strip()
+    name = _OF_PREFIX_RE.sub("", name).strip()
 
     # Title case the name
     if name:
@@ -162,7 +195,22 @@ def parse_ingredient(text: str) -> ParsedIngredient:
     else:
         name = original[0].upper() + original[1:] if original else "Unknown ingredient"
 
-    return ParsedIngredient(name=name, quantity=round(quantity, 3), unit=unit)
+    return name, round(quantity, 3), unit
+
+
+def parse_ingredient(text: str) -> ParsedIngredient:
+    """Parse an ingredient string like '200g plain flour' into structured data."""
+    name, quantity, unit = _parse_ingredient_cached(text)
+    return ParsedIngredient(name=name, quantity=quantity, unit=unit)
+
+
+def parse_ingredients(lines: list[str]) -> list[ParsedIngredient]:
+    """Parse a batch of ingredient strings, skipping blanks and non-strings."""
+    return [
+        parse_ingredient(line)
+        for line in lines
+        if isinstance(line, str) and len(line.strip()) > 1
+    ]
 
 
 def _validate_url(url: str):
@@ -186,6 +234,12 @@ def _validate_url(url: str):
             raise ValueError("Requests to private or internal network addresses are not allowed.")
 
 
+# Outcomes of fetch_recipe: ok, rejected (unsafe URL or no recipe on the page)
+# or failed (network/HTTP errors), and how long fetches take
+fetch_counters = {"ok": 0, "rejected": 0, "failed": 0}
+fetch_time = Histogram()
+
+
 async def fetch_recipe(url: str) -> dict:
     """
     Fetch a URL, extract JSON-LD Recipe data, and return parsed ingredients.
@@ -203,8 +257,29 @@ async def fetch_recipe(url: str) -> dict:
     Raises:
         ValueError if no recipe data found or URL is unsafe.
     """
+    started = time.perf_counter()
+    try:
+        recipe = await _fetch_recipe(url)
+    except ValueError:
+        fetch_counters["rejected"] += 1
+        raise
+    except Exception:
+        fetch_counters["failed"] += 1
+        raise
+    finally:
+        fetch_time.observe(time.perf_counter() - started)
+    fetch_counters["ok"] += 1
+    return recipe
+
+
+async def _fetch_recipe(url: str) -> dict:
     _validate_url(url)
 
+    # Imported on first use: together they add ~150 ms to every cold start,
+    # and most processes never import a recipe
+    import httpx
+    from bs4 import BeautifulSoup
+
     async with httpx.AsyncClient(
         follow_redirects=True,
         timeout=15.0,
@@ -242,7 +317,7 @@ async def fetch_recipe(url: str) -> dict:
     if not raw_ingredients:
         raise ValueError("Recipe found but no ingredients listed.")
 
-    ingredients = [parse_ingredient(ing) for ing in raw_ingredients if isinstance(ing, str) and len(ing.strip()) > 1]
+    ingredients = parse_ingredients(raw_ingredients)
     title = recipe_data.get("name", "Imported Recipe")
 
     source = urlparse(url).netloc.removeprefix("www.")
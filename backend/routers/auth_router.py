@@ -1,12 +1,17 @@
+import base64
 import secrets
-from datetime import timedelta
+from datetime import date, datetime, timedelta
+from typing import Optional
 
-from fastapi import APIRouter, Cookie, Depends, HTTPException, Request, Response, status
+from fastapi import APIRouter, Cookie, Depends, HTTPException, Query, Request, Response, status
+from sqlalchemy import and_, func, or_
 from sqlalchemy.orm import Session
 
+from audit import audit_writer
 from auth import (
     hash_password,
     verify_password,
+    verify_and_update_password,
     create_access_token,
     create_refresh_token,
     verify_refresh_token,
@@ -17,7 +22,10 @@ from auth import (
 )
 from config import settings
 from database import get_db
-from models import User, ApiKey, AuditLog, InviteCode, ShoppingList, ListMember, ListItem, utcnow
+from hashing import password_hasher
+from models import (
+    User, ApiKey, AuditLog, AuditRollup, InviteCode, ShoppingList, ListMember, ListItem, utcnow,
+)
 from rate_limit import login_limiter, register_limiter
 from schemas import (
     UserCreate,
@@ -30,6 +38,9 @@ from schemas import (
     ApiKeyOut,
     ApiKeyCreated,
     InviteCodeOut,
+    AuditLogOut,
+    AuditLogPage,
+    AuditRollupOut,
 )
 
 router = APIRouter(prefix="/api/auth", tags=["Authentication"])
@@ -57,12 +68,6 @@ def _clear_refresh_cookie(response: Response):
     )
 
 
-def _audit(db: Session, action: str, user_id: str = None, detail: str = "", ip: str = None):
-    """Record an audit log entry. Callers must commit the session themselves
-    unless this is a standalone audit event (e.g. recording a rate-limit hit)."""
-    db.add(AuditLog(user_id=user_id, action=action, detail=detail, ip_address=ip))
-
-
 @router.post("/register", response_model=Token, status_code=201)
 def register(data: UserCreate, request: Request, response: Response, db: Session = Depends(get_db)):
     # Rate limit registration by IP
@@ -125,8 +130,7 @@ def register(data: UserCreate, request: Request, response: Response, db: Session
     db.refresh(user)
 
     register_limiter.record_attempt(client_ip)
-    _audit(db, "user.register", user.id, f"username={user.username}", client_ip)
-    db.commit()
+    audit_writer.record("user.register", user.id, f"username={user.username}", client_ip)
     token = create_access_token({"sub": user.id})
     _set_refresh_cookie(response, create_refresh_token(user.id))
     return Token(access_token=token, user=UserOut.model_validate(user))
@@ -138,8 +142,7 @@ def login(data: UserLogin, request: Request, response: Response, db: Session = D
     client_ip = request.client.host if request.client else "unknown"
     if login_limiter.is_rate_limited(client_ip):
         remaining = login_limiter.remaining_seconds(client_ip)
-        _audit(db, "login.rate_limited", detail=f"ip={client_ip}", ip=client_ip)
-        db.commit()
+        audit_writer.record("login.rate_limited", detail=f"ip={client_ip}", ip=client_ip)
         raise HTTPException(
             status_code=status.HTTP_429_TOO_MANY_REQUESTS,
             detail=f"Too many login attempts. Try again in {remaining} seconds.",
@@ -147,18 +150,25 @@ def login(data: UserLogin, request: Request, response: Response, db: Session = D
         )
 
     user = db.query(User).filter(User.username == data.username).first()
-    if not user or not verify_password(data.password, user.password_hash):
+    ok, new_hash = False, None
+    if user:
+        password_hash = user.password_hash
+        # End the read so the pooled connection isn't held while bcrypt runs
+        db.rollback()
+        ok, new_hash = verify_and_update_password(data.password, password_hash)
+    if not ok:
         login_limiter.record_attempt(client_ip)
-        _audit(db, "login.failed", detail=f"username={data.username}", ip=client_ip)
-        db.commit()
+        audit_writer.record("login.failed", detail=f"username={data.username}", ip=client_ip)
         raise HTTPException(status_code=401, detail="Invalid credentials")
     if not user.is_active:
-        _audit(db, "login.disabled", user.id, ip=client_ip)
-        db.commit()
+        audit_writer.record("login.disabled", user.id, ip=client_ip)
         raise HTTPException(status_code=403, detail="Account is disabled")
 
-    _audit(db, "login.success", user.id, ip=client_ip)
-    db.commit()
+    if new_hash:
+        # Stored with an older, cheaper cost; upgrade it now we know the password
+        user.password_hash = new_hash
+        db.commit()
+    audit_writer.record("login.success", user.id, ip=client_ip)
     token = create_access_token({"sub": user.id})
     _set_refresh_cookie(response, create_refresh_token(user.id))
     return Token(access_token=token, user=UserOut.model_validate(user))
@@ -231,8 +241,7 @@ def change_password(
     user.password_hash = hash_password(data.new_password)
     db.commit()
     client_ip = request.client.host if request.client else None
-    _audit(db, "password.changed", user.id, ip=client_ip)
-    db.commit()
+    audit_writer.record("password.changed", user.id, ip=client_ip)
     return {"message": "Password changed successfully"}
 
 
@@ -257,8 +266,7 @@ def create_api_key(
     db.commit()
     db.refresh(api_key)
     client_ip = request.client.host if request.client else None
-    _audit(db, "apikey.created", user.id, f"name={data.name} scopes={data.scopes}", client_ip)
-    db.commit()
+    audit_writer.record("apikey.created", user.id, f"name={data.name} scopes={data.scopes}", client_ip)
     out = ApiKeyOut.model_validate(api_key)
     return ApiKeyCreated(**out.model_dump(), key=raw_key)
 
@@ -286,8 +294,7 @@ def delete_api_key(
     db.delete(key)
     db.commit()
     client_ip = request.client.host if request.client else None
-    _audit(db, "apikey.deleted", user.id, f"name={key_name}", client_ip)
-    db.commit()
+    audit_writer.record("apikey.deleted", user.id, f"name={key_name}", client_ip)
 
 
 # ─── Invite Codes (admin only) ─────────────────────────────────────
@@ -308,8 +315,7 @@ def create_invite_code(
     db.commit()
     db.refresh(invite)
     client_ip = request.client.host if request.client else None
-    _audit(db, "invite.created", user.id, f"code={code}", client_ip)
-    db.commit()
+    audit_writer.record("invite.created", user.id, f"code={code}", client_ip)
     return InviteCodeOut.model_validate(invite)
 
 
@@ -343,8 +349,117 @@ def delete_invite_code(
     db.delete(invite)
     db.commit()
     client_ip = request.client.host if request.client else None
-    _audit(db, "invite.deleted", user.id, f"code={code_val}", client_ip)
-    db.commit()
+    audit_writer.record("invite.deleted", user.id, f"code={code_val}", client_ip)
+
+
+# ─── Admin: Audit Log ──────────────────────────────────────────────
+
+def _encode_audit_cursor(entry: AuditLog) -> str:
+    raw = f"{entry.created_at.isoformat()}|{entry.id}"
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+
+def _decode_audit_cursor(cursor: str) -> tuple[datetime, str]:
+    try:
+        created_at, entry_id = base64.urlsafe_b64decode(cursor.encode()).decode().split("|", 1)
+        return datetime.fromisoformat(created_at), entry_id
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
+@router.get("/audit", response_model=AuditLogPage)
+def list_audit_log(
+    action: Optional[str] = None,
+    user_id: Optional[str] = None,
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+    cursor: Optional[str] = None,
+    limit: int = Query(100, ge=1, le=500),
+    user: User = Depends(get_current_admin_jwt),
+    db: Session = Depends(get_db),
+):
+    """Audit entries, newest first.
+
+    Pages are keyset-paginated on (created_at, id): pass next_cursor back as
+    ?cursor= for the next page, so deep pages cost the same as the first.
+    """
+    query = db.query(AuditLog, User.username).outerjoin(User, User.id == AuditLog.user_id)
+    if action:
+        query = query.filter(AuditLog.action == action)
+    if user_id:
+        query = query.filter(AuditLog.user_id == user_id)
+    if since:
+        query = query.filter(AuditLog.created_at >= since)
+    if until:
+        query = query.filter(AuditLog.created_at < until)
+    if cursor:
+        created_at, entry_id = _decode_audit_cursor(cursor)
+        query = query.filter(or_(
+            AuditLog.created_at < created_at,
+            and_(AuditLog.created_at == created_at, AuditLog.id < entry_id),
+        ))
+
+    rows = query.order_by(AuditLog.created_at.desc(), AuditLog.id.desc()).limit(limit + 1).all()
+    page = rows[:limit]
+    items = [
+        AuditLogOut.model_validate(entry).model_copy(update={"username": username})
+        for entry, username in page
+    ]
+    next_cursor = _encode_audit_cursor(page[-1][0]) if len(rows) > limit else None
+    return AuditLogPage(items=items, next_cursor=next_cursor)
+
+
+@router.get("/audit/rollups", response_model=list[AuditRollupOut])
+def audit_rollups(
+    action: Optional[str] = None,
+    since: Optional[date] = None,
+    until: Optional[date] = None,
+    user: User = Depends(get_current_admin_jwt),
+    db: Session = Depends(get_db),
+):
+    """Entry counts per day and action, including days already pruned by retention."""
+    counts: dict[tuple[str, str], int] = {}
+
+    pruned = db.query(AuditRollup)
+    if action:
+        pruned = pruned.filter(AuditRollup.action == action)
+    if since:
+        pruned = pruned.filter(AuditRollup.day >= since.isoformat())
+    if until:
+        pruned = pruned.filter(AuditRollup.day <= until.isoformat())
+    for r in pruned:
+        counts[(r.day, r.action)] = r.count
+
+    day = func.date(AuditLog.created_at)
+    live = db.query(day, AuditLog.action, func.count()).group_by(day, AuditLog.action)
+    if action:
+        live = live.filter(AuditLog.action == action)
+    if since:
+        live = live.filter(AuditLog.created_at >= datetime.combine(since, datetime.min.time()))
+    if until:
+        live = live.filter(AuditLog.created_at < datetime.combine(until + timedelta(days=1), datetime.min.time()))
+    for live_day, live_action, n in live:
+        key = (str(live_day), live_action)
+        counts[key] = counts.get(key, 0) + n
+
+    return [
+        AuditRollupOut(day=d, action=a, count=n)
+        for (d, a), n in sorted(counts.items(), reverse=True)
+    ]
+
+
+@router.get("/audit/stats")
+def audit_stats(user: User = Depends(get_current_admin_jwt)):
+    """Background audit writer queue depth and dropped/delayed entry counts."""
+    return audit_writer.stats()
+
+
+# ─── Admin: Password Hashing ───────────────────────────────────────
+
+@router.get("/hasher/stats")
+def hasher_stats(user: User = Depends(get_current_admin_jwt)):
+    """Password hashing pool: pending work, rejections, queue wait and hash times."""
+    return password_hasher.stats()
 
 
 # ─── Admin: User Management ────────────────────────────────────────
@@ -375,8 +490,7 @@ def toggle_user_active(
     db.refresh(target)
     client_ip = request.client.host if request.client else None
     action = "user.activated" if target.is_active else "user.deactivated"
-    _audit(db, action, admin.id, f"target={target.username}", client_ip)
-    db.commit()
+    audit_writer.record(action, admin.id, f"target={target.username}", client_ip)
     return UserOut.model_validate(target)
 
 
@@ -430,5 +544,4 @@ def delete_user(
     db.commit()
 
     client_ip = request.client.host if request.client else None
-    _audit(db, "user.deleted", admin.id, f"target={username}", client_ip)
-    db.commit()
+    audit_writer.record("user.deleted", admin.id, f"target={username}", client_ip)
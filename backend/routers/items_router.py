@@ -1,15 +1,20 @@
+import asyncio
+
 from fastapi import APIRouter, Depends, HTTPException
 from sqlalchemy.orm import Session, joinedload
 from sqlalchemy import func
 
 from access import check_list_access
 from auth import get_current_user
-from database import get_db
+from config import settings
+from database import SessionLocal, get_db
 from models import User, ShoppingList, ListItem, Category, ItemCategoryMemory, utcnow
 from schemas import (
     ItemCreate, ItemUpdate, ItemOut, ItemSuggestion, ItemReorderRequest,
     RecipeImportRequest, RecipeImportPreview, RecipeImportResult,
+    RecipeImportJobCreate, RecipeImportJobOut,
 )
+from recipe_jobs import RecipeImportBusy, RecipeImportJob, recipe_jobs, shared_state
 from recipe_parser import fetch_recipe
 from websocket_manager import manager
 
@@ -52,6 +57,25 @@ def _load_item(item_id: str, list_id: str, db: Session) -> ListItem:
     )
 
 
+def _item_delta(before: dict, after: ItemOut) -> dict:
+    """Build a broadcast payload holding only the fields that changed.
+
+    `rev`/`base_rev` are the item's updated_at after and before the change;
+    a client whose copy isn't at `base_rev` should fetch the full item.
+    """
+    full = after.model_dump(mode="json")
+    return {
+        "id": after.id,
+        "rev": full["updated_at"],
+        "base_rev": before["updated_at"],
+        "changes": {
+            field: value
+            for field, value in full.items()
+            if field != "updated_at" and before.get(field) != value
+        },
+    }
+
+
 def _update_category_memory(item_name: str, category_id: str, db: Session):
     """Remember the category assignment for future suggestions."""
     name_lower = item_name.strip().lower()
@@ -159,16 +183,36 @@ async def reorder_items(
     """Batch-update sort_order for items based on their position in the list."""
     check_list_access(list_id, user.id, db, require_edit=True)
 
+    # Position isn't part of an item's revision: keep updated_at as-is so
+    # clients' copies stay current for later delta broadcasts.
     for index, item_id in enumerate(data.item_ids):
         db.query(ListItem).filter(
             ListItem.id == item_id, ListItem.list_id == list_id
-        ).update({ListItem.sort_order: index}, synchronize_session=False)
+        ).update(
+            {ListItem.sort_order: index, ListItem.updated_at: ListItem.updated_at},
+            synchronize_session=False,
+        )
 
     db.commit()
     await _broadcast(list_id, "items_reordered", {"item_ids": data.item_ids}, user)
     return {"ok": True}
 
 
+@router.get("/{item_id}", response_model=ItemOut)
+def get_item(
+    list_id: str,
+    item_id: str,
+    user: User = Depends(get_current_user),
+    db: Session = Depends(get_db),
+):
+    """Fetch one item — used by clients to resync after a delta revision mismatch."""
+    check_list_access(list_id, user.id, db)
+    item = _load_item(item_id, list_id, db)
+    if not item:
+        raise HTTPException(status_code=404, detail="Item not found")
+    return _item_to_out(item)
+
+
 @router.put("/{item_id}", response_model=ItemOut)
 async def update_item(
     list_id: str,
@@ -178,11 +222,10 @@ async def update_item(
     db: Session = Depends(get_db),
 ):
     check_list_access(list_id, user.id, db, require_edit=True)
-    item = db.query(ListItem).filter(
-        ListItem.id == item_id, ListItem.list_id == list_id
-    ).first()
+    item = _load_item(item_id, list_id, db)
     if not item:
         raise HTTPException(status_code=404, detail="Item not found")
+    before = _item_to_out(item).model_dump(mode="json")
 
     if data.name is not None:
         item.name = data.name
@@ -213,7 +256,7 @@ async def update_item(
     result = _item_to_out(item)
 
     msg_type = "item_checked" if data.checked is not None else "item_updated"
-    await _broadcast(list_id, msg_type, result.model_dump(mode="json"), user)
+    await _broadcast(list_id, msg_type, _item_delta(before, result), user)
     return result
 
 
@@ -279,6 +322,42 @@ async def preview_recipe_import(
     return RecipeImportPreview(**recipe)
 
 
+def _add_recipe_items(list_id: str, recipes: list[dict], user_id: str, db: Session) -> list[ItemOut]:
+    """Append every ingredient of the given recipes to the list in one transaction."""
+    max_sort = db.query(func.max(ListItem.sort_order)).filter(
+        ListItem.list_id == list_id
+    ).scalar() or 0
+
+    added_items = []
+    for recipe in recipes:
+        for ing in recipe["ingredients"]:
+            category_id = _lookup_category(ing["name"], db)
+            item = ListItem(
+                list_id=list_id,
+                name=ing["name"],
+                quantity=ing["quantity"],
+                unit=ing["unit"],
+                category_id=category_id,
+                added_by=user_id,
+                notes=f"From recipe: {recipe['title']}",
+                sort_order=max_sort + len(added_items) + 1,
+            )
+            db.add(item)
+            added_items.append(item)
+
+    _touch_list(list_id, db)
+    db.commit()
+
+    loaded = (
+        db.query(ListItem)
+        .options(joinedload(ListItem.category), joinedload(ListItem.added_by_user))
+        .filter(ListItem.id.in_([item.id for item in added_items]))
+        .order_by(ListItem.sort_order)
+        .all()
+    )
+    return [_item_to_out(item) for item in loaded]
+
+
 @router.post("/import-recipe", response_model=RecipeImportResult, status_code=201)
 async def import_recipe(
     list_id: str,
@@ -290,33 +369,7 @@ async def import_recipe(
     check_list_access(list_id, user.id, db, require_edit=True)
     recipe = await _fetch_recipe_or_raise(data.url)
 
-    max_sort = db.query(func.max(ListItem.sort_order)).filter(
-        ListItem.list_id == list_id
-    ).scalar() or 0
-
-    added_items = []
-    for i, ing in enumerate(recipe["ingredients"]):
-        category_id = _lookup_category(ing["name"], db)
-        item = ListItem(
-            list_id=list_id,
-            name=ing["name"],
-            quantity=ing["quantity"],
-            unit=ing["unit"],
-            category_id=category_id,
-            added_by=user.id,
-            notes=f"From recipe: {recipe['title']}",
-            sort_order=max_sort + i + 1,
-        )
-        db.add(item)
-        added_items.append(item)
-
-    _touch_list(list_id, db)
-    db.commit()
-
-    result_items = []
-    for item in added_items:
-        loaded = _load_item(item.id, list_id, db)
-        result_items.append(_item_to_out(loaded))
+    result_items = _add_recipe_items(list_id, [recipe], user.id, db)
 
     for result in result_items:
         await _broadcast(list_id, "item_added", result.model_dump(mode="json"), user)
@@ -329,6 +382,81 @@ async def import_recipe(
     )
 
 
+def _add_job_items(job: RecipeImportJob, recipes: list[dict]) -> list[dict]:
+    """Finish a background import job: re-check access and write all ingredients."""
+    db = SessionLocal()
+    try:
+        try:
+            check_list_access(job.list_id, job.user_id, db, require_edit=True)
+        except HTTPException as e:
+            raise ValueError(e.detail)
+        items = _add_recipe_items(job.list_id, recipes, job.user_id, db)
+        return [item.model_dump(mode="json") for item in items]
+    finally:
+        db.close()
+
+
+@router.post("/import-recipe/jobs", response_model=RecipeImportJobOut, status_code=202)
+async def start_recipe_import_job(
+    list_id: str,
+    data: RecipeImportJobCreate,
+    user: User = Depends(get_current_user),
+    db: Session = Depends(get_db),
+):
+    """Queue a batch of recipe URLs for background import.
+
+    Returns immediately with a job id. Progress and the final batch of added
+    items are pushed to the list's WebSocket subscribers.
+    """
+    # Async so the job can be scheduled on the loop; the query goes to a thread
+    await asyncio.to_thread(check_list_access, list_id, user.id, db, require_edit=True)
+    if len(data.urls) > settings.RECIPE_IMPORT_MAX_URLS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"At most {settings.RECIPE_IMPORT_MAX_URLS} URLs per import job",
+        )
+    try:
+        job = await recipe_jobs.submit(
+            list_id,
+            user.id,
+            user.display_name or user.username,
+            data.urls,
+            _add_job_items,
+        )
+    except RecipeImportBusy as e:
+        if e.per_user:
+            raise HTTPException(
+                status_code=429,
+                detail="You already have recipe imports in progress. Wait for one to finish.",
+                headers={"Retry-After": "5"},
+            )
+        raise HTTPException(
+            status_code=503,
+            detail="Too many recipe imports in progress. Please retry shortly.",
+            headers={"Retry-After": "5"},
+        )
+    return RecipeImportJobOut.model_validate(job)
+
+
+@router.get("/import-recipe/jobs/{job_id}", response_model=RecipeImportJobOut)
+def get_recipe_import_job(
+    list_id: str,
+    job_id: str,
+    user: User = Depends(get_current_user),
+    db: Session = Depends(get_db),
+):
+    check_list_access(list_id, user.id, db)
+    job = recipe_jobs.get(job_id)
+    if job is not None:
+        out = RecipeImportJobOut.model_validate(job)
+    else:
+        # Submitted to another worker process
+        out = shared_state(db, job_id)
+    if out is None or out.list_id != list_id:
+        raise HTTPException(status_code=404, detail="Import job not found")
+    return out
+
+
 # ─── Item Suggestions ─────────────────────────────────────────────
 
 suggestions_router = APIRouter(prefix="/api/suggestions", tags=["Suggestions"])
@@ -1,9 +1,15 @@
-from fastapi import APIRouter, Depends, HTTPException
+import asyncio
+import json
+from typing import Optional
+
+from fastapi import APIRouter, Depends, Header, HTTPException
+from fastapi.responses import StreamingResponse
 from sqlalchemy import func, case
 from sqlalchemy.orm import Session, joinedload
 
 from access import check_list_access
-from auth import get_current_user
+from auth import get_current_user, get_current_user_read
+from config import settings
 from database import get_db
 from models import User, ShoppingList, ListMember, ListItem
 from schemas import (
@@ -13,6 +19,7 @@ from schemas import (
     ListMemberOut,
     ListShareCreate,
 )
+from websocket_manager import RESYNC_PAYLOAD, STREAM_CLOSED, frame_seq, manager
 
 router = APIRouter(prefix="/api/lists", tags=["Shopping Lists"])
 
@@ -243,3 +250,59 @@ def unshare_list(
         raise HTTPException(status_code=404, detail="Member not found")
     db.delete(member)
     db.commit()
+
+
+# ─── Server-Sent Events ────────────────────────────────────────────
+
+async def _list_event_stream(list_id: str, last_event_id: Optional[str]):
+    """Yield a list's broadcast frames as SSE events until the client goes away.
+
+    Event ids are "<epoch>:<seq>", so a reconnecting client's Last-Event-ID
+    can be replayed from the same buffer WebSocket clients resume from.
+    """
+    stream = manager.open_stream(list_id)
+    try:
+        yield "retry: 3000\n\n"
+        if last_event_id:
+            epoch, _, seq = last_event_id.partition(":")
+            if not (seq.isdigit() and manager.replay_to(stream, list_id, int(seq), epoch)):
+                yield f"data: {json.dumps({'type': 'resync', 'list_id': list_id})}\n\n"
+
+        while True:
+            try:
+                frame = await asyncio.wait_for(
+                    stream.queue.get(), timeout=settings.SSE_KEEPALIVE_INTERVAL
+                )
+            except asyncio.TimeoutError:
+                yield ": keepalive\n\n"
+                continue
+            if frame is STREAM_CLOSED:
+                # Dropped as too slow; the client reconnects and resumes
+                return
+            if frame is RESYNC_PAYLOAD:
+                stream.resyncing = False
+            seq = frame_seq(frame)
+            event_id = f"id: {manager.epoch}:{seq}\n" if seq else ""
+            yield f"{event_id}data: {frame}\n\n"
+    finally:
+        manager.close_stream(stream)
+
+
+@router.get("/{list_id}/events")
+async def list_events(
+    list_id: str,
+    last_event_id: Optional[str] = Header(None),
+    user: User = Depends(get_current_user_read),
+    db: Session = Depends(get_db),
+):
+    """Stream the list's real-time events as Server-Sent Events.
+
+    Works with read-scoped API keys. Send the Last-Event-ID header when
+    reconnecting to receive only the events missed in between.
+    """
+    check_list_access(list_id, user.id, db)
+    return StreamingResponse(
+        _list_event_stream(list_id, last_event_id),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
@@ -1,5 +1,5 @@
 from datetime import datetime
-from typing import Optional
+from typing import Annotated, Optional
 
 from pydantic import BaseModel, Field
 
@@ -219,6 +219,33 @@ class InviteCodeOut(BaseModel):
         from_attributes = True
 
 
+# ─── Audit Log ──────────────────────────────────────────────────────
+
+class AuditLogOut(BaseModel):
+    id: str
+    user_id: Optional[str]
+    username: Optional[str] = None
+    action: str
+    detail: Optional[str]
+    ip_address: Optional[str]
+    created_at: datetime
+
+    class Config:
+        from_attributes = True
+
+
+class AuditLogPage(BaseModel):
+    items: list[AuditLogOut]
+    # Pass as ?cursor= to fetch the next (older) page; null on the last page
+    next_cursor: Optional[str] = None
+
+
+class AuditRollupOut(BaseModel):
+    day: str
+    action: str
+    count: int
+
+
 # ─── Item Suggestions ──────────────────────────────────────────────
 
 class ItemSuggestion(BaseModel):
@@ -234,6 +261,36 @@ class RecipeImportRequest(BaseModel):
     url: str = Field(..., min_length=10, max_length=2000)
 
 
+class RecipeImportJobCreate(BaseModel):
+    urls: list[Annotated[str, Field(min_length=10, max_length=2000)]] = Field(..., min_length=1)
+
+
+class RecipeUrlResultOut(BaseModel):
+    url: str
+    status: str  # pending, ok, error
+    title: Optional[str] = None
+    ingredient_count: int = 0
+    error: Optional[str] = None
+
+    class Config:
+        from_attributes = True
+
+
+class RecipeImportJobOut(BaseModel):
+    id: str
+    list_id: str
+    status: str  # pending, running, completed, failed
+    completed: int
+    added_count: int
+    error: Optional[str] = None
+    results: list[RecipeUrlResultOut]
+    created_at: datetime
+    finished_at: Optional[datetime] = None
+
+    class Config:
+        from_attributes = True
+
+
 class RecipeIngredientOut(BaseModel):
     name: str
     quantity: float
@@ -0,0 +1,175 @@
+"""Per-request SQL instrumentation.
+
+SQLAlchemy cursor events count every statement a request executes, time
+it, and group it by fingerprint: the SQL with whitespace and IN (...) lists
+normalised, so one query run with different parameters counts as repeats.
+A request's totals are sent in a ``Server-Timing`` header (shown in the
+browser's network panel) and, with SQL_DEBUG_LOG, logged as one line that
+also names any statement run SQL_REPEAT_THRESHOLD or more times, the mark
+of an N+1 loop.
+
+SQL_STRICT is meant for test runs: a lazy relationship load, or a statement
+reaching the repeat threshold, raises QueryPatternError inside the request.
+
+Work outside a request (background threads, startup) isn't tracked.
+"""
+
+import logging
+import re
+import time
+from collections import Counter
+from contextvars import ContextVar
+from typing import Optional
+
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from config import settings
+from metrics import Histogram
+
+logger = logging.getLogger("kitchen_cupboard.sql")
+
+# Statements per request
+COUNT_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 200)
+
+_IN_LIST = re.compile(r"\(\s*\?(?:\s*,\s*\?)+\s*\)")
+
+
+class QueryPatternError(RuntimeError):
+    """A lazy load or N+1 pattern in strict mode."""
+
+
+def fingerprint(statement: str) -> str:
+    return _IN_LIST.sub("(?, ...)", " ".join(statement.split()))
+
+
+class RequestQueries:
+    """SQL executed while handling one request."""
+
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0
+        self.lazy_loads = 0
+        self.fingerprints: Counter[str] = Counter()
+
+    def record(self, statement: str, duration: float) -> int:
+        """Add one statement; returns how often its fingerprint has now run."""
+        self.count += 1
+        self.duration += duration
+        key = fingerprint(statement)
+        self.fingerprints[key] += 1
+        return self.fingerprints[key]
+
+    def repeated(self, threshold: int) -> list[tuple[str, int]]:
+        return [(sql, n) for sql, n in self.fingerprints.most_common() if n >= threshold]
+
+    def server_timing(self) -> str:
+        return f'db;dur={self.duration * 1000:.1f};desc="{self.count} queries"'
+
+
+_current: ContextVar[Optional[RequestQueries]] = ContextVar("request_queries", default=None)
+
+# Totals across requests, for the stats endpoints
+totals = {"requests": 0, "statements": 0, "repeated": 0, "lazy_loads": 0}
+db_time = Histogram()
+statement_counts = Histogram(COUNT_BUCKETS)
+
+
+# ─── SQLAlchemy hooks ──────────────────────────────────────────────
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if _current.get() is not None:
+        conn.info.setdefault("query_started", []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    queries = _current.get()
+    started = conn.info.get("query_started")
+    if queries is None or not started:
+        return
+    runs = queries.record(statement, time.perf_counter() - started.pop())
+    if settings.SQL_STRICT and runs == settings.SQL_REPEAT_THRESHOLD:
+        raise QueryPatternError(f"Statement ran {runs} times in one request (N+1?): {fingerprint(statement)}")
+
+
+def _do_orm_execute(state):
+    queries = _current.get()
+    if queries is None or not state.is_select or state.lazy_loaded_from is None:
+        return
+    queries.lazy_loads += 1
+    if settings.SQL_STRICT:
+        mapper = state.lazy_loaded_from.mapper.class_.__name__
+        raise QueryPatternError(f"Lazy load from {mapper} (eager-load it with joinedload/selectinload)")
+
+
+def install(engine):
+    """Start timing statements on engine and watching ORM sessions for lazy loads."""
+    if event.contains(engine, "before_cursor_execute", _before_cursor_execute):
+        return
+    event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(engine, "after_cursor_execute", _after_cursor_execute)
+    event.listen(Session, "do_orm_execute", _do_orm_execute)
+    if settings.SQL_DEBUG_LOG and not logger.handlers:
+        handler = logging.StreamHandler()
+        handler.setFormatter(logging.Formatter("%(levelname)s:     %(message)s"))
+        logger.addHandler(handler)
+        logger.setLevel(logging.DEBUG)
+
+
+def _finish(scope, queries: RequestQueries):
+    repeated = queries.repeated(settings.SQL_REPEAT_THRESHOLD)
+    totals["requests"] += 1
+    totals["statements"] += queries.count
+    totals["lazy_loads"] += queries.lazy_loads
+    if repeated:
+        totals["repeated"] += 1
+    if queries.count:
+        db_time.observe(queries.duration)
+        statement_counts.observe(queries.count)
+
+    if logger.isEnabledFor(logging.DEBUG) and queries.count:
+        logger.debug(
+            "%s %s: %d queries, %.1f ms in DB, %d lazy loads",
+            scope["method"], scope["path"], queries.count, queries.duration * 1000, queries.lazy_loads,
+        )
+        for sql, runs in repeated:
+            logger.debug("  repeated %dx: %s", runs, sql[:200])
+
+
+def stats() -> dict:
+    requests = totals["requests"]
+    return {
+        **totals,
+        "mean_statements": round(totals["statements"] / requests, 1) if requests else 0.0,
+        "db_time": db_time.summary(),
+    }
+
+
+# ─── Middleware ────────────────────────────────────────────────────
+
+class QueryStatsMiddleware:
+    """Collects each HTTP request's SQL and reports it in a Server-Timing header."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        queries = RequestQueries()
+        token = _current.set(queries)
+
+        async def send_with_timing(message):
+            if message["type"] == "http.response.start":
+                headers = list(message.get("headers", []))
+                headers.append((b"server-timing", queries.server_timing().encode()))
+                message = {**message, "headers": headers}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            _current.reset(token)
+            _finish(scope, queries)
@@ -0,0 +1,169 @@
+"""The built frontend (static/), served from an index built once.
+
+Indexing walks static/ and records each file's content type, a
+content-hash ETag and any precompressed siblings (name.br, name.gz,
+written by the Docker build). Compressible files without a .gz get one
+gzipped in memory, so development builds are compressed too.
+
+A request is then a dict lookup: no filesystem checks, and paths that
+aren't in the index never reach the disk. Vite content-hashes the files
+it puts under assets/, so those are cached as immutable for a year;
+anything else (index.html) is revalidated with If-None-Match.
+"""
+
+import gzip
+import hashlib
+import mimetypes
+import os
+import threading
+from typing import Optional
+
+from starlette.datastructures import Headers
+from starlette.responses import FileResponse, Response
+
+IMMUTABLE = "public, max-age=31536000, immutable"
+REVALIDATE = "no-cache"
+COMPRESSIBLE = {".html", ".js", ".mjs", ".css", ".svg", ".json", ".map", ".txt", ".webmanifest"}
+# Below this, compression saves less than the headers it adds
+MIN_COMPRESS_SIZE = 1024
+# (Content-Encoding, file suffix), preferred first
+ENCODINGS = (("br", ".br"), ("gzip", ".gz"))
+
+
+class _Variant:
+    """One encoding of a file: on disk (path) or compressed at startup (body)."""
+
+    __slots__ = ("encoding", "etag", "path", "stat", "body")
+
+    def __init__(self, encoding: str, etag: str, path: Optional[str] = None, body: Optional[bytes] = None):
+        self.encoding = encoding
+        self.etag = etag
+        self.path = path
+        self.stat = os.stat(path) if path else None
+        self.body = body
+
+
+class _Asset:
+    __slots__ = ("path", "stat", "media_type", "etag", "cache_control", "variants")
+
+    def __init__(self, path: str, media_type: str, etag: str, cache_control: str, variants: list[_Variant]):
+        self.path = path
+        self.stat = os.stat(path)
+        self.media_type = media_type
+        self.etag = etag
+        self.cache_control = cache_control
+        self.variants = variants
+
+
+def _accepted_encodings(header: str) -> tuple[set[str], set[str]]:
+    """The codings an Accept-Encoding header accepts, and those it refuses with q=0."""
+    accepted, refused = set(), set()
+    for part in header.split(","):
+        coding, _, params = part.partition(";")
+        coding = coding.strip().lower()
+        params = params.strip().replace(" ", "")
+        if params.startswith("q="):
+            try:
+                if float(params[2:]) == 0:
+                    refused.add(coding)
+                    continue
+            except ValueError:
+                continue
+        accepted.add(coding)
+    return accepted, refused
+
+
+class StaticAssets:
+    """Serves files under root by their path relative to it, falling back to index.html."""
+
+    def __init__(self, root: str, immutable_dir: str = "assets"):
+        self.root = root
+        self._immutable_prefix = immutable_dir + "/"
+        self._index: Optional[dict[str, _Asset]] = None
+        self._lock = threading.Lock()
+
+    def load(self) -> dict[str, _Asset]:
+        """Build the index if it isn't built yet."""
+        with self._lock:
+            if self._index is None:
+                self._index = self._build()
+            return self._index
+
+    def _build(self) -> dict[str, _Asset]:
+        index = {}
+        for dirpath, _, filenames in os.walk(self.root):
+            names = set(filenames)
+            for name in filenames:
+                if name.endswith((".br", ".gz")) and name[:-3] in names:
+                    continue  # a precompressed copy, served with its original
+                path = os.path.join(dirpath, name)
+                rel = os.path.relpath(path, self.root).replace(os.sep, "/")
+                index[rel] = self._index_file(path, rel, names)
+        return index
+
+    def _index_file(self, path: str, rel: str, siblings: set[str]) -> _Asset:
+        with open(path, "rb") as f:
+            data = f.read()
+        digest = hashlib.sha256(data).hexdigest()[:20]
+        name = os.path.basename(path)
+        variants = [
+            _Variant(encoding, f'"{digest}-{encoding}"', path=path + suffix)
+            for encoding, suffix in ENCODINGS
+            if name + suffix in siblings
+        ]
+        compressible = os.path.splitext(name)[1].lower() in COMPRESSIBLE and len(data) >= MIN_COMPRESS_SIZE
+        if compressible and not any(v.encoding == "gzip" for v in variants):
+            body = gzip.compress(data, compresslevel=9, mtime=0)
+            if len(body) < len(data):
+                variants.append(_Variant("gzip", f'"{digest}-gzip"', body=body))
+        return _Asset(
+            path,
+            mimetypes.guess_type(name)[0] or "application/octet-stream",
+            f'"{digest}"',
+            IMMUTABLE if rel.startswith(self._immutable_prefix) else REVALIDATE,
+            variants,
+        )
+
+    def response(self, path: str, headers: Headers) -> Response:
+        index = self.load()
+        asset = index.get(path)
+        if asset is None:
+            # A missing hashed file is a stale page asking for an old build
+            if path.startswith(self._immutable_prefix):
+                return Response(status_code=404)
+            asset = index.get("index.html")
+            if asset is None:
+                return Response(status_code=404)
+
+        variant = None
+        if asset.variants:
+            accepted, refused = _accepted_encodings(headers.get("accept-encoding", ""))
+            # "*" covers any coding the header doesn't name, never one it refuses
+            variant = next(
+                (
+                    v for v in asset.variants
+                    if v.encoding not in refused and (v.encoding in accepted or "*" in accepted)
+                ),
+                None,
+            )
+        response_headers = {
+            "cache-control": asset.cache_control,
+            "etag": variant.etag if variant else asset.etag,
+        }
+        if asset.variants:
+            response_headers["vary"] = "Accept-Encoding"
+
+        if_none_match = headers.get("if-none-match")
+        if if_none_match:
+            tags = {tag.strip().removeprefix("W/") for tag in if_none_match.split(",")}
+            if "*" in tags or response_headers["etag"] in tags:
+                return Response(status_code=304, headers=response_headers)
+
+        if variant is None:
+            return FileResponse(asset.path, stat_result=asset.stat, media_type=asset.media_type,
+                                headers=response_headers)
+        response_headers["content-encoding"] = variant.encoding
+        if variant.body is not None:
+            return Response(variant.body, media_type=asset.media_type, headers=response_headers)
+        return FileResponse(variant.path, stat_result=variant.stat, media_type=asset.media_type,
+                            headers=response_headers)
@@ -0,0 +1,205 @@
+"""Everything /api/metrics reports, gathered at scrape time.
+
+Components keep their own plain counters and histograms (cheap to update
+on hot paths: an integer increment or one uncontended lock). Gauges such
+as connection counts and queue depths are read only here, when Prometheus
+scrapes, so they cost nothing between scrapes.
+"""
+
+import heapq
+import ipaddress
+
+from sqlalchemy.pool import QueuePool
+
+import recipe_parser
+import sql_stats
+from admission import admission
+from audit import audit_writer
+from config import settings
+from database import engine, pool_checkout_wait
+from hashing import password_hasher
+from metrics import PrometheusText, RequestMetrics
+from rate_limit import login_limiter, rate_limit_store, register_limiter
+from websocket_manager import manager
+
+request_metrics = RequestMetrics()
+
+# Lists given their own kc_list_subscribers series; the rest are summed as "other"
+TOP_LISTS = 10
+
+_allowed_networks = [
+    ipaddress.ip_network(network.strip(), strict=False)
+    for network in settings.METRICS_ALLOW_FROM.split(",")
+    if network.strip()
+]
+
+
+def scrape_allowed(host: str | None) -> bool:
+    """Whether a client may scrape without logging in (METRICS_ALLOW_FROM)."""
+    if not host or not _allowed_networks:
+        return False
+    try:
+        address = ipaddress.ip_address(host)
+    except ValueError:
+        return False
+    return any(address in network for network in _allowed_networks)
+
+
+def _http(out: PrometheusText):
+    out.histogram(
+        "http_request_duration_seconds",
+        "Time to complete HTTP requests, by route template",
+        [
+            ({"method": method, "route": route, "status": status}, histogram)
+            for (method, route, status), histogram in sorted(request_metrics.latency.items())
+        ],
+    )
+    out.gauge("http_requests_in_flight", "HTTP requests being handled", request_metrics.in_flight)
+    stats = admission.stats()
+    out.gauge(
+        "admission_in_flight",
+        "API requests holding an admission slot",
+        [({"kind": kind}, n) for kind, n in stats["in_flight"].items()],
+    )
+    out.counter(
+        "admission_requests_total",
+        "API requests by admission outcome",
+        [({"outcome": outcome}, stats[outcome]) for outcome in ("admitted", "throttled", "shed")],
+    )
+
+
+def _database(out: PrometheusText):
+    out.histogram(
+        "db_pool_checkout_wait_seconds",
+        "Time spent waiting for a pooled database connection",
+        pool_checkout_wait,
+    )
+    pool = engine.pool
+    if isinstance(pool, QueuePool):
+        out.gauge(
+            "db_pool_connections",
+            "Pooled database connections by state",
+            [({"state": "checked_out"}, pool.checkedout()), ({"state": "idle"}, pool.checkedin())],
+        )
+    if settings.SQL_INSTRUMENTATION:
+        out.histogram("request_db_seconds", "Database time per HTTP request", sql_stats.db_time)
+        out.histogram(
+            "request_sql_statements", "SQL statements per HTTP request", sql_stats.statement_counts
+        )
+        out.counter(
+            "sql_repeated_statement_requests_total",
+            "Requests that ran one statement SQL_REPEAT_THRESHOLD or more times (likely N+1)",
+            sql_stats.totals["repeated"],
+        )
+        out.counter("sql_lazy_loads_total", "Lazy ORM relationship loads", sql_stats.totals["lazy_loads"])
+
+
+def _realtime(out: PrometheusText):
+    counters = manager.counters
+    out.gauge("ws_connections", "Open WebSocket connections", len(manager.connections))
+    out.gauge("sse_streams", "Open Server-Sent Event streams", len(manager.streams))
+    sizes = {list_id: len(subs) for list_id, subs in manager.subscriptions.items() if subs}
+    top = heapq.nlargest(TOP_LISTS, sizes.items(), key=lambda item: item[1])
+    out.gauge("subscribed_lists", "Lists with at least one subscriber", len(sizes))
+    out.gauge(
+        "list_subscribers",
+        f"WebSocket connections and event streams following the {TOP_LISTS} busiest lists, and all others",
+        [
+            *(({"list_id": list_id}, n) for list_id, n in top),
+            ({"list_id": "other"}, sum(sizes.values()) - sum(n for _, n in top)),
+        ],
+    )
+    out.histogram(
+        "broadcast_fanout_seconds",
+        "Time to queue one list event for every local subscriber",
+        manager.fanout_time,
+    )
+    out.counter(
+        "ws_messages_total",
+        "Outbound real-time messages by outcome",
+        [({"outcome": "queued"}, counters["messages_queued"]), ({"outcome": "dropped"}, counters["messages_dropped"])],
+    )
+    out.counter("ws_resyncs_total", "Slow clients told to resync", counters["resyncs"])
+    out.counter("ws_slow_disconnects_total", "Slow clients disconnected", counters["slow_disconnects"])
+
+
+def _recipes(out: PrometheusText):
+    out.counter(
+        "recipe_fetches_total",
+        "Recipe URL fetches by outcome",
+        [({"outcome": outcome}, n) for outcome, n in recipe_parser.fetch_counters.items()],
+    )
+    out.histogram("recipe_fetch_seconds", "Time to fetch and parse a recipe URL", recipe_parser.fetch_time)
+
+
+def _rate_limits(out: PrometheusText):
+    limiters = [login_limiter, register_limiter, *admission.limiters()]
+    out.counter(
+        "rate_limit_attempts_total",
+        "Attempts counted against a rate limit",
+        [({"scope": limiter.scope}, limiter.counters["attempts"]) for limiter in limiters],
+    )
+    out.counter(
+        "rate_limit_limited_total",
+        "Attempts refused by a rate limit",
+        [({"scope": limiter.scope}, limiter.counters["limited"]) for limiter in limiters],
+    )
+    out.gauge("rate_limit_keys", "Clients with rate-limit state", len(rate_limit_store))
+
+
+def _caches(out: PrometheusText):
+    parse = recipe_parser._parse_ingredient_cached.cache_info()
+    replay = manager.counters
+    out.counter(
+        "cache_hits_total",
+        "Cache hits (ingredient_parse: parsed ingredient lines; ws_replay: reconnects caught up from the buffer)",
+        [({"cache": "ingredient_parse"}, parse.hits), ({"cache": "ws_replay"}, replay["replay_hits"])],
+    )
+    out.counter(
+        "cache_misses_total",
+        "Cache misses (ws_replay: reconnects that had to resync)",
+        [({"cache": "ingredient_parse"}, parse.misses), ({"cache": "ws_replay"}, replay["replay_misses"])],
+    )
+    out.gauge(
+        "cache_entries",
+        "Entries held per cache",
+        [
+            ({"cache": "ingredient_parse"}, parse.currsize),
+            ({"cache": "ws_replay"}, manager.stats()["replay_frames"]),
+        ],
+    )
+
+
+def _background(out: PrometheusText):
+    hasher = password_hasher.stats()
+    out.histogram(
+        "password_hash_seconds",
+        "bcrypt time per operation",
+        [({"op": op}, h) for op, h in password_hasher.hash_time.items()],
+    )
+    out.histogram(
+        "password_hash_queue_wait_seconds",
+        "Time password operations waited for a hashing worker",
+        [({"op": op}, h) for op, h in password_hasher.queue_wait.items()],
+    )
+    out.gauge("password_hash_pending", "Password operations queued or running", hasher["pending"])
+    out.counter(
+        "password_hash_rejected_total",
+        "Password operations refused because the hashing pool was full or timed out",
+        hasher["rejected"] + hasher["timeouts"],
+    )
+
+    audit = audit_writer.stats()
+    out.gauge("audit_queue_depth", "Audit entries waiting to be written", audit["pending"])
+    out.counter(
+        "audit_entries_total",
+        "Audit entries by outcome",
+        [({"outcome": outcome}, audit[outcome]) for outcome in ("written", "dropped", "failed", "pruned")],
+    )
+
+
+def render() -> str:
+    out = PrometheusText(prefix="kc_")
+    for collect in (_http, _database, _realtime, _recipes, _rate_limits, _caches, _background):
+        collect(out)
+    return out.render()
@@ -1,40 +1,519 @@
+import asyncio
 import json
-from collections import defaultdict
+import secrets
+import time
+from collections import OrderedDict, defaultdict, deque
 
 from fastapi import WebSocket
 
+import ws_codec
+from broadcast import MemoryBroadcast, create_backend
+from config import settings
+from metrics import FINE_BUCKETS, Histogram
+
+# Close codes sent when the server drops a connection on its own initiative
+WS_CLOSE_TOO_SLOW = 4008
+WS_CLOSE_IDLE = 4009
+
+# Sent in place of the dropped backlog when a slow client is downgraded
+RESYNC_PAYLOAD = json.dumps({"type": "resync"})
+
+# Queued to an event stream the manager has dropped, to end it
+STREAM_CLOSED = object()
+
+# Every delivered frame starts with its sequence number
+_SEQ_PREFIX = '{"seq": '
+
+
+def frame_seq(frame: str) -> int | None:
+    """The sequence number of a delivered JSON frame (None for control frames)."""
+    if not frame.startswith(_SEQ_PREFIX):
+        return None
+    return int(frame[len(_SEQ_PREFIX):frame.index(",", len(_SEQ_PREFIX))])
+
+
+class _Connection:
+    """One subscriber with its own bounded outbound queue.
+
+    A socket may be subscribed to any number of lists; the manager indexes
+    subscriptions by list so a broadcast only touches that list's sockets.
+    Sockets have a writer task draining the queue. Server-Sent Event streams
+    have no socket (websocket is None): the HTTP response reads the queue.
+    """
+
+    def __init__(self, websocket: WebSocket | None, queue_size: int, encoding: str = ws_codec.JSON):
+        self.websocket = websocket
+        self.encoding = encoding
+        self.list_ids: set[str] = set()
+        # Text frames are JSON; bytes frames are MessagePack events
+        self.queue: asyncio.Queue[str | bytes] = asyncio.Queue(maxsize=queue_size)
+        self.last_seen = time.monotonic()
+        # While set, new events are dropped: the client will refetch everything
+        # when it receives the queued resync frame.
+        self.resyncing = False
+        self.writer: asyncio.Task | None = None
+
+
+class _ReplayBuffer:
+    """The most recent frames sent to one list, oldest first."""
+
+    __slots__ = ("events", "dropped_upto")
+
+    def __init__(self, size: int):
+        self.events: deque[tuple[int, str]] = deque(maxlen=size)
+        # Highest sequence number that has fallen out of the buffer
+        self.dropped_upto = 0
+
+
+def _merge_item_events(previous: dict, message: dict) -> dict:
+    """Combine two coalesced events for the same item into one."""
+    if message["type"] not in ("item_updated", "item_checked"):
+        return message
+    if previous["type"] not in ("item_added", "item_updated", "item_checked"):
+        return message
+
+    prev_data, data = previous["data"], message["data"]
+    if "changes" not in data:
+        merged = data
+    elif "changes" in prev_data:
+        # Two deltas: keep the older base so clients can still detect gaps
+        merged = {
+            **data,
+            "base_rev": prev_data["base_rev"],
+            "changes": {**prev_data["changes"], **data["changes"]},
+        }
+    else:
+        # Full object followed by a delta: fold the changes in
+        merged = {**prev_data, **data["changes"], "updated_at": data["rev"]}
+
+    # The client hasn't seen the item yet; it still needs to be added
+    msg_type = "item_added" if previous["type"] == "item_added" else message["type"]
+    return {**message, "type": msg_type, "data": merged}
+
 
 class ConnectionManager:
-    """Manages WebSocket connections for real-time list collaboration."""
+    """Manages WebSocket connections for real-time list collaboration.
+
+    Broadcasting never awaits a socket: each payload is put on every
+    subscriber's bounded queue and a per-connection writer task drains it.
+    A client whose queue fills up is either disconnected or downgraded to a
+    single resync frame, depending on WS_SLOW_CLIENT_POLICY, so one phone on
+    a bad connection can't hold up everyone else.
+
+    Broadcasts are also handed to a backend (see broadcast.py) so sockets
+    held by other worker processes receive them too.
+
+    With a coalescing window set, events for a list are held for that long
+    and sent as one "batch" frame; a later event for the same item replaces
+    the earlier one, so a burst of check-offs costs one frame per socket.
+
+    Each event is encoded once per wire format, not once per socket: JSON
+    for everyone, plus one MessagePack copy if any subscriber asked for it
+    (see ws_codec.py).
+
+    Every delivered frame gets a sequence number and is kept in a per-list
+    ring buffer, so a client that reconnects with its last sequence number
+    (and this manager's epoch) gets only what it missed.
+    """
+
+    def __init__(
+        self,
+        queue_size: int = 100,
+        slow_client_policy: str = "resync",
+        send_timeout: float = 10.0,
+        idle_timeout: float = 75.0,
+        coalesce_window: float = 0.0,
+        replay_size: int = 100,
+        replay_max_lists: int = 500,
+        backend=None,
+    ):
+        self.connections: dict[WebSocket, _Connection] = {}
+        # Server-Sent Event streams; these have no socket and aren't idle-reaped
+        self.streams: set[_Connection] = set()
+        # list_id -> connections subscribed to it
+        self.subscriptions: dict[str, set[_Connection]] = defaultdict(set)
+        self._backend = backend or MemoryBroadcast()
+        self._queue_size = queue_size
+        self._slow_client_policy = slow_client_policy
+        self._send_timeout = send_timeout
+        self._idle_timeout = idle_timeout
+        self._reaper: asyncio.Task | None = None
+        self._coalesce_window = coalesce_window
+        # list_id -> events waiting for the window to close, keyed by what they update
+        self._pending: dict[str, dict[tuple, dict]] = {}
+        self._pending_counts: dict[str, int] = {}
+        self._pending_seq = 0
+        self._flushers: set[asyncio.Task] = set()
+        # Sequence numbers are only comparable within one epoch (process lifetime)
+        self.epoch = secrets.token_hex(8)
+        self._seq = 0
+        self._replay_size = replay_size
+        self._replay_max_lists = replay_max_lists
+        self._replay: OrderedDict[str, _ReplayBuffer] = OrderedDict()
+        # Highest sequence number held by any list buffer evicted so far
+        self._replay_evicted_upto = 0
+        self.counters = {
+            "messages_queued": 0,
+            "messages_dropped": 0,
+            "resyncs": 0,
+            "slow_disconnects": 0,
+            "idle_reaped": 0,
+            "coalesced_events": 0,
+            "coalesced_frames": 0,
+            "frames_saved": 0,
+            "msgpack_encodes": 0,
+            "replay_hits": 0,
+            "replay_misses": 0,
+        }
+        # Time from an event reaching this process to it being queued for every subscriber
+        self.fanout_time = Histogram(FINE_BUCKETS)
+
+    async def start(self):
+        """Start receiving broadcasts published by other workers."""
+        await self._backend.start(self._deliver)
 
-    def __init__(self):
-        self.active_connections: dict[str, set[WebSocket]] = defaultdict(set)
+    async def stop(self):
+        for list_id in list(self._pending):
+            await self._flush(list_id)
+        await self._backend.stop()
 
     async def connect(self, websocket: WebSocket, list_id: str):
         await websocket.accept()
-        self.active_connections[list_id].add(websocket)
+        self.register(websocket, list_id)
+
+    def register(
+        self,
+        websocket: WebSocket,
+        list_id: str | None = None,
+        encoding: str = ws_codec.JSON,
+    ):
+        """Start delivering to an already-accepted socket, optionally subscribing it to a list."""
+        if websocket not in self.connections:
+            conn = _Connection(websocket, self._queue_size, encoding)
+            conn.writer = asyncio.create_task(self._writer(conn))
+            self.connections[websocket] = conn
+            self._ensure_reaper()
+        if list_id is not None:
+            self.subscribe(websocket, list_id)
+
+    def subscribe(self, websocket: WebSocket, list_id: str):
+        self._add_subscription(self.connections[websocket], list_id)
+
+    def _add_subscription(self, conn: _Connection, list_id: str):
+        conn.list_ids.add(list_id)
+        self.subscriptions[list_id].add(conn)
+
+    def unsubscribe(self, websocket: WebSocket, list_id: str):
+        conn = self.connections.get(websocket)
+        if conn is None:
+            return
+        conn.list_ids.discard(list_id)
+        self._remove_subscription(conn, list_id)
+
+    def _remove_subscription(self, conn: _Connection, list_id: str):
+        subscribers = self.subscriptions.get(list_id)
+        if subscribers is None:
+            return
+        subscribers.discard(conn)
+        if not subscribers:
+            del self.subscriptions[list_id]
+
+    def disconnect(self, websocket: WebSocket):
+        conn = self.connections.pop(websocket, None)
+        if conn is None:
+            return
+        for list_id in conn.list_ids:
+            self._remove_subscription(conn, list_id)
+        if conn.writer and conn.writer is not asyncio.current_task():
+            conn.writer.cancel()
+
+    def open_stream(self, list_id: str) -> _Connection:
+        """Subscribe a socketless event stream to a list; the caller reads its queue."""
+        conn = _Connection(None, self._queue_size)
+        self.streams.add(conn)
+        self._add_subscription(conn, list_id)
+        return conn
 
-    def disconnect(self, websocket: WebSocket, list_id: str):
-        conns = self.active_connections.get(list_id)
-        if conns is None:
+    def close_stream(self, conn: _Connection):
+        if conn not in self.streams:
             return
-        conns.discard(websocket)
-        if not conns:
-            del self.active_connections[list_id]
+        self.streams.discard(conn)
+        for list_id in conn.list_ids:
+            self._remove_subscription(conn, list_id)
+
+    def touch(self, websocket: WebSocket):
+        """Record client activity (pings) so the connection isn't reaped as idle."""
+        conn = self.connections.get(websocket)
+        if conn:
+            conn.last_seen = time.monotonic()
+
+    def subscription_count(self, websocket: WebSocket) -> int:
+        conn = self.connections.get(websocket)
+        return len(conn.list_ids) if conn else 0
 
     async def broadcast_to_list(self, list_id: str, message: dict):
-        conns = self.active_connections.get(list_id)
-        if not conns:
+        if self._coalesce_window <= 0:
+            await self._publish(list_id, message)
+            return
+
+        pending = self._pending.get(list_id)
+        if pending is None:
+            pending = self._pending[list_id] = {}
+            task = asyncio.create_task(self._flush_later(list_id))
+            self._flushers.add(task)
+            task.add_done_callback(self._flushers.discard)
+
+        key = self._coalesce_key(message)
+        previous = pending.pop(key, None)
+        if previous is not None:
+            message = _merge_item_events(previous, message)
+        # Re-inserting moves the event to the end so batches keep last-write order
+        pending[key] = message
+        self._pending_counts[list_id] = self._pending_counts.get(list_id, 0) + 1
+        self.counters["coalesced_events"] += 1
+
+    def _coalesce_key(self, message: dict) -> tuple:
+        """Events with the same key supersede each other inside a window."""
+        msg_type = message.get("type", "")
+        data = message.get("data")
+        if msg_type.startswith("item_") and isinstance(data, dict) and "id" in data:
+            return ("item", data["id"])
+        if msg_type == "items_reordered":
+            # Each reorder carries the complete order
+            return ("reorder",)
+        self._pending_seq += 1
+        return ("seq", self._pending_seq)
+
+    async def _flush_later(self, list_id: str):
+        await asyncio.sleep(self._coalesce_window)
+        await self._flush(list_id)
+
+    async def _flush(self, list_id: str):
+        pending = self._pending.pop(list_id, None)
+        received = self._pending_counts.pop(list_id, 0)
+        if not pending:
+            return
+        events = list(pending.values())
+        if len(events) == 1:
+            message = events[0]
+        else:
+            message = {"type": "batch", "list_id": list_id, "events": events}
+        subscribers = len(self.subscriptions.get(list_id, ()))
+        self.counters["coalesced_frames"] += 1
+        # One frame per subscriber instead of one per event received
+        self.counters["frames_saved"] += (received - 1) * subscribers
+        await self._publish(list_id, message)
+
+    async def _publish(self, list_id: str, message: dict):
+        payload = ws_codec.encode_json(message)
+        self._deliver(list_id, payload)
+        await self._backend.publish(list_id, payload)
+
+    def _deliver(self, list_id: str, payload: str):
+        """Number an encoded event, remember it, and queue it for local subscribers."""
+        self._seq += 1
+        # Splice the sequence number into the already-encoded JSON object
+        frame = f"{_SEQ_PREFIX}{self._seq}, {payload[1:]}"
+        self._remember(list_id, self._seq, frame)
+
+        subscribers = self.subscriptions.get(list_id)
+        if not subscribers:
+            return
+        started = time.perf_counter()
+        packed = None
+        for conn in list(subscribers):
+            if conn.encoding == ws_codec.MSGPACK:
+                if packed is None:
+                    packed = ws_codec.json_to_msgpack(frame)
+                    self.counters["msgpack_encodes"] += 1
+                self._enqueue(conn, packed)
+            else:
+                self._enqueue(conn, frame)
+        self.fanout_time.observe(time.perf_counter() - started)
+
+    def _remember(self, list_id: str, seq: int, frame: str):
+        buf = self._replay.get(list_id)
+        if buf is None:
+            buf = self._replay[list_id] = _ReplayBuffer(self._replay_size)
+            # This list's older events may have been in an evicted buffer
+            buf.dropped_upto = self._replay_evicted_upto
+            if len(self._replay) > self._replay_max_lists:
+                _, evicted = self._replay.popitem(last=False)
+                if evicted.events:
+                    self._replay_evicted_upto = max(self._replay_evicted_upto, evicted.events[-1][0])
+        else:
+            self._replay.move_to_end(list_id)
+        if len(buf.events) == buf.events.maxlen:
+            buf.dropped_upto = buf.events[0][0]
+        buf.events.append((seq, frame))
+
+    @property
+    def seq(self) -> int:
+        """The sequence number of the last frame delivered to any list."""
+        return self._seq
+
+    def replay(self, websocket: WebSocket, list_id: str, last_seq: int, epoch: str) -> bool:
+        """Queue every frame for list_id after last_seq on a subscribed socket.
+
+        Returns False when the gap can't be filled — a different epoch or
+        events already gone from the buffer — and the client must resync.
+        """
+        return self.replay_to(self.connections[websocket], list_id, last_seq, epoch)
+
+    def replay_to(self, conn: _Connection, list_id: str, last_seq: int, epoch: str) -> bool:
+        """Like replay(), for a connection or stream already in hand."""
+        filled = self._fill_gap(conn, list_id, last_seq, epoch)
+        self.counters["replay_hits" if filled else "replay_misses"] += 1
+        return filled
+
+    def _fill_gap(self, conn: _Connection, list_id: str, last_seq: int, epoch: str) -> bool:
+        if epoch != self.epoch or last_seq > self._seq:
+            return False
+        buf = self._replay.get(list_id)
+        if buf is None:
+            # Nothing buffered: fine only if no evicted buffer could have held newer events
+            return last_seq >= self._replay_evicted_upto
+        if buf.dropped_upto > last_seq:
+            return False
+        for seq, frame in buf.events:
+            if seq > last_seq:
+                if conn.encoding == ws_codec.MSGPACK:
+                    frame = ws_codec.json_to_msgpack(frame)
+                self._enqueue(conn, frame)
+        return True
+
+    def send_control(self, websocket: WebSocket, frame: str):
+        """Queue a protocol frame (pong, subscribed, error, ...) for a socket.
+
+        Control frames go through the same queue as events, so the writer
+        task is the only thing that ever sends on the socket, and frames
+        arrive in the order they were queued. They are JSON text whatever
+        the socket's encoding and aren't dropped while it awaits a resync.
+        """
+        conn = self.connections.get(websocket)
+        if conn is not None:
+            self._enqueue(conn, frame, control=True)
+
+    def _enqueue(self, conn: _Connection, payload: str | bytes, control: bool = False):
+        if conn.resyncing and not control:
+            self.counters["messages_dropped"] += 1
             return
-        payload = json.dumps(message, default=str)
-        dead: list[WebSocket] = []
-        for ws in conns:
-            try:
-                await ws.send_text(payload)
-            except Exception:
-                dead.append(ws)
-        for ws in dead:
-            conns.discard(ws)
+        try:
+            conn.queue.put_nowait(payload)
+            self.counters["messages_queued"] += 1
+            return
+        except asyncio.QueueFull:
+            pass
+
+        # The client can't keep up
+        if self._slow_client_policy == "disconnect":
+            self.counters["slow_disconnects"] += 1
+            self.counters["messages_dropped"] += conn.queue.qsize() + 1
+            self._drop(conn, WS_CLOSE_TOO_SLOW)
+            return
+
+        self.counters["resyncs"] += 1
+        self.counters["messages_dropped"] += conn.queue.qsize()
+        while not conn.queue.empty():
+            conn.queue.get_nowait()
+        conn.queue.put_nowait(RESYNC_PAYLOAD)
+        conn.resyncing = True
+        # The resync replaces events, not answers to the client's own requests
+        if control and not conn.queue.full():
+            conn.queue.put_nowait(payload)
+            self.counters["messages_queued"] += 1
+        else:
+            self.counters["messages_dropped"] += 1
+
+    def _drop(self, conn: _Connection, code: int):
+        """Unsubscribe a connection and close its socket in the background."""
+        if conn.websocket is None:
+            self.close_stream(conn)
+            while not conn.queue.empty():
+                conn.queue.get_nowait()
+            conn.queue.put_nowait(STREAM_CLOSED)
+            return
+        self.disconnect(conn.websocket)
+        asyncio.create_task(self._close(conn.websocket, code))
+
+    @staticmethod
+    async def _close(websocket: WebSocket, code: int):
+        try:
+            await websocket.close(code=code)
+        except Exception:
+            pass
+
+    async def _writer(self, conn: _Connection):
+        try:
+            while True:
+                payload = await conn.queue.get()
+                if payload is RESYNC_PAYLOAD:
+                    conn.resyncing = False
+                if isinstance(payload, bytes):
+                    send = conn.websocket.send_bytes(payload)
+                else:
+                    send = conn.websocket.send_text(payload)
+                await asyncio.wait_for(send, timeout=self._send_timeout)
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            # Send failed or timed out — the socket is dead or hopelessly slow
+            self._drop(conn, WS_CLOSE_TOO_SLOW)
+
+    def _ensure_reaper(self):
+        if self._reaper is None or self._reaper.done():
+            self._reaper = asyncio.create_task(self._reap_idle())
+
+    async def _reap_idle(self):
+        """Close connections that have stopped sending their periodic pings."""
+        interval = max(1.0, self._idle_timeout / 3)
+        while self.connections:
+            await asyncio.sleep(interval)
+            cutoff = time.monotonic() - self._idle_timeout
+            for conn in list(self.connections.values()):
+                if conn.last_seen < cutoff:
+                    self.counters["idle_reaped"] += 1
+                    self._drop(conn, WS_CLOSE_IDLE)
 
+    def stats(self) -> dict:
+        """Connection counts and outbound queue lengths, per list."""
+        lists = {}
+        for list_id, subscribers in self.subscriptions.items():
+            sizes = [c.queue.qsize() for c in subscribers]
+            lists[list_id] = {
+                "connections": len(sizes),
+                "queued": sum(sizes),
+                "max_queued": max(sizes, default=0),
+                "resyncing": sum(1 for c in subscribers if c.resyncing),
+            }
+        encodings = defaultdict(int)
+        for conn in self.connections.values():
+            encodings[conn.encoding] += 1
+        return {
+            "connections": len(self.connections),
+            "streams": len(self.streams),
+            "encodings": dict(encodings),
+            "subscriptions": sum(len(c.list_ids) for c in self.connections.values()),
+            "queue_capacity": self._queue_size,
+            "slow_client_policy": self._slow_client_policy,
+            "coalesce_window_ms": round(self._coalesce_window * 1000),
+            "replay_buffers": len(self._replay),
+            "replay_frames": sum(len(b.events) for b in self._replay.values()),
+            "lists": lists,
+            **self.counters,
+        }
 
-manager = ConnectionManager()
+manager = ConnectionManager(
+    queue_size=settings.WS_SEND_QUEUE_SIZE,
+    slow_client_policy=settings.WS_SLOW_CLIENT_POLICY,
+    send_timeout=settings.WS_SEND_TIMEOUT,
+    idle_timeout=settings.WS_IDLE_TIMEOUT,
+    coalesce_window=settings.WS_COALESCE_WINDOW_MS / 1000,
+    replay_size=settings.WS_REPLAY_BUFFER_SIZE,
+    replay_max_lists=settings.WS_REPLAY_MAX_LISTS,
+    backend=create_backend(
+        settings.BROADCAST_BACKEND,
+        settings.BROADCAST_SQLITE_PATH,
+        settings.BROADCAST_POLL_INTERVAL,
+    ),
+)
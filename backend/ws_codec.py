@@ -0,0 +1,53 @@
+"""Wire encodings for WebSocket event frames.
+
+Every broadcast is encoded to JSON exactly once; connections that negotiated
+MessagePack get a binary frame derived from that JSON, again at most once per
+broadcast however many of them are subscribed. Compression is separate: it
+is permessage-deflate, negotiated per connection by uvicorn.
+
+Both faster codecs are optional. Without orjson the standard library encoder
+is used, and without msgpack a client asking for it simply gets JSON.
+"""
+
+import json
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - optional speedup
+    orjson = None
+
+try:
+    import msgpack
+except ImportError:  # pragma: no cover - optional encoding
+    msgpack = None
+
+JSON = "json"
+MSGPACK = "msgpack"
+
+
+def available_encodings() -> list[str]:
+    return [JSON, MSGPACK] if msgpack is not None else [JSON]
+
+
+def negotiate(requested: str | None) -> str:
+    """The encoding a connection will get for what it asked for."""
+    if requested == MSGPACK and msgpack is not None:
+        return MSGPACK
+    return JSON
+
+
+def encode_json(message: dict) -> str:
+    if orjson is not None:
+        return orjson.dumps(message, default=str).decode()
+    return json.dumps(message, default=str)
+
+
+def decode_json(frame: str):
+    if orjson is not None:
+        return orjson.loads(frame)
+    return json.loads(frame)
+
+
+def json_to_msgpack(frame: str) -> bytes:
+    """Re-encode a JSON event frame as MessagePack."""
+    return msgpack.packb(decode_json(frame), use_bin_type=True)
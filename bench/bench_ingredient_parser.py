@@ -0,0 +1,185 @@
+"""
+Ingredient parser benchmark and accuracy guard.
+
+Runs the checked-in corpus (bench/data/ingredients.jsonl) through
+recipe_parser and compares against the pre-compiled reference parser kept
+below. Every corpus line carries its expected name/quantity/unit; any
+mismatch fails the run, so a "faster" parser can't quietly get worse.
+
+The corpus is synthetic, not scraped: each line combines a size word,
+quantity, unit, food and preparation note taken from fixed lists, so some
+lines read oddly ("0.5 cinnamon stick, to serve"). The expected values
+are whatever the reference parser returned for each line. The check
+therefore guards against behaviour changes. It does not measure accuracy
+against how a person would read the line.
+
+Usage (from the project root):
+    python bench/bench_ingredient_parser.py [--rounds 5]
+"""
+
+import argparse
+import json
+import os
+import re
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, "backend"))
+
+import recipe_parser  # noqa: E402
+from recipe_parser import _UNIT_PATTERNS, _FRACTIONS, _SKIP_PREFIXES  # noqa: E402
+
+CORPUS = os.path.join(ROOT, "bench", "data", "ingredients.jsonl")
+
+
+# ─── Reference implementation (pre-compiled-grammar parser) ────────
+
+def _reference_parse_fraction(s):
+    s = s.strip()
+    for char, val in _FRACTIONS.items():
+        if char in s:
+            rest = s.replace(char, "").strip()
+            base = float(rest) if rest else 0
+            return base + val
+    if "/" in s:
+        parts = s.split("/")
+        if len(parts) == 2:
+            try:
+                return float(parts[0]) / float(parts[1])
+            except (ValueError, ZeroDivisionError):
+                return None
+    try:
+        return float(s)
+    except ValueError:
+        return None
+
+
+def reference_parse_ingredient(text):
+    original = text.strip()
+    text = re.sub(r"<[^>]+>", "", text).strip()
+    text = re.sub(r"\([^)]*\)", "", text).strip()
+    text = re.sub(r",\s+(?:finely|roughly|freshly|thinly|coarsely|lightly).*$", "", text, flags=re.IGNORECASE).strip()
+    text = _SKIP_PREFIXES.sub("", text).strip()
+
+    quantity = 1.0
+    unit = ""
+    name = text
+    qty_match = re.match(
+        r"^(\d+\s*[½⅓⅔¼¾⅕⅖⅗⅘⅙⅚⅛⅜⅝⅞]|\d+\s*/\s*\d+|\d+\s+\d+\s*/\s*\d+|\d+\.?\d*|[½⅓⅔¼¾⅕⅖⅗⅘⅙⅚⅛⅜⅝⅞])\s*",
+        text,
+    )
+    if qty_match:
+        qty_str = qty_match.group(1).strip()
+        space_frac = re.match(r"^(\d+)\s+(\d+/\d+)$", qty_str)
+        if space_frac:
+            quantity = float(space_frac.group(1)) + (_reference_parse_fraction(space_frac.group(2)) or 0)
+        else:
+            parsed = _reference_parse_fraction(qty_str)
+            if parsed is not None:
+                quantity = parsed
+        name = text[qty_match.end():].strip()
+
+    for pattern, normalized in _UNIT_PATTERNS:
+        unit_match = re.match(rf"^({pattern})[\s.,]+(.*)$", name, re.IGNORECASE)
+        if unit_match:
+            unit = normalized
+            name = unit_match.group(2).strip()
+            break
+    if not unit and qty_match:
+        remaining = text[qty_match.end():]
+        for pattern, normalized in _UNIT_PATTERNS:
+            unit_glued = re.match(rf"^({pattern})\b\s*(.*)", remaining, re.IGNORECASE)
+            if unit_glued:
+                unit = normalized
+                name = unit_glued.group(2).strip()
+                break
+
+    name = re.sub(r"\s+", " ", name).strip()
+    name = re.sub(r"^of\s+", "", name, flags=re.IGNORECASE).strip()
+    if name:
+        name = name[0].upper() + name[1:]
+    else:
+        name = original[0].upper() + original[1:] if original else "Unknown ingredient"
+    return name, round(quantity, 3), unit
+
+
+# ─── Benchmark ─────────────────────────────────────────────────────
+
+def _load_corpus():
+    with open(CORPUS, encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def _best_of(rounds, fn):
+    best = float("inf")
+    for _ in range(rounds):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def _check_accuracy(corpus):
+    recipe_parser._parse_ingredient_cached.cache_clear()
+    failures = []
+    for row in corpus:
+        got = recipe_parser.parse_ingredient(row["line"])
+        expected = (row["name"], row["quantity"], row["unit"])
+        if (got.name, got.quantity, got.unit) != expected:
+            failures.append((row["line"], expected, (got.name, got.quantity, got.unit)))
+    return failures
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--rounds", type=int, default=5)
+    args = parser.parse_args()
+
+    corpus = _load_corpus()
+    lines = [row["line"] for row in corpus]
+
+    failures = _check_accuracy(corpus)
+    for line, expected, got in failures[:20]:
+        print(f"MISMATCH {line!r}\n  expected {expected}\n  got      {got}")
+
+    def run_reference():
+        for line in lines:
+            reference_parse_ingredient(line)
+
+    def run_cold():
+        recipe_parser._parse_ingredient_cached.cache_clear()
+        for line in lines:
+            recipe_parser.parse_ingredient(line)
+
+    def run_warm():
+        for line in lines:
+            recipe_parser.parse_ingredient(line)
+
+    def run_batch():
+        recipe_parser.parse_ingredients(lines)
+
+    reference = _best_of(args.rounds, run_reference)
+    cold = _best_of(args.rounds, run_cold)
+    run_warm()
+    warm = _best_of(args.rounds, run_warm)
+    batch = _best_of(args.rounds, run_batch)
+
+    n = len(lines)
+    print(f"corpus: {n} synthetic lines, {n - len(failures)}/{n} match the reference output")
+    for label, elapsed in (
+        ("reference", reference),
+        ("compiled (cold)", cold),
+        ("compiled (memo)", warm),
+        ("parse_ingredients", batch),
+    ):
+        print(
+            f"{label:<18} {elapsed * 1000:8.2f} ms  "
+            f"{elapsed / n * 1e6:6.2f} µs/line  x{reference / elapsed:5.1f}"
+        )
+
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
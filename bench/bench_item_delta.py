@@ -0,0 +1,110 @@
+"""
+Item update broadcast payloads: full ItemOut vs field-level delta.
+
+Measures encoded bytes per event and the time to build + serialise the
+broadcast envelope for a typical check-off and a rename, the way
+items_router.update_item does it.
+
+Usage (from the project root):
+    python bench/bench_item_delta.py [--iterations 20000]
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+import uuid
+from datetime import datetime, timedelta
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, "backend"))
+os.environ.setdefault("SECRET_KEY", "bench-" + "x" * 58)
+os.environ.setdefault("DATABASE_URL", "sqlite://")
+
+from routers.items_router import _item_delta  # noqa: E402
+from schemas import ItemOut  # noqa: E402
+
+
+def _sample_item(**overrides) -> ItemOut:
+    now = datetime(2026, 10, 18, 12, 0, 0, 123456)
+    fields = dict(
+        id=str(uuid.uuid4()),
+        list_id=str(uuid.uuid4()),
+        name="Semi-skimmed milk",
+        quantity=2.0,
+        unit="l",
+        category_id=str(uuid.uuid4()),
+        category_name="Dairy",
+        category_color="#3b82f6",
+        category_icon="milk",
+        checked=False,
+        checked_by=None,
+        checked_at=None,
+        added_by=str(uuid.uuid4()),
+        added_by_name="Alice",
+        notes="The blue one",
+        sort_order=7,
+        created_at=now - timedelta(days=2),
+        updated_at=now,
+    )
+    fields.update(overrides)
+    return ItemOut(**fields)
+
+
+def _envelope(list_id: str, msg_type: str, data: dict) -> dict:
+    return {
+        "type": msg_type,
+        "list_id": list_id,
+        "data": data,
+        "user_id": str(uuid.uuid4()),
+        "username": "Bob",
+    }
+
+
+def _measure(label, iterations, build):
+    payload = json.dumps(build(), default=str)
+    start = time.perf_counter()
+    for _ in range(iterations):
+        json.dumps(build(), default=str)
+    elapsed = time.perf_counter() - start
+    print(f"{label:<22} {len(payload.encode()):5d} bytes  {elapsed / iterations * 1e6:7.2f} µs/event")
+    return len(payload.encode())
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--iterations", type=int, default=20000)
+    args = parser.parse_args()
+
+    before = _sample_item()
+    before_json = before.model_dump(mode="json")
+    later = before.updated_at + timedelta(seconds=5)
+    scenarios = {
+        "check-off": _sample_item(
+            id=before.id, list_id=before.list_id, category_id=before.category_id,
+            added_by=before.added_by, created_at=before.created_at,
+            checked=True, checked_by=str(uuid.uuid4()), checked_at=later, updated_at=later,
+        ),
+        "rename": _sample_item(
+            id=before.id, list_id=before.list_id, category_id=before.category_id,
+            added_by=before.added_by, created_at=before.created_at,
+            name="Whole milk", updated_at=later,
+        ),
+    }
+
+    for name, after in scenarios.items():
+        print(f"── {name}")
+        full = _measure(
+            "full ItemOut", args.iterations,
+            lambda: _envelope(after.list_id, "item_updated", after.model_dump(mode="json")),
+        )
+        delta = _measure(
+            "delta", args.iterations,
+            lambda: _envelope(after.list_id, "item_updated", _item_delta(before_json, after)),
+        )
+        print(f"{'saved':<22} {full - delta:5d} bytes  ({(1 - delta / full) * 100:.0f}%)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,74 @@
+"""
+bcrypt throughput per core, and what startup calibration would pick here.
+
+For each cost in --rounds, hashes for --seconds on one process and then on
+every worker process at once, and reports hashes/sec in total and per core.
+The per-core figure is what sizes PASSWORD_HASH_WORKERS: logins per second
+the box can absorb ≈ workers × per-core rate at the chosen cost.
+
+Usage (from the project root):
+    python bench/bench_password_hash.py [--rounds 10 11 12] [--workers N] [--target-ms 250]
+"""
+
+import argparse
+import multiprocessing
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, "backend"))
+os.environ.setdefault("SECRET_KEY", "bench-" + "x" * 58)
+os.environ.setdefault("DATABASE_URL", "sqlite://")
+
+from hashing import _calibrate_in_worker, _context  # noqa: E402
+
+
+def _hash_for(rounds: int, seconds: float) -> int:
+    """Hash repeatedly for about `seconds`; returns how many hashes were made."""
+    handler = _context(rounds).handler("bcrypt")
+    done, deadline = 0, time.perf_counter() + seconds
+    while time.perf_counter() < deadline:
+        handler.hash("correct horse battery staple")
+        done += 1
+    return done
+
+
+def _rate(executor, processes: int, rounds: int, seconds: float) -> float:
+    start = time.perf_counter()
+    futures = [executor.submit(_hash_for, rounds, seconds) for _ in range(processes)]
+    total = sum(f.result() for f in futures)
+    return total / (time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--rounds", type=int, nargs="+", default=[10, 11, 12])
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--seconds", type=float, default=3.0)
+    parser.add_argument("--target-ms", type=int, default=250)
+    args = parser.parse_args()
+
+    context = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(args.workers, mp_context=context) as executor:
+        # Spawn every worker before timing anything
+        list(executor.map(_hash_for, [4] * args.workers, [0.1] * args.workers))
+
+        print(f"{os.cpu_count()} CPUs, {args.workers} worker processes, {args.seconds:g}s per run")
+        print(f"{'cost':>4}  {'ms/hash':>8}  {'1 proc h/s':>10}  {f'{args.workers} proc h/s':>12}  {'h/s/core':>8}")
+        for rounds in args.rounds:
+            single = _rate(executor, 1, rounds, args.seconds)
+            parallel = _rate(executor, args.workers, rounds, args.seconds)
+            cores = min(args.workers, os.cpu_count() or 1)
+            print(
+                f"{rounds:>4}  {1000 / single:8.1f}  {single:10.2f}  "
+                f"{parallel:12.2f}  {parallel / cores:8.2f}"
+            )
+
+        calibrated = executor.submit(_calibrate_in_worker, args.target_ms / 1000).result()
+    print(f"calibrated cost for a {args.target_ms} ms target: {calibrated}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,108 @@
+"""
+Rate limiter memory and speed with many distinct keys.
+
+Feeds N distinct client keys (default 1,000,000) through the limiter the
+way the login endpoint does (check, then record a failed attempt) and
+reports traced memory held afterwards plus time per call for:
+
+- the previous sliding-window limiter (a timestamp list per key, never freed)
+- the GCRA limiter holding every key (max_keys above N)
+- the GCRA limiter with the default RATE_LIMIT_MAX_KEYS bound
+
+Usage (from the project root):
+    python bench/bench_rate_limiter.py [--keys 1000000] [--sqlite]
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+from collections import defaultdict
+from threading import Lock
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, "backend"))
+os.environ.setdefault("SECRET_KEY", "bench-" + "x" * 58)
+os.environ.setdefault("DATABASE_URL", "sqlite://")
+
+from config import settings  # noqa: E402
+from rate_limit import MemoryRateLimitStore, RateLimiter, SQLiteRateLimitStore  # noqa: E402
+
+
+class SlidingWindowLimiter:
+    """The limiter this replaced, kept as the baseline."""
+
+    def __init__(self, window: int, max_attempts: int):
+        self._window = window
+        self._max_attempts = max_attempts
+        self._attempts: dict[str, list[float]] = defaultdict(list)
+        self._lock = Lock()
+
+    def _prune(self, key: str, now: float) -> list[float]:
+        self._attempts[key] = [t for t in self._attempts[key] if now - t < self._window]
+        return self._attempts[key]
+
+    def is_rate_limited(self, key: str) -> bool:
+        with self._lock:
+            return len(self._prune(key, time.time())) >= self._max_attempts
+
+    def record_attempt(self, key: str):
+        with self._lock:
+            self._attempts[key].append(time.time())
+
+
+def _key(i: int) -> str:
+    # IPv4-shaped, like request.client.host
+    return f"10.{i >> 16 & 255}.{i >> 8 & 255}.{i & 255}"
+
+
+def _run(label: str, limiter, n: int, traced: bool = True):
+    # Keys are built per call, as each request brings its own string, so a
+    # store is charged for whatever key strings it keeps alive.
+    if traced:
+        tracemalloc.start()
+    start = time.perf_counter()
+    for i in range(n):
+        key = _key(i)
+        limiter.is_rate_limited(key)
+        limiter.record_attempt(key)
+    elapsed = time.perf_counter() - start
+    held = tracemalloc.get_traced_memory()[0] if traced else 0
+    tracemalloc.stop()
+    per_call = elapsed / (2 * n) * 1e6
+    memory = f"{held / 2**20:8.1f} MiB" if traced else "    (disk)"
+    print(f"{label:<28} {memory}  {per_call:6.2f} µs/call")
+    return held
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--keys", type=int, default=1_000_000)
+    parser.add_argument("--sqlite", action="store_true", help="also time the shared SQLite store")
+    args = parser.parse_args()
+
+    window, max_attempts = settings.LOGIN_RATE_LIMIT_WINDOW, settings.LOGIN_RATE_LIMIT_MAX
+
+    print(f"{args.keys:,} distinct keys, {max_attempts} per {window}s")
+    baseline = _run("sliding window (old)", SlidingWindowLimiter(window, max_attempts), args.keys)
+    unbounded = _run(
+        "GCRA, all keys kept",
+        RateLimiter(window, max_attempts, MemoryRateLimitStore(max_keys=args.keys + 1)),
+        args.keys,
+    )
+    bounded_store = MemoryRateLimitStore(max_keys=settings.RATE_LIMIT_MAX_KEYS)
+    _run(f"GCRA, max_keys={settings.RATE_LIMIT_MAX_KEYS:,}", RateLimiter(window, max_attempts, bounded_store), args.keys)
+    print(f"{'bytes/key (old → GCRA)':<28} {baseline / args.keys:6.0f} → {unbounded / args.keys:.0f}")
+    print(f"{'evicted (bounded)':<28} {bounded_store.counters}")
+
+    if args.sqlite:
+        with tempfile.TemporaryDirectory() as tmp:
+            store = SQLiteRateLimitStore(os.path.join(tmp, "ratelimit.db"))
+            sample = min(args.keys, 50_000)
+            _run(f"GCRA, sqlite ({sample:,} keys)", RateLimiter(window, max_attempts, store), sample, traced=False)
+
+
+if __name__ == "__main__":
+    main()
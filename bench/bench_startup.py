@@ -0,0 +1,101 @@
+"""
+Cold-start cost: importing the app, then preparing the database.
+
+Imports ``main`` in a fresh interpreter under ``python -X importtime`` (the
+best of --runs) and reports the total plus the slowest modules by
+cumulative time. Then times ``prepare_database()`` against a new SQLite
+file (full create + seed) and again against the same file (fingerprint
+matches, so the work is skipped).
+
+Modules in LAZY_MODULES must only load when first used; the run exits with
+status 1 if ``import main`` pulls any of them in, so this can gate CI.
+
+Usage (from the project root):
+    python bench/bench_startup.py [--runs 5] [--top 15]
+"""
+
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BACKEND = os.path.join(ROOT, "backend")
+
+# Only needed by recipe import (see recipe_parser.fetch_recipe)
+LAZY_MODULES = ("httpx", "bs4")
+
+_PREPARE = """
+import time
+from bootstrap import prepare_database
+t = time.perf_counter()
+ran = prepare_database()
+print(ran, time.perf_counter() - t)
+"""
+
+
+def _env(database_url: str) -> dict:
+    env = dict(os.environ)
+    env.setdefault("SECRET_KEY", "bench-" + "x" * 58)
+    env["DATABASE_URL"] = database_url
+    return env
+
+
+def _import_times(env: dict) -> dict[str, tuple[int, int]]:
+    """module -> (self µs, cumulative µs) for one `import main`."""
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import main"],
+        cwd=BACKEND, env=env, capture_output=True, text=True, check=True,
+    )
+    times = {}
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        if not self_us.strip().isdigit():
+            continue  # the header line
+        times[name.strip()] = (int(self_us), int(cumulative_us))
+    return times
+
+
+def _prepare(env: dict) -> tuple[str, float]:
+    proc = subprocess.run(
+        [sys.executable, "-c", _PREPARE],
+        cwd=BACKEND, env=env, capture_output=True, text=True, check=True,
+    )
+    ran, seconds = proc.stdout.split()
+    return ran, float(seconds)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--top", type=int, default=15)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        env = _env(f"sqlite:///{os.path.join(tmp, 'startup.db')}")
+
+        runs = [_import_times(env) for _ in range(args.runs)]
+        best = min(runs, key=lambda t: t["main"][1])
+        print(f"import main: best {best['main'][1] / 1000:.1f} ms of {args.runs} runs")
+        print(f"{'cumulative ms':>13}  {'self ms':>7}  module")
+        slowest = sorted(best.items(), key=lambda kv: kv[1][1], reverse=True)[: args.top]
+        for name, (self_us, cumulative_us) in slowest:
+            print(f"{cumulative_us / 1000:13.1f}  {self_us / 1000:7.1f}  {name}")
+
+        cold = _prepare(env)
+        warm = _prepare(env)
+        print(f"prepare_database, new database:   {cold[1] * 1000:7.1f} ms (ran={cold[0]})")
+        print(f"prepare_database, same database:  {warm[1] * 1000:7.1f} ms (ran={warm[0]})")
+
+    eager = [m for m in LAZY_MODULES if m in best]
+    if eager:
+        print(f"FAIL: import main loads {', '.join(eager)}; these must be imported lazily")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,153 @@
+"""
+WebSocket framing: JSON vs MessagePack, with and without permessage-deflate.
+
+Uses a bulk "recipe_import_finished" event carrying 200 items — the largest
+frame the app sends. It reports encoded and deflated bytes per format, the
+cost of each encoder, and the CPU spent fanning one event out to a mix of
+JSON and MessagePack subscribers. Encoding once per socket is compared with
+ConnectionManager._deliver, which encodes once per format.
+
+Usage (from the project root):
+    python bench/bench_ws_framing.py [--items 200] [--subscribers 50] [--iterations 200]
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+import uuid
+import zlib
+from datetime import datetime, timedelta
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, "backend"))
+os.environ.setdefault("SECRET_KEY", "bench-" + "x" * 58)
+os.environ.setdefault("DATABASE_URL", "sqlite://")
+
+import ws_codec  # noqa: E402
+from schemas import ItemOut  # noqa: E402
+from websocket_manager import ConnectionManager, _Connection  # noqa: E402
+
+
+class _NullSocket:
+    """Stands in for a WebSocket; frames are read off the queue, never sent."""
+
+
+def _bulk_event(count: int) -> dict:
+    now = datetime(2026, 10, 18, 12, 0, 0, 123456)
+    list_id, user_id = str(uuid.uuid4()), str(uuid.uuid4())
+    names = ["Plain flour", "Caster sugar", "Unsalted butter", "Free-range eggs", "Whole milk"]
+    items = [
+        ItemOut(
+            id=str(uuid.uuid4()),
+            list_id=list_id,
+            name=f"{names[i % len(names)]} {i}",
+            quantity=float(i % 7 + 1),
+            unit=["g", "ml", "tbsp", ""][i % 4],
+            category_id=str(uuid.uuid4()),
+            category_name="Baking",
+            category_color="#f59e0b",
+            category_icon="wheat",
+            checked=False,
+            checked_by=None,
+            checked_at=None,
+            added_by=user_id,
+            added_by_name="Alice",
+            notes="From: Victoria sponge",
+            sort_order=i,
+            created_at=now,
+            updated_at=now + timedelta(microseconds=i),
+        ).model_dump(mode="json")
+        for i in range(count)
+    ]
+    return {
+        "type": "recipe_import_finished",
+        "list_id": list_id,
+        "data": {"job_id": "bench", "status": "completed", "error": None,
+                 "added_count": count, "items": items},
+        "user_id": user_id,
+        "username": "Alice",
+    }
+
+
+def _deflate(frame) -> int:
+    # websockets' server defaults: 12-bit window, memLevel 5
+    data = frame.encode() if isinstance(frame, str) else frame
+    compressor = zlib.compressobj(wbits=-12, memLevel=5)
+    return len(compressor.compress(data) + compressor.flush(zlib.Z_SYNC_FLUSH)) - 4
+
+
+def _time(iterations, fn) -> float:
+    start = time.process_time()
+    for _ in range(iterations):
+        fn()
+    return (time.process_time() - start) / iterations * 1e3
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--items", type=int, default=200)
+    parser.add_argument("--subscribers", type=int, default=50)
+    parser.add_argument("--iterations", type=int, default=200)
+    args = parser.parse_args()
+    if ws_codec.msgpack is None:
+        sys.exit("msgpack is not installed; pip install -r backend/requirements.txt")
+
+    message = _bulk_event(args.items)
+    stdlib_frame = json.dumps(message, default=str)
+    frame = ws_codec.encode_json(message)
+    packed = ws_codec.json_to_msgpack(frame)
+
+    print(f"── bytes ({args.items}-item event)")
+    print(f"{'format':<18} {'raw':>9} {'deflated':>9}")
+    for label, data in (("json", frame), ("msgpack", packed)):
+        raw = len(data.encode()) if isinstance(data, str) else len(data)
+        print(f"{label:<18} {raw:9d} {_deflate(data):9d}")
+
+    n = args.iterations
+    print("── CPU per encode")
+    encoders = {
+        "json (stdlib)": lambda: json.dumps(message, default=str),
+        "json (ws_codec)": lambda: ws_codec.encode_json(message),
+        "msgpack from json": lambda: ws_codec.json_to_msgpack(frame),
+        "deflate json": lambda: _deflate(stdlib_frame),
+        "deflate msgpack": lambda: _deflate(packed),
+    }
+    for label, fn in encoders.items():
+        print(f"{label:<18} {_time(n, fn):8.3f} ms")
+
+    # Half the subscribers ask for MessagePack
+    manager = ConnectionManager(queue_size=n + 10)
+    list_id = message["list_id"]
+    conns = []
+    for i in range(args.subscribers):
+        encoding = ws_codec.MSGPACK if i % 2 else ws_codec.JSON
+        conn = _Connection(_NullSocket(), n + 10, encoding)
+        manager.subscriptions[list_id].add(conn)
+        conns.append(conn)
+
+    def per_socket():
+        for conn in conns:
+            if conn.encoding == ws_codec.MSGPACK:
+                data = ws_codec.msgpack.packb(message, use_bin_type=True)
+            else:
+                data = json.dumps(message, default=str)
+            conn.queue.put_nowait(data)
+
+    def once_per_format():
+        manager._deliver(list_id, ws_codec.encode_json(message))
+
+    print(f"── CPU per broadcast to {args.subscribers} subscribers (half msgpack)")
+    results = {}
+    for label, fn in (("encode per socket", per_socket), ("once per format", once_per_format)):
+        results[label] = _time(n, fn)
+        for conn in conns:
+            while not conn.queue.empty():
+                conn.queue.get_nowait()
+        print(f"{label:<18} {results[label]:8.3f} ms")
+    print(f"{'speedup':<18} {results['encode per socket'] / results['once per format']:8.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,309 @@
+"""
+Query-plan regression check for the list and item endpoints, at scale.
+
+Seeds a SQLite database with thousands of users, lists and items (plus
+category memory), then calls every endpoint in lists_router and
+items_router through the real app. For each request it records the SQL
+statements executed and runs EXPLAIN QUERY PLAN on every SELECT, UPDATE and
+DELETE with its actual parameters.
+
+The result is compared with bench/data/query_plans.json. The run fails
+(exit status 1) when an endpoint executes more statements than its
+baseline or a plan now scans a table it didn't scan before. Fewer
+statements or fewer scans are reported as improvements; re-record the
+baseline with --update when a change is intended.
+
+The acting user's own data is the same at every --users, so statement
+counts don't depend on the scale; only the plans and timings do.
+
+Not covered: recipe import (needs the network) and the SSE stream.
+
+Usage (from the project root):
+    python bench/check_query_plans.py [--users 5000] [--update] [--verbose]
+"""
+
+import argparse
+import json
+import os
+import random
+import re
+import shutil
+import sqlite3
+import sys
+import tempfile
+import time
+import uuid
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BASELINE = os.path.join(ROOT, "bench", "data", "query_plans.json")
+TMP = tempfile.mkdtemp(prefix="kc-plans-")
+DB_PATH = os.path.join(TMP, "plans.db")
+
+sys.path.insert(0, os.path.join(ROOT, "backend"))
+os.environ.setdefault("SECRET_KEY", "bench-" + "x" * 58)
+os.environ["DATABASE_URL"] = f"sqlite:///{DB_PATH}"
+# Measure queries, not the limits in front of them
+os.environ["API_READ_RATE_LIMIT"] = "0"
+os.environ["API_WRITE_RATE_LIMIT"] = "0"
+os.environ["PASSWORD_HASH_WORKERS"] = "0"
+os.environ["PASSWORD_HASH_ROUNDS"] = "10"
+os.chdir(TMP)  # main creates ./data
+
+from fastapi.testclient import TestClient  # noqa: E402
+from sqlalchemy import event, insert, select  # noqa: E402
+
+from auth import create_access_token  # noqa: E402
+from bootstrap import prepare_database  # noqa: E402
+from database import Base, engine  # noqa: E402
+from main import app  # noqa: E402
+from models import (  # noqa: E402
+    Category,
+    ItemCategoryMemory,
+    ListItem,
+    ListMember,
+    ShoppingList,
+    User,
+)
+
+ACTOR_OWNED_LISTS = 5
+ACTOR_SHARED_LISTS = 5
+ACTOR_ITEMS_PER_LIST = 50
+
+# (name, method, path, json body, context key to store the response id under)
+SCENARIOS = [
+    ("get lists", "GET", "/api/lists", None, None),
+    ("get lists incl. archived", "GET", "/api/lists?include_archived=true", None, None),
+    ("create list", "POST", "/api/lists", {"name": "Weekend"}, "new_list"),
+    ("get list", "GET", "/api/lists/{list}", None, None),
+    ("update list", "PUT", "/api/lists/{list}", {"name": "Big shop"}, None),
+    ("share list", "POST", "/api/lists/{list}/share", {"username": "user20"}, None),
+    ("share list (change role)", "POST", "/api/lists/{list}/share",
+     {"username": "user20", "role": "viewer"}, None),
+    ("unshare list", "DELETE", "/api/lists/{list}/share/{guest}", None, None),
+    ("get items", "GET", "/api/lists/{list}/items", None, None),
+    ("create item (remembered category)", "POST", "/api/lists/{list}/items",
+     {"name": "remembered item 7"}, "new_item"),
+    ("create item (explicit category)", "POST", "/api/lists/{list}/items",
+     {"name": "brand new thing", "category_id": "{category}"}, None),
+    ("get item", "GET", "/api/lists/{list}/items/{new_item}", None, None),
+    ("update item", "PUT", "/api/lists/{list}/items/{new_item}", {"quantity": 3}, None),
+    ("check item", "PUT", "/api/lists/{list}/items/{new_item}", {"checked": True}, None),
+    ("reorder items", "POST", "/api/lists/{list}/items/reorder", {"item_ids": "{item_ids}"}, None),
+    ("delete item", "DELETE", "/api/lists/{list}/items/{item}", None, None),
+    ("clear checked items", "POST", "/api/lists/{list}/items/clear-checked", None, None),
+    ("suggestions", "GET", "/api/suggestions?q=item", None, None),
+    ("favourites", "GET", "/api/favourites", None, None),
+    ("delete list", "DELETE", "/api/lists/{new_list}", None, None),
+]
+
+_SCAN = re.compile(r"^SCAN (\w+)")
+_EXPLAINED = ("SELECT", "UPDATE", "DELETE", "WITH")
+
+
+def _ids(n: int) -> list[str]:
+    return [str(uuid.uuid4()) for _ in range(n)]
+
+
+def _seed(users: int) -> dict:
+    """Fill the database; returns the ids the scenarios refer to."""
+    rng = random.Random(44)
+    user_ids = _ids(users)
+    with engine.connect() as conn:
+        categories = list(conn.execute(select(Category.id)).scalars())
+
+    user_rows = [
+        {"id": u, "username": f"user{i}", "email": f"user{i}@example.com", "password_hash": "x"}
+        for i, u in enumerate(user_ids)
+    ]
+    lists, members, items = [], [], []
+
+    def add_list(owner, n_items, shared_with):
+        list_id = str(uuid.uuid4())
+        lists.append({"id": list_id, "name": "List", "owner_id": owner})
+        for user_id in shared_with:
+            members.append({"id": str(uuid.uuid4()), "list_id": list_id, "user_id": user_id, "role": "editor"})
+        for n in range(n_items):
+            checked = rng.random() < 0.3
+            items.append({
+                "id": str(uuid.uuid4()),
+                "list_id": list_id,
+                "name": f"item {n}",
+                "category_id": rng.choice(categories),
+                "added_by": rng.choice([owner, *shared_with]),
+                "checked": checked,
+                "checked_by": owner if checked else None,
+                "sort_order": n,
+            })
+        return list_id
+
+    actor, others = user_ids[0], user_ids[1:]
+    actor_lists = [
+        add_list(actor, ACTOR_ITEMS_PER_LIST, [others[i], others[i + 1]])
+        for i in range(ACTOR_OWNED_LISTS)
+    ]
+    for i in range(ACTOR_SHARED_LISTS):
+        add_list(others[-1 - i], 20, [actor, others[i]])
+    for owner in others:
+        for _ in range(2):
+            add_list(owner, 20, rng.sample(others, 3))
+
+    memory = [
+        {
+            "id": str(uuid.uuid4()),
+            "item_name_lower": f"remembered item {n}",
+            "category_id": rng.choice(categories),
+            "usage_count": rng.randint(1, 50),
+        }
+        for n in range(2000)
+    ]
+
+    with engine.begin() as conn:
+        conn.execute(insert(User), user_rows)
+        conn.execute(insert(ShoppingList), lists)
+        conn.execute(insert(ListMember), members)
+        conn.execute(insert(ListItem), items)
+        conn.execute(insert(ItemCategoryMemory), memory)
+
+    main_list = actor_lists[0]
+    main_items = [i["id"] for i in items if i["list_id"] == main_list]
+    return {
+        "actor": actor,
+        "list": main_list,
+        "item": main_items[-1],
+        "item_ids": main_items[:20],
+        # Not a member of the main list, so sharing creates a membership
+        "guest": user_ids[20],
+        "category": categories[0],
+        "counts": {"users": len(user_rows), "lists": len(lists), "items": len(items)},
+    }
+
+
+def _fill(value, context):
+    """Substitute {name} placeholders in a path or JSON body."""
+    if isinstance(value, str):
+        match = re.fullmatch(r"\{(\w+)\}", value)
+        if match and not isinstance(context.get(match.group(1)), str):
+            return context[match.group(1)]
+        return value.format(**{k: v for k, v in context.items() if isinstance(v, str)})
+    if isinstance(value, dict):
+        return {k: _fill(v, context) for k, v in value.items()}
+    return value
+
+
+def _plans(statements: list[tuple[str, tuple]]) -> list[dict]:
+    conn = sqlite3.connect(DB_PATH)
+    try:
+        out = []
+        for sql, params in statements:
+            if not sql.lstrip().upper().startswith(_EXPLAINED):
+                continue
+            rows = conn.execute("EXPLAIN QUERY PLAN " + sql, params).fetchall()
+            out.append({"sql": " ".join(sql.split()), "plan": [row[3] for row in rows]})
+        return out
+    finally:
+        conn.close()
+
+
+def _scans(plans: list[dict]) -> list[str]:
+    tables = set(Base.metadata.tables)
+    found = set()
+    for entry in plans:
+        for detail in entry["plan"]:
+            match = _SCAN.match(detail)
+            if match and match.group(1) in tables:
+                found.add(match.group(1))
+    return sorted(found)
+
+
+def run(users: int, verbose: bool) -> dict:
+    prepare_database()
+    context = _seed(users)
+    counts = context.pop("counts")
+    print(f"{counts['users']:,} users, {counts['lists']:,} lists, {counts['items']:,} items")
+
+    captured: list[tuple[str, tuple]] = []
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def capture(conn, cursor, statement, parameters, exec_context, executemany):
+        captured.append((statement, parameters if not executemany else parameters[0]))
+
+    token = create_access_token({"sub": context["actor"]})
+    headers = {"Authorization": f"Bearer {token}"}
+    results = {}
+    with TestClient(app) as client:
+        for name, method, path, body, save_as in SCENARIOS:
+            captured.clear()
+            start = time.perf_counter()
+            response = client.request(
+                method, _fill(path, context), json=_fill(body, context), headers=headers
+            )
+            elapsed = time.perf_counter() - start
+            if response.status_code >= 400:
+                raise SystemExit(f"{name}: {method} {path} returned {response.status_code} {response.text}")
+            if save_as:
+                context[save_as] = response.json()["id"]
+
+            plans = _plans(captured)
+            results[name] = {"statements": len(captured), "scans": _scans(plans)}
+            print(f"{name:<36} {len(captured):4d} statements  {elapsed * 1000:7.1f} ms"
+                  f"  scans: {', '.join(results[name]['scans']) or '-'}")
+            if verbose:
+                for entry in plans:
+                    print(f"    {entry['sql'][:110]}")
+                    for detail in entry["plan"]:
+                        print(f"      {detail}")
+    event.remove(engine, "before_cursor_execute", capture)
+    return results
+
+
+def compare(results: dict, baseline: dict) -> list[str]:
+    failures = []
+    for name, now in results.items():
+        before = baseline.get(name)
+        if before is None:
+            print(f"new endpoint scenario (not in baseline): {name}")
+            continue
+        if now["statements"] > before["statements"]:
+            failures.append(f"{name}: {before['statements']} → {now['statements']} statements")
+        elif now["statements"] < before["statements"]:
+            print(f"improved: {name}: {before['statements']} → {now['statements']} statements")
+        new_scans = set(now["scans"]) - set(before["scans"])
+        if new_scans:
+            failures.append(f"{name}: now scans {', '.join(sorted(new_scans))}")
+        fixed = set(before["scans"]) - set(now["scans"])
+        if fixed:
+            print(f"improved: {name}: no longer scans {', '.join(sorted(fixed))}")
+    return failures
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--users", type=int, default=5000)
+    parser.add_argument("--update", action="store_true", help="record the results as the new baseline")
+    parser.add_argument("--verbose", action="store_true", help="print every statement and its plan")
+    args = parser.parse_args()
+
+    try:
+        results = run(args.users, args.verbose)
+    finally:
+        shutil.rmtree(TMP, ignore_errors=True)
+
+    if args.update or not os.path.exists(BASELINE):
+        with open(BASELINE, "w") as f:
+            json.dump(results, f, indent=2, sort_keys=True)
+            f.write("\n")
+        print(f"baseline written to {os.path.relpath(BASELINE, ROOT)}")
+        return
+
+    with open(BASELINE) as f:
+        failures = compare(results, json.load(f))
+    if failures:
+        print("FAIL:")
+        for failure in failures:
+            print(f"  {failure}")
+        sys.exit(1)
+    print("OK: no new scans, no extra statements")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,97 @@
+"""
+Replay correctness check for the WebSocket ring buffers.
+
+Drives ConnectionManager directly (no sockets) through reconnect scenarios
+and checks what a client resuming from a given sequence number receives:
+either exactly the frames it missed, or a resync when they can't all be
+replayed. A replay that returns "caught up" while frames are missing is
+the failure this guards against, since the client would never refetch.
+
+Usage (from the project root):
+    python bench/check_replay.py
+"""
+
+import argparse
+import os
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, "backend"))
+os.environ.setdefault("SECRET_KEY", "bench-" + "x" * 58)
+os.environ.setdefault("DATABASE_URL", "sqlite://")
+
+from websocket_manager import ConnectionManager, _Connection, frame_seq  # noqa: E402
+
+
+def _manager(**kwargs) -> ConnectionManager:
+    return ConnectionManager(queue_size=1000, **kwargs)
+
+
+def _send(manager: ConnectionManager, list_ids: str) -> dict[str, list[int]]:
+    """Deliver one event to each list named in list_ids; returns list -> sequence numbers."""
+    sent: dict[str, list[int]] = {}
+    for list_id in list_ids:
+        manager._deliver(list_id, '{"type": "item_added"}')
+        sent.setdefault(list_id, []).append(manager.seq)
+    return sent
+
+
+def _resume(manager: ConnectionManager, list_id: str, last_seq: int, epoch: str = None):
+    """(caught up?, replayed sequence numbers) for a client resuming from last_seq."""
+    conn = _Connection(None, 1000)
+    filled = manager.replay_to(conn, list_id, last_seq, epoch or manager.epoch)
+    replayed = []
+    while not conn.queue.empty():
+        replayed.append(frame_seq(conn.queue.get_nowait()))
+    return filled, replayed
+
+
+def _check(name: str, manager: ConnectionManager, list_id: str, last_seq: int, missed: list[int],
+           epoch: str = None) -> str | None:
+    """None if resuming gives exactly the missed frames or a resync, else what went wrong."""
+    filled, replayed = _resume(manager, list_id, last_seq, epoch)
+    if filled and replayed != missed:
+        return f"{name}: caught up with {replayed}, but missed {missed}"
+    print(f"  {name:<44}{'replayed ' + str(replayed) if filled else 'resync'}")
+    return None
+
+
+def scenarios():
+    """Yield (name, manager, list_id, last_seq, missed, epoch)."""
+    m = _manager()
+    sent = _send(m, "LLML")
+    yield "gap inside the buffer", m, "L", sent["L"][0], sent["L"][1:], None
+    yield "nothing missed", m, "L", sent["L"][-1], [], None
+    yield "other epoch", m, "L", 0, sent["L"], "stale"
+
+    m = _manager(replay_size=2)
+    sent = _send(m, "LLLL")
+    yield "gap older than the buffer", m, "L", sent["L"][0], sent["L"][1:], None
+
+    m = _manager(replay_max_lists=1)
+    sent = _send(m, "LM")
+    yield "buffer evicted", m, "L", 0, sent["L"], None
+
+    m = _manager(replay_max_lists=1)
+    sent = _send(m, "LML")
+    yield "buffer evicted, then recreated", m, "L", 0, sent["L"], None
+    yield "resumed after the recreation", m, "L", sent["L"][-1], [], None
+
+    m = _manager()
+    sent = _send(m, "M")
+    yield "quiet list, others busy", m, "L", 0, [], None
+
+
+def main():
+    argparse.ArgumentParser(description=__doc__.strip().splitlines()[0]).parse_args()
+    failures = [failure for args in scenarios() if (failure := _check(*args))]
+    if failures:
+        print("\nFAIL:")
+        for failure in failures:
+            print(f"  {failure}")
+        sys.exit(1)
+    print("\nOK: every resume replayed the missed frames or asked for a resync")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,206 @@
+"""
+EXPLAIN QUERY PLAN and timings for migration 1 (the performance index pack).
+
+Builds a SQLite database as it looked before the migration (current models
+minus the pack's indexes, schema_version 0), fills it with synthetic data,
+then for each query the pack is meant to serve prints the plan and mean time
+before and after running the migration.
+
+Finally checks that the migrated database has exactly the indexes a fresh
+database gets from the models, so migrations.py and models.py can't drift
+apart; exits with status 1 if they differ.
+
+Usage (from the project root):
+    python bench/explain_index_pack.py [--users 2000] [--runs 200]
+"""
+
+import argparse
+import os
+import random
+import sqlite3
+import sys
+import tempfile
+import time
+import uuid
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, "backend"))
+os.environ.setdefault("SECRET_KEY", "bench-" + "x" * 58)
+os.environ.setdefault("DATABASE_URL", "sqlite://")
+
+from sqlalchemy import create_engine  # noqa: E402
+
+import migrations  # noqa: E402
+import models  # noqa: E402,F401
+from database import Base  # noqa: E402
+
+PACK_INDEXES = (
+    "ix_list_members_user",
+    "ix_shopping_lists_owner",
+    "ix_list_items_added_by",
+    "ix_list_items_checked_by",
+    "ix_api_keys_key_hash",
+)
+
+# (label, statement, call site); statements mirror what the ORM emits
+QUERIES = [
+    (
+        "lists visible to a user",
+        "SELECT id FROM shopping_lists WHERE owner_id = :user"
+        " UNION SELECT list_id FROM list_members WHERE user_id = :user",
+        "lists_router._get_user_lists",
+    ),
+    (
+        "lists owned by a user",
+        "SELECT * FROM shopping_lists WHERE owner_id = :user",
+        "auth_router.delete_user",
+    ),
+    (
+        "drop a user's memberships",
+        "DELETE FROM list_members WHERE user_id = :user",
+        "auth_router.delete_user",
+    ),
+    (
+        "reassign items added by a user",
+        "UPDATE list_items SET added_by = :admin WHERE added_by = :user",
+        "auth_router.delete_user",
+    ),
+    (
+        "clear items checked by a user",
+        "UPDATE list_items SET checked_by = NULL WHERE checked_by = :user",
+        "auth_router.delete_user",
+    ),
+    (
+        "API key lookup",
+        "SELECT * FROM api_keys WHERE key_hash = :key_hash AND is_active = 1 LIMIT 1",
+        "auth._get_user_from_api_key",
+    ),
+]
+
+
+def _ids(n: int) -> list[str]:
+    return [str(uuid.uuid4()) for _ in range(n)]
+
+
+def _seed(conn: sqlite3.Connection, users: int) -> dict:
+    rng = random.Random(42)
+    user_ids = _ids(users)
+    list_ids = _ids(users * 2)
+    conn.executemany(
+        "INSERT INTO users (id, username, email, password_hash, is_admin, is_active)"
+        " VALUES (?, ?, ?, 'x', 0, 1)",
+        [(u, f"user{i}", f"user{i}@example.com") for i, u in enumerate(user_ids)],
+    )
+    owners = [rng.choice(user_ids) for _ in list_ids]
+    conn.executemany(
+        "INSERT INTO shopping_lists (id, name, owner_id, is_archived) VALUES (?, 'List', ?, 0)",
+        list(zip(list_ids, owners)),
+    )
+    members = set()
+    for list_id, owner in zip(list_ids, owners):
+        members.add((list_id, owner, "owner"))
+        for user_id in rng.sample(user_ids, 3):
+            members.add((list_id, user_id, "editor"))
+    conn.executemany(
+        "INSERT OR IGNORE INTO list_members (id, list_id, user_id, role) VALUES (?, ?, ?, ?)",
+        [(str(uuid.uuid4()), *m) for m in members],
+    )
+    items = []
+    for list_id in list_ids:
+        for n in range(10):
+            checker = rng.choice(user_ids) if rng.random() < 0.3 else None
+            items.append((str(uuid.uuid4()), list_id, f"item {n}", rng.choice(user_ids), checker, n))
+    conn.executemany(
+        "INSERT INTO list_items (id, list_id, name, added_by, checked_by, checked, sort_order)"
+        " VALUES (?, ?, ?, ?, ?, 0, ?)",
+        items,
+    )
+    key_hashes = [uuid.uuid4().hex * 2 for _ in user_ids]
+    conn.executemany(
+        "INSERT INTO api_keys (id, user_id, key_hash, key_prefix, name, is_active)"
+        " VALUES (?, ?, ?, 'kc_x', 'key', 1)",
+        [(str(uuid.uuid4()), u, h) for u, h in zip(user_ids, key_hashes)],
+    )
+    conn.commit()
+    return {"user": user_ids[len(user_ids) // 2], "admin": user_ids[0], "key_hash": key_hashes[-1]}
+
+
+def _plan(conn: sqlite3.Connection, sql: str, params: dict) -> str:
+    rows = conn.execute("EXPLAIN QUERY PLAN " + sql, params).fetchall()
+    return "; ".join(row[3] for row in rows)
+
+
+def _time(conn: sqlite3.Connection, sql: str, params: dict, runs: int) -> float:
+    start = time.perf_counter()
+    for _ in range(runs):
+        conn.execute(sql, params).fetchall()
+        conn.rollback()  # keep UPDATE/DELETE from changing the data between runs
+    return (time.perf_counter() - start) / runs
+
+
+def _measure(conn, params, runs) -> list[tuple[str, float]]:
+    return [(_plan(conn, sql, params), _time(conn, sql, params, runs)) for _, sql, _ in QUERIES]
+
+
+def _indexes(path: str) -> dict[str, tuple]:
+    conn = sqlite3.connect(path)
+    try:
+        rows = conn.execute(
+            "SELECT name, tbl_name FROM sqlite_master WHERE type = 'index' AND sql IS NOT NULL"
+        ).fetchall()
+        return {
+            name: (table, tuple(r[2] for r in conn.execute(f"PRAGMA index_info('{name}')")))
+            for name, table in rows
+        }
+    finally:
+        conn.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--users", type=int, default=2000)
+    parser.add_argument("--runs", type=int, default=200)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        old_path = os.path.join(tmp, "old.db")
+        old = create_engine(f"sqlite:///{old_path}")
+        Base.metadata.create_all(bind=old)
+        with old.begin() as conn:
+            for name in PACK_INDEXES:
+                conn.exec_driver_sql(f"DROP INDEX {name}")
+        migrations.stamp(old, 0)
+
+        conn = sqlite3.connect(old_path)
+        params = _seed(conn, args.users)
+        before = _measure(conn, params, args.runs)
+        conn.close()
+
+        applied = migrations.migrate(old)
+        conn = sqlite3.connect(old_path)
+        after = _measure(conn, params, args.runs)
+        conn.close()
+
+        print(f"{args.users:,} users, {args.users * 2:,} lists, {args.users * 20:,} items;"
+              f" applied migrations {applied}\n")
+        for (label, _, site), (plan_b, time_b), (plan_a, time_a) in zip(QUERIES, before, after):
+            print(f"{label}  ({site})")
+            print(f"  before  {time_b * 1e6:9.1f} µs  {plan_b}")
+            print(f"  after   {time_a * 1e6:9.1f} µs  {plan_a}")
+            print(f"  speedup {time_b / time_a:8.1f}x\n")
+
+        fresh_path = os.path.join(tmp, "fresh.db")
+        Base.metadata.create_all(bind=create_engine(f"sqlite:///{fresh_path}"))
+        migrated, fresh = _indexes(old_path), _indexes(fresh_path)
+
+    if migrated != fresh:
+        print("FAIL: migrated and fresh databases have different indexes")
+        for name in sorted(set(migrated) | set(fresh)):
+            if migrated.get(name) != fresh.get(name):
+                print(f"  {name}: migrated={migrated.get(name)} fresh={fresh.get(name)}")
+        sys.exit(1)
+    print(f"migrated schema matches models ({len(fresh)} indexes)")
+
+
+if __name__ == "__main__":
+    main()
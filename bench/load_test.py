@@ -0,0 +1,428 @@
+"""
+End-to-end load test: households of clients against a real server.
+
+Seeds a temporary SQLite database with --households households of --clients
+users each, every household sharing one list, then starts uvicorn on it
+(--workers processes) and runs every client as an asyncio task:
+
+- log in (retrying when the server is busy), open the multiplexed
+  WebSocket and subscribe to the household list
+- until --duration runs out, pick an action at random (weights in ACTIONS),
+  then wait an exponentially distributed think time averaging --think-ms:
+  load all lists, load the list's items, add an item, check an item,
+  reorder the items, or type a word into the suggestions box (one request
+  per keystroke)
+
+Reported per action: requests, errors (by status), throughput and
+p50/p95/p99 latency. WebSocket delivery lag runs from sending an "add item"
+request to each household socket receiving its item_added event; events
+that never arrive count as missed.
+
+Results are written as JSON (--output, default bench/results/) so runs can
+be compared; --compare OLD.json prints the change against an earlier run.
+The harness shares the machine with the server, so watch its CPU use too
+when pushing hard.
+
+Usage (from the project root):
+    python bench/load_test.py [--households 20] [--clients 4] [--duration 30]
+        [--think-ms 500] [--workers 1] [--hash-rounds 10] [--output PATH]
+        [--compare OLD.json]
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+import uuid
+from collections import Counter, defaultdict
+from datetime import datetime, timezone
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+RESULTS_DIR = os.path.join(ROOT, "bench", "results")
+TMP = tempfile.mkdtemp(prefix="kc-load-")
+DB_PATH = os.path.join(TMP, "load.db")
+SECRET_KEY = "bench-" + "x" * 58
+
+sys.path.insert(0, os.path.join(ROOT, "backend"))
+os.environ["SECRET_KEY"] = SECRET_KEY
+os.environ["DATABASE_URL"] = f"sqlite:///{DB_PATH}"
+
+import httpx  # noqa: E402
+from sqlalchemy import insert, select  # noqa: E402
+from websockets.asyncio.client import connect  # noqa: E402
+from websockets.exceptions import ConnectionClosed  # noqa: E402
+
+from bootstrap import prepare_database  # noqa: E402
+from database import engine  # noqa: E402
+from hashing import _context  # noqa: E402
+from models import Category, ItemCategoryMemory, ListItem, ListMember, ShoppingList, User  # noqa: E402
+
+PASSWORD = "load-test-password"
+LOGIN_ATTEMPTS = 10
+ITEMS_PER_LIST = 30
+GROCERIES = [
+    "milk", "bread", "eggs", "butter", "cheese", "apples", "bananas", "onions",
+    "potatoes", "carrots", "chicken", "rice", "pasta", "tomatoes", "yoghurt",
+    "coffee", "tea", "sugar", "flour", "olive oil", "mince", "lettuce",
+]
+
+# (action, relative weight)
+ACTIONS = [
+    ("get lists", 15),
+    ("get items", 25),
+    ("add item", 20),
+    ("check item", 15),
+    ("reorder items", 5),
+    ("suggestions", 20),
+]
+
+
+def _seed(households: int, clients: int, rounds: int) -> list[dict]:
+    """Create the households; returns one {username, list_id} per client."""
+    prepare_database()
+    password_hash = _context(rounds).hash(PASSWORD)
+    rng = random.Random(48)
+    with engine.connect() as conn:
+        categories = list(conn.execute(select(Category.id)).scalars())
+
+    users, lists, members, items, plan = [], [], [], [], []
+    for h in range(households):
+        list_id = str(uuid.uuid4())
+        user_ids = [str(uuid.uuid4()) for _ in range(clients)]
+        for c, user_id in enumerate(user_ids):
+            username = f"house{h}_member{c}"
+            users.append({
+                "id": user_id, "username": username, "email": f"{username}@example.com",
+                "password_hash": password_hash,
+            })
+            plan.append({"username": username, "list_id": list_id})
+            if c:
+                members.append({"id": str(uuid.uuid4()), "list_id": list_id, "user_id": user_id, "role": "editor"})
+        lists.append({"id": list_id, "name": f"Household {h}", "owner_id": user_ids[0]})
+        for n in range(ITEMS_PER_LIST):
+            items.append({
+                "id": str(uuid.uuid4()), "list_id": list_id, "name": rng.choice(GROCERIES),
+                "category_id": rng.choice(categories), "added_by": rng.choice(user_ids), "sort_order": n,
+            })
+
+    memory = [
+        {"id": str(uuid.uuid4()), "item_name_lower": name, "category_id": rng.choice(categories),
+         "usage_count": rng.randint(1, 50)}
+        for name in GROCERIES
+    ]
+    with engine.begin() as conn:
+        conn.execute(insert(User), users)
+        conn.execute(insert(ShoppingList), lists)
+        if members:
+            conn.execute(insert(ListMember), members)
+        conn.execute(insert(ListItem), items)
+        # The default seed already remembers some of these
+        conn.execute(insert(ItemCategoryMemory).prefix_with("OR IGNORE"), memory)
+    engine.dispose()
+    return plan
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def _start_server(port: int, workers: int, rounds: int) -> subprocess.Popen:
+    env = {
+        **os.environ,
+        "PASSWORD_HASH_ROUNDS": str(rounds),
+        # Every client logs in from 127.0.0.1
+        "LOGIN_RATE_LIMIT_MAX": "1000000",
+    }
+    if workers > 1:
+        env["RATE_LIMIT_BACKEND"] = "sqlite"
+        env["BROADCAST_BACKEND"] = "sqlite"
+    log = open(os.path.join(TMP, "server.log"), "w")
+    return subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--app-dir", os.path.join(ROOT, "backend"),
+         "--host", "127.0.0.1", "--port", str(port), "--workers", str(workers), "--log-level", "warning"],
+        cwd=TMP, env=env, stdout=log, stderr=subprocess.STDOUT,
+    )
+
+
+async def _wait_ready(base_url: str, server: subprocess.Popen, timeout: float = 30.0):
+    deadline = time.monotonic() + timeout
+    async with httpx.AsyncClient(base_url=base_url) as http:
+        while time.monotonic() < deadline:
+            if server.poll() is not None:
+                break
+            try:
+                if (await http.get("/api/")).status_code == 200:
+                    return
+            except httpx.TransportError:
+                pass
+            await asyncio.sleep(0.1)
+    with open(os.path.join(TMP, "server.log")) as f:
+        raise SystemExit(f"server did not start:\n{f.read()[-2000:]}")
+
+
+class Recorder:
+    """Latencies and statuses per action, plus WebSocket delivery lag."""
+
+    def __init__(self):
+        self.latency: dict[str, list[float]] = defaultdict(list)
+        self.statuses: dict[str, Counter] = defaultdict(Counter)
+        self.measuring = False
+        self.sent: dict[str, float] = {}
+        self.expected_deliveries = 0
+        self.lag: list[float] = []
+        self.join_failures: Counter = Counter()
+
+    async def request(self, http: httpx.AsyncClient, action: str, method: str, url: str, **kwargs):
+        start = time.perf_counter()
+        try:
+            response = await http.request(method, url, **kwargs)
+            status = response.status_code
+        except httpx.HTTPError:
+            response, status = None, "transport error"
+        if self.measuring or action == "login":
+            self.latency[action].append(time.perf_counter() - start)
+            self.statuses[action][status] += 1
+        return response if status == 200 or status == 201 else None
+
+    def delivered(self, frame: str):
+        message = json.loads(frame)
+        events = message["events"] if message.get("type") == "batch" else [message]
+        now = time.perf_counter()
+        for event in events:
+            if event.get("type") == "item_added":
+                sent = self.sent.get(event["data"]["name"])
+                if sent is not None:
+                    self.lag.append(now - sent)
+
+
+async def _join(http, base_ws: str, plan: dict, rec: Recorder):
+    """Log in and subscribe to the household list; returns (headers, socket, receiver) or None."""
+    for _ in range(LOGIN_ATTEMPTS):
+        response = await rec.request(http, "login", "POST", "/api/auth/login",
+                                     json={"username": plan["username"], "password": PASSWORD})
+        if response is not None:
+            break
+        # Like a real client, back off and retry when the server is busy (503/429)
+        await asyncio.sleep(random.uniform(0.5, 2.0))
+    else:
+        return None
+    token = response.json()["access_token"]
+    try:
+        ws = await asyncio.wait_for(connect(f"{base_ws}/ws"), 30)
+        await ws.send(json.dumps({"type": "auth", "token": token}))
+        await asyncio.wait_for(ws.recv(), 30)  # auth_ok
+        await ws.send(json.dumps({"type": "subscribe", "list_id": plan["list_id"]}))
+        await asyncio.wait_for(ws.recv(), 30)  # subscribed
+    except Exception as exc:
+        rec.join_failures[type(exc).__name__] += 1
+        return None
+
+    async def receive():
+        try:
+            async for frame in ws:
+                rec.delivered(frame)
+        except ConnectionClosed:
+            pass
+
+    return {"Authorization": f"Bearer {token}"}, ws, asyncio.create_task(receive())
+
+
+async def _client(http, plan: dict, session, think: float, rec: Recorder, stop: asyncio.Event,
+                  household_size: int):
+    headers, ws, receiver = session
+    rng = random.Random()
+    items_url = f"/api/lists/{plan['list_id']}/items"
+    item_ids: list[str] = []
+    added = 0
+    actions, weights = zip(*ACTIONS)
+    while not stop.is_set():
+        action = rng.choices(actions, weights)[0]
+        if action == "get lists":
+            await rec.request(http, action, "GET", "/api/lists", headers=headers)
+        elif action == "get items" or not item_ids:
+            response = await rec.request(http, "get items", "GET", items_url, headers=headers)
+            if response is not None:
+                item_ids = [item["id"] for item in response.json()]
+        elif action == "add item":
+            added += 1
+            name = f"{rng.choice(GROCERIES)} {plan['username']}-{added}"
+            measured = rec.measuring
+            if measured:
+                rec.sent[name] = time.perf_counter()
+            response = await rec.request(http, action, "POST", items_url, headers=headers, json={"name": name})
+            if response is not None:
+                item_ids.append(response.json()["id"])
+                if measured:
+                    rec.expected_deliveries += household_size
+        elif action == "check item":
+            item_id = rng.choice(item_ids)
+            await rec.request(http, action, "PUT", f"{items_url}/{item_id}", headers=headers,
+                              json={"checked": rng.random() < 0.5})
+        elif action == "reorder items":
+            order = rng.sample(item_ids, len(item_ids))
+            await rec.request(http, action, "POST", f"{items_url}/reorder", headers=headers,
+                              json={"item_ids": order})
+        else:
+            word = rng.choice(GROCERIES)
+            for n in range(1, min(len(word), 4) + 1):
+                await rec.request(http, action, "GET", "/api/suggestions", headers=headers,
+                                  params={"q": word[:n]})
+                await asyncio.sleep(rng.uniform(0.05, 0.15))
+        try:
+            await asyncio.wait_for(stop.wait(), rng.expovariate(1 / think) if think else 0)
+        except asyncio.TimeoutError:
+            pass
+
+    # Let events already sent arrive before closing
+    await asyncio.sleep(1.0)
+    receiver.cancel()
+    await ws.close()
+
+
+def _percentiles(values: list[float]) -> dict:
+    if not values:
+        return {"p50_ms": None, "p95_ms": None, "p99_ms": None, "max_ms": None}
+    ordered = sorted(values)
+
+    def pick(q):
+        return round(ordered[min(len(ordered) - 1, int(q * len(ordered)))] * 1000, 2)
+
+    return {"p50_ms": pick(0.50), "p95_ms": pick(0.95), "p99_ms": pick(0.99), "max_ms": round(ordered[-1] * 1000, 2)}
+
+
+async def run(args) -> dict:
+    started_at = datetime.now(timezone.utc).isoformat(timespec="seconds")
+    plan = _seed(args.households, args.clients, args.hash_rounds)
+    port = _free_port()
+    server = _start_server(port, args.workers, args.hash_rounds)
+    base_url = f"http://127.0.0.1:{port}"
+    try:
+        await _wait_ready(base_url, server)
+        rec = Recorder()
+        stop = asyncio.Event()
+        limits = httpx.Limits(max_connections=len(plan), max_keepalive_connections=len(plan))
+        async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=30) as http:
+            sessions = await asyncio.gather(*(_join(http, f"ws://127.0.0.1:{port}", p, rec) for p in plan))
+            joined = [(p, session) for p, session in zip(plan, sessions) if session is not None]
+            print(f"{len(joined)}/{len(plan)} clients logged in and subscribed; running for {args.duration}s")
+            tasks = [
+                asyncio.create_task(_client(http, p, session, args.think_ms / 1000, rec, stop, args.clients))
+                for p, session in joined
+            ]
+            rec.measuring = True
+            started = time.perf_counter()
+            await asyncio.sleep(args.duration)
+            rec.measuring = False
+            elapsed = time.perf_counter() - started
+            stop.set()
+            await asyncio.gather(*tasks)
+    finally:
+        server.terminate()
+        server.wait(timeout=10)
+
+    endpoints = {}
+    for action in ["login", *(a for a, _ in ACTIONS)]:
+        statuses = rec.statuses.get(action, Counter())
+        count = sum(statuses.values())
+        window = elapsed if action != "login" else None
+        endpoints[action] = {
+            "requests": count,
+            "errors": count - statuses[200] - statuses[201],
+            "statuses": {str(k): v for k, v in sorted(statuses.items(), key=str)},
+            "rps": round(count / window, 1) if window else None,
+            **_percentiles(rec.latency.get(action, [])),
+        }
+    measured = {k: v for k, v in endpoints.items() if k != "login"}
+    total = sum(e["requests"] for e in measured.values())
+    return {
+        "started_at": started_at,
+        "config": {
+            "households": args.households, "clients_per_household": args.clients,
+            "duration_s": args.duration, "think_ms": args.think_ms, "workers": args.workers,
+            "hash_rounds": args.hash_rounds, "cpu_count": os.cpu_count(),
+        },
+        "clients_joined": len(joined),
+        "join_failures": dict(rec.join_failures),
+        "requests": total,
+        "errors": sum(e["errors"] for e in measured.values()),
+        "throughput_rps": round(total / elapsed, 1),
+        "latency": _percentiles([v for k, vs in rec.latency.items() if k != "login" for v in vs]),
+        "endpoints": endpoints,
+        "websocket": {
+            "expected": rec.expected_deliveries,
+            "delivered": len(rec.lag),
+            "missed": max(0, rec.expected_deliveries - len(rec.lag)),
+            **_percentiles(rec.lag),
+        },
+    }
+
+
+def _report(results: dict, previous: dict | None):
+    def delta(now, before, key):
+        if not previous or before is None or before.get(key) in (None, 0) or now.get(key) is None:
+            return ""
+        change = (now[key] - before[key]) / before[key] * 100
+        return f" ({change:+.0f}%)"
+
+    before_all = previous or {}
+    print(f"\n{results['clients_joined']} clients joined", end="")
+    print(f" (failed to subscribe: {results['join_failures']})" if results["join_failures"] else "")
+    print(f"{results['requests']:,} requests, {results['errors']:,} errors,"
+          f" {results['throughput_rps']} req/s{delta(results, before_all, 'throughput_rps')}")
+    print(f"{'action':<16}{'requests':>9}{'errors':>8}{'req/s':>8}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}")
+    for action, e in results["endpoints"].items():
+        before = before_all.get("endpoints", {}).get(action)
+        print(f"{action:<16}{e['requests']:>9}{e['errors']:>8}{e['rps'] or '':>8}"
+              f"{e['p50_ms'] or '-':>9}{e['p95_ms'] or '-':>9}{e['p99_ms'] or '-':>9}"
+              f"{delta(e, before, 'p95_ms')}")
+    ws = results["websocket"]
+    print(f"\nWebSocket delivery: {ws['delivered']:,}/{ws['expected']:,} events, {ws['missed']} missed;"
+          f" lag p50 {ws['p50_ms']} ms, p95 {ws['p95_ms']} ms, p99 {ws['p99_ms']} ms"
+          f"{delta(ws, before_all.get('websocket'), 'p95_ms')}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--households", type=int, default=20)
+    parser.add_argument("--clients", type=int, default=4, help="clients per household")
+    parser.add_argument("--duration", type=float, default=30, help="seconds of measured load")
+    parser.add_argument("--think-ms", type=float, default=500, help="mean pause between actions")
+    parser.add_argument("--workers", type=int, default=1, help="uvicorn worker processes")
+    parser.add_argument("--hash-rounds", type=int, default=10, help="bcrypt cost for the seeded users")
+    parser.add_argument("--output", help="results file (default bench/results/load_test-<time>.json)")
+    parser.add_argument("--compare", help="earlier results file to compare with")
+    args = parser.parse_args()
+
+    try:
+        results = asyncio.run(run(args))
+    finally:
+        shutil.rmtree(TMP, ignore_errors=True)
+
+    previous = None
+    if args.compare:
+        with open(args.compare) as f:
+            previous = json.load(f)
+    _report(results, previous)
+
+    output = args.output
+    if not output:
+        os.makedirs(RESULTS_DIR, exist_ok=True)
+        stamp = datetime.now().strftime("%Y%m%d-%H%M%S")
+        output = os.path.join(RESULTS_DIR, f"load_test-{stamp}.json")
+    with open(output, "w") as f:
+        json.dump(results, f, indent=2)
+        f.write("\n")
+    print(f"results written to {os.path.relpath(output, ROOT)}")
+
+
+if __name__ == "__main__":
+    main()
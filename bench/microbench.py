@@ -0,0 +1,253 @@
+"""
+Micro-benchmarks for the hot helpers, checked against a stored baseline.
+
+Times one call of each helper set up in setup(): the best of --repeat
+short timeit runs. The helpers run on an in-memory SQLite database
+holding one list of 50 items shared with three members. Broadcasts go to
+50 fake sockets, 10 of which ask for MessagePack.
+
+Machines differ, so every run also times a fixed pure-Python reference
+workload (before and after the rest) and compares each result relative
+to it. A helper more than --tolerance slower than
+bench/data/microbench.json is measured once more, and fails the run
+(exit status 1) if the second measurement agrees. Re-record the baseline
+with --update (best of three passes) after an intended change.
+
+Usage (from the project root):
+    python bench/microbench.py [--repeat 15] [--tolerance 0.25] [--only NAME] [--update]
+"""
+
+import argparse
+import json
+import os
+import random
+import sys
+import timeit
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BASELINE = os.path.join(ROOT, "bench", "data", "microbench.json")
+CORPUS = os.path.join(ROOT, "bench", "data", "ingredients.jsonl")
+sys.path.insert(0, os.path.join(ROOT, "backend"))
+os.environ.setdefault("SECRET_KEY", "bench-" + "x" * 58)
+os.environ["DATABASE_URL"] = "sqlite://"
+
+import jwt  # noqa: E402
+from sqlalchemy.orm import joinedload  # noqa: E402
+
+import recipe_parser  # noqa: E402
+import ws_codec  # noqa: E402
+from auth import _get_user_from_jwt, create_access_token  # noqa: E402
+from bootstrap import prepare_database  # noqa: E402
+from config import settings  # noqa: E402
+from database import SessionLocal  # noqa: E402
+from models import Category, ListItem, ListMember, ShoppingList, User  # noqa: E402
+from rate_limit import MemoryRateLimitStore, RateLimiter  # noqa: E402
+from routers.items_router import _item_to_out  # noqa: E402
+from routers.lists_router import _list_to_out  # noqa: E402
+from websocket_manager import ConnectionManager, _Connection  # noqa: E402
+
+SUBSCRIBERS = 50
+MSGPACK_SUBSCRIBERS = 10
+# --update keeps each benchmark's best over this many passes
+UPDATE_PASSES = 3
+
+
+class _NullSocket:
+    """Stands in for a WebSocket; frames are read off the queue, never sent."""
+
+
+def _seed(db) -> dict:
+    categories = db.query(Category).all()
+    owner = User(username="owner", email="owner@example.com", password_hash="x", display_name="Owner")
+    members = [User(username=f"member{i}", email=f"member{i}@example.com", password_hash="x") for i in range(3)]
+    db.add_all([owner, *members])
+    db.flush()
+    lst = ShoppingList(name="Weekly shop", owner_id=owner.id)
+    db.add(lst)
+    db.flush()
+    db.add_all(ListMember(list_id=lst.id, user_id=m.id, role="editor") for m in members)
+    rng = random.Random(49)
+    db.add_all(
+        ListItem(
+            list_id=lst.id, name=f"item {n}", quantity=n % 4 + 1, unit="g",
+            category_id=rng.choice(categories).id, added_by=rng.choice([owner, *members]).id,
+            checked=n % 3 == 0, sort_order=n,
+        )
+        for n in range(50)
+    )
+    db.commit()
+    return {"owner": owner.id, "list": lst.id}
+
+
+def _run(coro):
+    """Drive a coroutine that never suspends, without an event loop's overhead."""
+    try:
+        coro.send(None)
+    except StopIteration:
+        return
+    raise RuntimeError("coroutine suspended")
+
+
+def _reference():
+    # Fixed interpreter-bound work used to normalise across machines
+    data = {str(i): [i, i * 2.5, "x" * (i % 7)] for i in range(200)}
+    return sorted(json.dumps(data)), sum(i * i for i in range(500))
+
+
+def setup() -> dict:
+    """Build each benchmark; returns name -> zero-argument callable."""
+    prepare_database()
+    db = SessionLocal()
+    ids = _seed(db)
+
+    item = (
+        db.query(ListItem)
+        .options(joinedload(ListItem.category), joinedload(ListItem.added_by_user))
+        .filter(ListItem.list_id == ids["list"])
+        .first()
+    )
+    lst = db.get(ShoppingList, ids["list"])
+
+    with open(CORPUS) as f:
+        lines = [json.loads(line)["line"] for line in f]
+    line_index = iter(range(10**12))
+    uncached = recipe_parser._parse_ingredient_cached.__wrapped__
+
+    manager = ConnectionManager(queue_size=10)
+    conns = []
+    for i in range(SUBSCRIBERS):
+        encoding = ws_codec.MSGPACK if i < MSGPACK_SUBSCRIBERS else ws_codec.JSON
+        conn = _Connection(_NullSocket(), 10, encoding)
+        manager.subscriptions[ids["list"]].add(conn)
+        conns.append(conn)
+    event = {
+        "type": "item_added",
+        "list_id": ids["list"],
+        "data": _item_to_out(item).model_dump(mode="json"),
+        "user_id": ids["owner"],
+        "username": "Owner",
+    }
+
+    def broadcast():
+        _run(manager.broadcast_to_list(ids["list"], event))
+        for conn in conns:
+            conn.queue.get_nowait()
+
+    limiter = RateLimiter(window=60, max_attempts=10, store=MemoryRateLimitStore(), scope="bench")
+    keys = [f"10.0.{i // 256}.{i % 256}" for i in range(1000)]
+    for key in keys[::2]:
+        limiter.record_attempt(key)
+    key_index = iter(range(10**12))
+
+    token = create_access_token({"sub": ids["owner"]})
+
+    return {
+        "reference": _reference,
+        "_item_to_out": lambda: _item_to_out(item),
+        "_list_to_out": lambda: _list_to_out(lst, db),
+        "parse_ingredient": lambda: recipe_parser.parse_ingredient(lines[next(line_index) % len(lines)]),
+        "parse_ingredient (uncached)": lambda: uncached(lines[next(line_index) % len(lines)]),
+        f"broadcast_to_list ({SUBSCRIBERS} sockets)": broadcast,
+        "RateLimiter.is_rate_limited": lambda: limiter.is_rate_limited(keys[next(key_index) % len(keys)]),
+        "jwt.decode": lambda: jwt.decode(token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM]),
+        "_get_user_from_jwt": lambda: _get_user_from_jwt(token, db),
+    }
+
+
+def measure(fn, repeat: int) -> float:
+    """Best time per call over repeat short runs, in nanoseconds."""
+    timer = timeit.Timer(fn)
+    number, _ = timer.autorange()
+    # Many short runs are likelier than a few long ones to catch the machine idle
+    number = max(1, number // 4)
+    return min(timer.repeat(repeat=repeat, number=number)) / number * 1e9
+
+
+def run(benchmarks: dict, names: list[str], repeat: int) -> dict:
+    results = {"reference": measure(benchmarks["reference"], repeat)}
+    for name in names:
+        results[name] = measure(benchmarks[name], repeat)
+        print(f"  {name:<36}{results[name]:12,.0f} ns", file=sys.stderr)
+    # Once more at the end, keeping the faster, in case the machine was busy at the start
+    results["reference"] = min(results["reference"], measure(benchmarks["reference"], repeat))
+    return results
+
+
+def changes(results: dict, baseline: dict) -> dict:
+    """Change per benchmark against the baseline, scaled by the reference workload."""
+    scale = results["reference"] / baseline["reference"]
+    return {
+        name: now / (baseline[name] * scale) - 1
+        for name, now in results.items()
+        if name != "reference" and name in baseline
+    }
+
+
+def report(results: dict, baseline: dict, tolerance: float):
+    scale = results["reference"] / baseline["reference"]
+    print(f"reference workload: {results['reference']:,.0f} ns now, {baseline['reference']:,.0f} ns in the baseline"
+          f" (this machine is {1 / scale:.2f}x the baseline's speed)\n")
+    print(f"{'benchmark':<36}{'baseline ns':>13}{'now ns':>12}{'change':>9}")
+    change = changes(results, baseline)
+    for name, now in results.items():
+        if name == "reference":
+            continue
+        if name not in change:
+            print(f"{name:<36}{'-':>13}{now:12,.0f}     new")
+            continue
+        flag = "  SLOWER" if change[name] > tolerance else ""
+        print(f"{name:<36}{baseline[name]:13,.0f}{now:12,.0f}{change[name]:+9.0%}{flag}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=15)
+    parser.add_argument("--tolerance", type=float, default=0.25, help="allowed slowdown, 0.25 = 25%%")
+    parser.add_argument("--only", help="run benchmarks whose name contains this")
+    parser.add_argument("--update", action="store_true", help="record the results as the new baseline")
+    args = parser.parse_args()
+
+    benchmarks = setup()
+    names = [name for name in benchmarks if name != "reference" and (not args.only or args.only in name)]
+    results = run(benchmarks, names, args.repeat)
+
+    if args.update or not os.path.exists(BASELINE):
+        # A baseline that caught a busy moment would hide later regressions
+        for _ in range(UPDATE_PASSES - 1):
+            again = run(benchmarks, names, args.repeat)
+            results = {name: min(now, again[name]) for name, now in results.items()}
+        recorded = {}
+        if args.only and os.path.exists(BASELINE):
+            # Keep the other benchmarks, rescaled to this run's reference
+            with open(BASELINE) as f:
+                old = json.load(f)
+            scale = results["reference"] / old["reference"]
+            recorded = {k: v * scale for k, v in old.items()}
+        recorded.update(results)
+        with open(BASELINE, "w") as f:
+            json.dump({k: round(v, 1) for k, v in recorded.items()}, f, indent=2)
+            f.write("\n")
+        print(f"baseline written to {os.path.relpath(BASELINE, ROOT)}")
+        return
+
+    with open(BASELINE) as f:
+        baseline = json.load(f)
+    slower = [name for name, change in changes(results, baseline).items() if change > args.tolerance]
+    if slower:
+        # Confirm before failing: a burst of background load can slow a single run
+        print(f"re-measuring {', '.join(slower)}", file=sys.stderr)
+        again = run(benchmarks, slower, args.repeat)
+        results = {name: min(now, again.get(name, now)) for name, now in results.items()}
+
+    report(results, baseline, args.tolerance)
+    slower = {name: change for name, change in changes(results, baseline).items() if change > args.tolerance}
+    if slower:
+        print("\nFAIL:")
+        for name, change in slower.items():
+            print(f"  {name}: {change:+.0%} (tolerance {args.tolerance:.0%})")
+        sys.exit(1)
+    print("\nOK: nothing slower than the baseline allows")
+
+
+if __name__ == "__main__":
+    main()
@@ -240,6 +240,10 @@ class ApiClient {
     return this.request(`/lists/${listId}/items`);
   }
 
+  getItem(listId, itemId) {
+    return this.request(`/lists/${listId}/items/${itemId}`);
+  }
+
   createItem(listId, data) {
     return this.request(`/lists/${listId}/items`, {
       method: 'POST',
@@ -284,6 +288,17 @@ class ApiClient {
     });
   }
 
+  startRecipeImportJob(listId, urls) {
+    return this.request(`/lists/${listId}/items/import-recipe/jobs`, {
+      method: 'POST',
+      body: JSON.stringify({ urls }),
+    });
+  }
+
+  getRecipeImportJob(listId, jobId) {
+    return this.request(`/lists/${listId}/items/import-recipe/jobs/${jobId}`);
+  }
+
   // Categories
   getCategories() {
     return this.request('/categories');
@@ -1,65 +1,144 @@
-import { useEffect, useRef, useCallback } from 'react';
+import { useEffect, useRef } from 'react';
 
-export function useWebSocket(listId, onMessage) {
-  const wsRef = useRef(null);
-  const reconnectTimer = useRef(null);
-
-  const connect = useCallback(() => {
-    const token = localStorage.getItem('token');
-    if (!token || !listId) return;
-
-    const protocol = window.location.protocol === 'https:' ? 'wss:' : 'ws:';
-    const url = `${protocol}//${window.location.host}/ws/${listId}`;
-
-    const ws = new WebSocket(url);
-    wsRef.current = ws;
-
-    ws.onopen = () => {
-      // Send token as first message instead of in the query string
-      ws.send(JSON.stringify({ type: 'auth', token }));
-
-      // Send periodic pings
-      const pingInterval = setInterval(() => {
-        if (ws.readyState === WebSocket.OPEN) {
-          ws.send('ping');
-        } else {
-          clearInterval(pingInterval);
-        }
-      }, 30000);
-      ws._pingInterval = pingInterval;
-    };
-
-    ws.onmessage = (event) => {
-      if (event.data === 'pong') return;
-      try {
-        const msg = JSON.parse(event.data);
-        // Ignore auth_ok acknowledgements
-        if (msg.type === 'auth_ok') return;
-        onMessage(msg);
-      } catch (e) {
-        // ignore parse errors
+// One multiplexed socket per tab, shared by every list on screen. Each list
+// is a subscription on it rather than its own connection and auth handshake.
+const handlers = new Map(); // listId -> Set of message handlers
+// Last sequence number seen per list, and the server epoch it belongs to, so a
+// reconnect can ask for just the events missed while the socket was down.
+const lastSeq = new Map();
+let epoch = null;
+let ws = null;
+let pingInterval = null;
+let reconnectTimer = null;
+
+function send(msg) {
+  if (ws && ws.readyState === WebSocket.OPEN) ws.send(JSON.stringify(msg));
+}
+
+function subscribeMessage(listId) {
+  const msg = { type: 'subscribe', list_id: listId };
+  if (epoch && lastSeq.has(listId)) {
+    msg.last_seq = lastSeq.get(listId);
+    msg.epoch = epoch;
+  }
+  return msg;
+}
+
+function noteSeq(listId, seq) {
+  // Replayed frames follow the "subscribed" reply and can carry lower numbers
+  if (!lastSeq.has(listId) || seq > lastSeq.get(listId)) lastSeq.set(listId, seq);
+}
+
+function dispatch(msg) {
+  if (msg.seq && msg.list_id) noteSeq(msg.list_id, msg.seq);
+  // Coalesced events arrive as one frame; React batches the resulting
+  // state updates into a single render.
+  if (msg.type === 'batch') {
+    msg.events.forEach(dispatch);
+    return;
+  }
+  // A resync without a list_id covers everything this socket missed
+  const targets = msg.type === 'resync' && !msg.list_id ? [...handlers.keys()] : [msg.list_id];
+  targets.forEach((listId) => {
+    handlers.get(listId)?.forEach((handler) => handler(msg));
+  });
+}
+
+function connect() {
+  reconnectTimer = null;
+  const token = localStorage.getItem('token');
+  if (!token || handlers.size === 0) return;
+
+  const protocol = window.location.protocol === 'https:' ? 'wss:' : 'ws:';
+  const socket = new WebSocket(`${protocol}//${window.location.host}/ws`);
+  ws = socket;
+
+  socket.onopen = () => {
+    // Send token as first message instead of in the query string
+    socket.send(JSON.stringify({ type: 'auth', token }));
+
+    // Send periodic pings
+    pingInterval = setInterval(() => {
+      if (socket.readyState === WebSocket.OPEN) socket.send('ping');
+    }, 30000);
+  };
+
+  socket.onmessage = (event) => {
+    if (event.data === 'pong') return;
+    try {
+      const msg = JSON.parse(event.data);
+      if (msg.type === 'auth_ok') {
+        // Resubscribe with the old epoch and sequence numbers. After a restart or
+        // on another worker the epoch differs, and the server answers with a
+        // resync rather than treating the gap as empty.
+        handlers.forEach((_, listId) => send(subscribeMessage(listId)));
+        if (msg.epoch !== epoch) lastSeq.clear();
+        epoch = msg.epoch;
+        return;
+      }
+      // The subscription's starting point, so a list that stays quiet can still resume
+      if (msg.type === 'subscribed') {
+        if (handlers.has(msg.list_id)) noteSeq(msg.list_id, msg.seq);
+        return;
       }
-    };
+      // Ignore protocol acknowledgements
+      if (['unsubscribed', 'error'].includes(msg.type)) return;
+      dispatch(msg);
+    } catch (e) {
+      // ignore parse errors
+    }
+  };
 
-    ws.onclose = () => {
-      if (ws._pingInterval) clearInterval(ws._pingInterval);
-      // Auto-reconnect after 3s
-      reconnectTimer.current = setTimeout(connect, 3000);
-    };
+  socket.onclose = () => {
+    clearInterval(pingInterval);
+    if (ws !== socket) return;
+    ws = null;
+    // Auto-reconnect after 3s while anything is still subscribed
+    if (handlers.size > 0) reconnectTimer = setTimeout(connect, 3000);
+  };
 
-    ws.onerror = () => {
-      ws.close();
-    };
-  }, [listId, onMessage]);
+  socket.onerror = () => {
+    socket.close();
+  };
+}
+
+function subscribe(listId, handler) {
+  if (!handlers.has(listId)) {
+    handlers.set(listId, new Set());
+    send(subscribeMessage(listId));
+  }
+  handlers.get(listId).add(handler);
+  if (!ws && !reconnectTimer) connect();
+}
+
+function unsubscribe(listId, handler) {
+  const set = handlers.get(listId);
+  if (!set) return;
+  set.delete(handler);
+  if (set.size > 0) return;
+  handlers.delete(listId);
+  lastSeq.delete(listId);
+  send({ type: 'unsubscribe', list_id: listId });
+  if (handlers.size === 0) {
+    clearTimeout(reconnectTimer);
+    reconnectTimer = null;
+    if (ws) {
+      const socket = ws;
+      ws = null;
+      socket.close();
+    }
+  }
+}
+
+export function useWebSocket(listId, onMessage) {
+  // Keep the subscription stable across re-renders; always call the latest handler
+  const handlerRef = useRef(onMessage);
+  handlerRef.current = onMessage;
 
   useEffect(() => {
-    connect();
-    return () => {
-      if (reconnectTimer.current) clearTimeout(reconnectTimer.current);
-      if (wsRef.current) {
-        if (wsRef.current._pingInterval) clearInterval(wsRef.current._pingInterval);
-        wsRef.current.close();
-      }
-    };
-  }, [connect]);
+    if (!listId) return undefined;
+    const handler = (msg) => handlerRef.current(msg);
+    subscribe(listId, handler);
+    return () => unsubscribe(listId, handler);
+  }, [listId]);
 }
@@ -79,8 +79,41 @@ export default function ListDetailPage() {
     api.getFavourites(15).then(setFavourites).catch(() => {});
   }, []);
 
+  // Latest items for the WebSocket handler, which must not re-subscribe on every change
+  const itemsRef = useRef(items);
+  itemsRef.current = items;
+
+  // Update broadcasts carry only the changed fields. Apply them if our copy is
+  // at the revision they were made against; otherwise fetch the full item.
+  const applyItemDelta = useCallback((delta) => {
+    const current = itemsRef.current.find((i) => i.id === delta.id);
+    if (!current) return;
+    if (current.updated_at !== delta.base_rev) {
+      api.getItem(listId, delta.id)
+        .then((full) => setItems((prev) => prev.map((i) => (i.id === full.id ? full : i))))
+        .catch(() => {});
+      return;
+    }
+    setItems((prev) => prev.map((i) => (
+      i.id === delta.id ? { ...i, ...delta.changes, updated_at: delta.rev } : i
+    )));
+  }, [listId]);
+
   // WebSocket for real-time updates
   const handleWsMessage = useCallback((msg) => {
+    // The server dropped events we were too slow to receive; refetch everything.
+    if (msg.type === 'resync') {
+      fetchData();
+      return;
+    }
+    // Background recipe imports finish server-side, so their results must be
+    // applied even when this user started the job.
+    if (msg.type === 'recipe_import_finished') {
+      const added = msg.data.items || [];
+      const ids = new Set(added.map((i) => i.id));
+      setItems((prev) => [...prev.filter((i) => !ids.has(i.id)), ...added]);
+      return;
+    }
     if (msg.user_id === user?.id) return;
 
     switch (msg.type) {
@@ -89,7 +122,11 @@ export default function ListDetailPage() {
         break;
       case 'item_updated':
       case 'item_checked':
-        setItems((prev) => prev.map((i) => (i.id === msg.data.id ? msg.data : i)));
+        if (msg.data.changes) {
+          applyItemDelta(msg.data);
+        } else {
+          setItems((prev) => prev.map((i) => (i.id === msg.data.id ? msg.data : i)));
+        }
         break;
       case 'item_removed':
         setItems((prev) => prev.filter((i) => i.id !== msg.data.id));
@@ -108,7 +145,7 @@ export default function ListDetailPage() {
       default:
         break;
     }
-  }, [user?.id]);
+  }, [user?.id, fetchData, applyItemDelta]);
 
   useWebSocket(listId, handleWsMessage);
 